@@ -1,8 +1,12 @@
 # api_flask_correct.py - VERSION SANS scikit-learn
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import numpy as np
 import os
+import sys
+
+# Le noyau de scoring partagé vit dans src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from risk_scoring import NIVEAUX, heuristic_components, risk_codes
 
 app = Flask(__name__)
 CORS(app)
@@ -13,6 +17,13 @@ print("🚀 API Anti-Gaspillage démarrée - Mode Simulation Intelligent")
 model = None
 print("🔧 Mode simulation intelligent activé")
 
+ACTIONS = (
+    "Niveau normal - Surveillance standard",
+    "Promotion 15% ciblée",
+    "Promotion 30% recommandée",
+    "Promotion 50% urgente + Dons",
+)
+
 @app.route('/')
 def home():
     return jsonify({"message": "API Anti-Gaspillage 🚀", "status": "active", "mode": "simulation_intelligent"})
@@ -27,28 +38,12 @@ def predict():
         price = data.get('price', 5.0)
         sold = data.get('quantity_sold', 30)
         
-        # Mode simulation intelligent avec logique métier
-        base_risk = (stock - sold) / expiration
-        
-        # Ajouter des facteurs de risque supplémentaires
-        price_factor = max(0.5, min(2.0, price / 10.0))  # Prix influence le risque
-        demand_factor = sold / max(1, stock)  # Ratio demande/stock
-        
-        risk_score = base_risk * price_factor * (1 + (1 - demand_factor))
-        
-        # Logique métier améliorée
-        if risk_score > 15:
-            level = "🚨 CRITIQUE"
-            action = "Promotion 50% urgente + Dons"
-        elif risk_score > 8:
-            level = "⚠️ ÉLEVÉ" 
-            action = "Promotion 30% recommandée"
-        elif risk_score > 3:
-            level = "🔶 MODÉRÉ"
-            action = "Promotion 15% ciblée"
-        else:
-            level = "✅ FAIBLE"
-            action = "Niveau normal - Surveillance standard"
+        # Mode simulation intelligent avec logique métier (noyau partagé)
+        components = heuristic_components(stock, expiration, price, sold)
+        risk_score = components['risk_score']
+        code = risk_codes(risk_score)
+        level = NIVEAUX[code]
+        action = ACTIONS[code]
         
         return jsonify({
             "risk_score": round(risk_score, 2),
@@ -59,9 +54,9 @@ def predict():
                 "stock": stock,
                 "expiration_days": expiration,
                 "quantity_sold": sold,
-                "base_risk": round(base_risk, 2),
-                "price_factor": round(price_factor, 2),
-                "demand_factor": round(demand_factor, 2)
+                "base_risk": round(components['base_risk'], 2),
+                "price_factor": round(components['price_factor'], 2),
+                "demand_factor": round(components['demand_factor'], 2)
             }
         })
         
@@ -0,0 +1,132 @@
+# admission.py - Contrôle d'admission du chemin modèle (file bornée + SLO de latence)
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEGRADE, SHED = 'degrade', 'shed'
+
+
+class AdmissionController:
+    """Limite le nombre de prédictions modèle simultanées.
+
+    Au-delà de max_concurrency, les requêtes attendent dans une file bornée.
+    L'attente projetée d'une nouvelle requête est estimée à partir de la
+    durée de service moyenne (EWMA) : (requêtes devant elle / slots + 1) x
+    durée. Si elle dépasse le SLO, ou si la file est pleine, la requête
+    n'est pas admise : l'appelant répond alors avec la formule fermée
+    (mode "degrade") ou renvoie 429 + Retry-After (mode "shed").
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=None, slo_ms=200.0, mode=DEGRADE, alpha=0.2):
+        self.max_concurrency = max_concurrency or os.cpu_count()
+        self.max_queue = self.max_concurrency * 4 if max_queue is None else max_queue
+        self.slo = slo_ms / 1000
+        self.mode = mode
+        self.alpha = alpha
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = None  # EWMA en secondes
+        self.admitted = 0
+        self.degraded = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.queued = 0
+
+    def projected_wait(self):
+        """Attente estimée (s) pour une requête arrivant maintenant"""
+        if self.in_flight < self.max_concurrency:
+            return 0.0
+        rounds = self.waiting // self.max_concurrency + 1
+        return rounds * (self.service_time or 0.0)
+
+    def retry_after(self):
+        """Délai conseillé (s, entier >= 1) pour l'en-tête Retry-After"""
+        with self._cond:
+            return max(1, math.ceil(self.projected_wait()))
+
+    def _reject(self):
+        if self.mode == SHED:
+            self.shed += 1
+        else:
+            self.degraded += 1
+        return False
+
+    def acquire(self):
+        """True si la requête obtient un slot du modèle, False si elle doit être dégradée/rejetée"""
+        with self._cond:
+            if self.in_flight < self.max_concurrency and self.waiting == 0:
+                self.in_flight += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue or self.projected_wait() > self.slo:
+                return self._reject()
+
+            self.waiting += 1
+            self.queued += 1
+            deadline = time.monotonic() + self.slo
+            try:
+                while self.in_flight >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return self._reject()
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self, service_time=None):
+        with self._cond:
+            self.in_flight -= 1
+            if service_time is not None:
+                self.service_time = (service_time if self.service_time is None
+                                     else self.alpha * service_time + (1 - self.alpha) * self.service_time)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """with admission.slot() as admitted: ... (slot libéré et durée mesurée à la sortie)"""
+        if not self.acquire():
+            yield False
+            return
+        start = time.perf_counter()
+        try:
+            yield True
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self):
+        with self._cond:
+            total = self.admitted + self.degraded + self.shed
+            return {
+                'mode': self.mode,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'slo_ms': self.slo * 1000,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'service_ms_ewma': round(self.service_time * 1000, 2) if self.service_time else None,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'degraded': self.degraded,
+                'shed': self.shed,
+                'timeouts': self.timeouts,
+                'degraded_ratio': round((self.degraded + self.shed) / total, 4) if total else None,
+            }
+
+
+def from_env():
+    """Contrôleur configuré par ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE,
+    LATENCY_SLO_MS et OVERLOAD_MODE (degrade | shed)"""
+    max_queue = os.environ.get('ADMISSION_MAX_QUEUE')
+    return AdmissionController(
+        max_concurrency=int(os.environ.get('ADMISSION_MAX_CONCURRENCY', 0)) or None,
+        max_queue=int(max_queue) if max_queue else None,
+        slo_ms=float(os.environ.get('LATENCY_SLO_MS', 200)),
+        mode=os.environ.get('OVERLOAD_MODE', DEGRADE),
+    )
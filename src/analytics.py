@@ -2,13 +2,18 @@
 import pandas as pd
 import joblib
 from prediction_service import WastePredictionService
+from prediction_log import read_log
+from priority_index import PriorityIndex, expected_loss
+from schema import load_dataset
+from risk_scoring import FAIBLE, MODERE, ELEVE, SEUIL_ELEVE, base_risk
 import matplotlib.pyplot as plt
 import os
+from paths import REPORTS_DIR
 
 print(" ÉTAPE 4: ANALYTICS ET RAPPORTS")
 
 # 1. CHARGER LES DONNÉES ET MODÈLE
-df = pd.read_csv('../data/synthetic_data.csv')
+df = load_dataset('synthetic_data')
 service = WastePredictionService()
 
 print(f" Analyse de {len(df)} produits...")
@@ -17,9 +22,10 @@ print(f" Analyse de {len(df)} produits...")
 predictions = service.analyze_dataset(df)
 
 # 3. STATISTIQUES GLOBALES
-high_risk = [p for p in predictions if p['risk_level'] in [' CRITIQUE', ' ÉLEVÉ']]
-moderate_risk = [p for p in predictions if p['risk_level'] == ' MODÉRÉ']
-low_risk = [p for p in predictions if p['risk_level'] == ' FAIBLE']
+codes = pd.Series([p['risk_code'] for p in predictions], index=df.index)
+high_risk = [p for p in predictions if p['risk_code'] >= ELEVE]
+moderate_risk = [p for p in predictions if p['risk_code'] == MODERE]
+low_risk = [p for p in predictions if p['risk_code'] == FAIBLE]
 
 print("\n STATISTIQUES DE RISQUE:")
 print(f"    CRITIQUE/ ÉLEVÉ: {len(high_risk)} produits ({len(high_risk)/len(df)*100:.1f}%)")
@@ -29,25 +35,19 @@ print(f"    FAIBLE: {len(low_risk)} produits ({len(low_risk)/len(df)*100:.1f}%)"
 # 4. ANALYSE PAR CATÉGORIE
 if 'category' in df.columns:
     print("\n RISQUE PAR CATÉGORIE:")
-    categories = df['category'].unique()
-    for category in categories:
-        cat_products = df[df['category'] == category]
-        cat_predictions = service.analyze_dataset(cat_products)
-        high_risk_cat = len([p for p in cat_predictions if p['risk_level'] in [' CRITIQUE', '⚠️ ÉLEVÉ']])
-        print(f"   {category}: {high_risk_cat}/{len(cat_products)} à risque ({high_risk_cat/len(cat_products)*100:.1f}%)")
-
-# 5. CALCUL ÉCONOMIES POTENTIELLES
-total_potential_loss = 0
-potential_savings = 0
-
-for _, product in df.iterrows():
-    risk_score = (product['stock_quantity'] - product['quantity_sold']) / product['expiration_days']
-    potential_loss = risk_score * product['price']
-    total_potential_loss += potential_loss
-    
-    # Économies avec promotions ciblées
-    if risk_score > 8:
-        potential_savings += potential_loss * 0.7  # 70% d'économies sur produits risqués
+    par_categorie = (codes >= ELEVE).groupby(df['category'], sort=False)
+    for category, high_risk_mask in par_categorie:
+        high_risk_cat = int(high_risk_mask.sum())
+        print(f"   {category}: {high_risk_cat}/{len(high_risk_mask)} à risque ({high_risk_cat/len(high_risk_mask)*100:.1f}%)")
+
+# 5. CALCUL ÉCONOMIES POTENTIELLES (vectorisé sur tout le dataset)
+risk_scores = base_risk(df['stock_quantity'].to_numpy(), df['quantity_sold'].to_numpy(),
+                        df['expiration_days'].to_numpy())
+potential_losses = risk_scores * df['price'].to_numpy()
+total_potential_loss = potential_losses.sum()
+
+# Économies avec promotions ciblées : 70% sur les produits risqués
+potential_savings = potential_losses[risk_scores > SEUIL_ELEVE].sum() * 0.7
 
 print(f"\n IMPACT FINANCIER:")
 print(f"   Pertes potentielles totales: {total_potential_loss:.2f}€")
@@ -56,15 +56,21 @@ print(f"   Taux de réduction du gaspillage: {potential_savings/total_potential_
 
 # 6. PRODUITS PRIORITAires
 print("\n TOP 5 PRODUITS PRIORITAIRES:")
-high_risk_sorted = sorted(high_risk, key=lambda x: x['risk_score'], reverse=True)[:5]
+# Index par perte attendue (risque x prix) : top-K sans trier toute la liste
+priorities = PriorityIndex.from_items(
+    (i, p['category'], expected_loss(p['risk_score'], p['features_used']['price']), p)
+    for i, p in enumerate(high_risk)
+)
+high_risk_sorted = [product for _, _, product in priorities.top_k(5)]
 
 for i, product in enumerate(high_risk_sorted, 1):
-    print(f"   {i}. Risque: {product['risk_score']} - {product['risk_level']}")
+    loss = expected_loss(product['risk_score'], product['features_used']['price'])
+    print(f"   {i}. Risque: {product['risk_score']} - {product['risk_level']} (perte attendue {loss:.2f}€)")
     print(f"      → {product['recommendation']}")
 
 # 7. SAUVEGARDER RAPPORT
-os.makedirs('../reports', exist_ok=True)
-report_path = '../reports/analytics_report.txt'
+os.makedirs(REPORTS_DIR, exist_ok=True)
+report_path = os.path.join(REPORTS_DIR, 'analytics_report.txt')
 
 with open(report_path, 'w', encoding='utf-8') as f:
     f.write(" RAPPORT ANTI-GASPILLAGE - ANALYTICS\n")
@@ -79,5 +85,20 @@ with open(report_path, 'w', encoding='utf-8') as f:
     for i, product in enumerate(high_risk_sorted, 1):
         f.write(f"{i}. Risque: {product['risk_score']} - {product['recommendation']}\n")
 
+# 8. TRAFIC SERVI PAR L'API (journal des prédictions)
+served = read_log()
+if len(served):
+    print(f"\n TRAFIC SERVI: {len(served)} prédictions journalisées")
+    served_levels = served['risk_code'].value_counts().sort_index()
+    for code, count in served_levels.items():
+        print(f"   {service.NIVEAUX[code]}: {count} ({count/len(served)*100:.1f}%)")
+    for version, count in served['model_version'].fillna('simulation').value_counts().items():
+        print(f"   Modèle {version}: {count} prédictions")
+
+    with open(report_path, 'a', encoding='utf-8') as f:
+        f.write(f"\n TRAFIC SERVI: {len(served)} prédictions journalisées\n")
+        for code, count in served_levels.items():
+            f.write(f"{service.NIVEAUX[code]}: {count}\n")
+
 print(f"\n Rapport sauvegardé: {report_path}")
 print(" ÉTAPE 4 TERMINÉE - ANALYTICS COMPLÈTES!")
\ No newline at end of file
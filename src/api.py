@@ -1,40 +1,37 @@
-﻿from flask import Flask, jsonify
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+﻿from flask import Flask, request
+from inventory_store import get_store
+from serialization import respond
 
 app = Flask(__name__)
 
-# Données simulées
-np.random.seed(42)
-n_samples = 1000
-dates = [datetime.now() - timedelta(days=x) for x in range(n_samples)]
-categories = ['fruits', 'legumes', 'viande', 'poisson', 'produits_laitiers']
-data = {
-    'date': dates,
-    'category': np.random.choice(categories, n_samples),
-    'quantity_kg': np.random.exponential(2, n_samples),
-    'price_euros': np.random.uniform(1, 50, n_samples),
-    'reason': np.random.choice(['surstock', 'date_expiration', 'dommage', 'saison'], n_samples)
-}
-df = pd.DataFrame(data)
-df['date'] = pd.to_datetime(df['date'])
+# Base SQLite partagée (pool de connexions), chargée depuis data/*.csv si vide
+store = get_store()
+
+def _filters():
+    """Filtres optionnels ?category=&start=&end= (colonnes indexées)"""
+    return {
+        'category': request.args.get('category'),
+        'start': request.args.get('start'),
+        'end': request.args.get('end'),
+    }
 
 # Endpoint pour les statistiques
 @app.route('/stats/', methods=['GET'])
 def get_stats():
-    return jsonify({
-        'total_waste_kg': round(df['quantity_kg'].sum(), 2),
-        'total_cost_cfa': round(df['price_euros'].sum() * 655.96, 2),
-        'total_cost_euros': round(df['price_euros'].sum(), 2),
-        'number_of_records': len(df)
+    stats = store.waste_stats(**_filters())
+    return respond({
+        'total_waste_kg': round(stats['quantity_kg'], 2),
+        'total_cost_cfa': round(stats['price_euros'] * 655.96, 2),
+        'total_cost_euros': round(stats['price_euros'], 2),
+        'number_of_records': stats['count']
     })
 
 # Endpoint pour les catégories avec date
 @app.route('/categories/', methods=['GET'])
 def get_categories():
-    category_stats = df.groupby('category').agg({'quantity_kg': 'sum', 'date': 'first'}).reset_index()
-    return jsonify({'categories': category_stats.to_dict('records')})
+    filters = _filters()
+    category_stats = store.waste_by_category(start=filters['start'], end=filters['end'])
+    return respond({'categories': category_stats}, table='categories')
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8001)
@@ -1,39 +1,214 @@
 # api_flask_correct.py - CORRIGE LE CHEMIN
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import joblib
-import numpy as np
+import math
+import numbers
 import os
+import threading
+import numpy as np
+import pandas as pd
+from admission import SHED, from_env as admission_from_env
+from drift_monitor import DriftMonitor, csv_reference
+from explain import MAX_EXPLAIN_ROWS, explain_rows, make_explainer
+from export import (DATE_FORMAT, EXPORT_CHUNK_ROWS, EXPORT_MIMETYPES, FIRST_CHUNK_ROWS, MAX_CHUNK_ROWS,
+                    export_format, export_formats, export_stream, model_scorer)
+from jobs import JOB_KINDS, JobQueue
+from packed_forest import PackedForest, is_forest
+from live_feed import LiveFeed
+from live_scoring import FileEventSource, LiveRiskScorer
+from model_cache import ModelCache
+from inventory_store import TABLES, get_store
+from model_registry import HotSwapModel
+from paths import DATA_DIR
+from prediction_log import PredictionLog
+from pricing_engine import MarkdownOptimizer, load_or_fit
+from risk_scoring import FEATURES, NIVEAUX, features_matrix, heuristic_risk, risk_codes
+from schema import load_dataset
+from serialization import compact_requested, respond, response_format, tabulate
 
 app = Flask(__name__)
 CORS(app)
 
-print("🔧 Recherche du modèle...")
+print("🔧 Chargement du modèle depuis le registre...")
 
-# Essaye différents chemins possibles
-model_paths = [
-    'models/model.joblib',           # Structure standard
-    '../models/model.joblib',        # Si API dans src/
-    '../../models/model.joblib',     # Si profond
-    'model.joblib',                  # Dans le dossier courant
-    r'C:\Users\DELL\anti-gaspillage\models\model.joblib'  # Chemin absolu
-]
+# Modèle versionné, rechargé à chaud quand models/registry/CURRENT change
+WARMUP_BATCH = features_matrix([50, 80, 30], [3, 1, 5], [5.0, 2.0, 8.0], [40, 50, 25])
+model_store = HotSwapModel(
+    warmup_batch=WARMUP_BATCH,
+    poll_interval=float(os.environ.get('MODEL_POLL_SECONDS', 2.0))
+)
+model_store.load_initial()
+model_store.start()
 
-model = None
-for path in model_paths:
-    try:
-        model = joblib.load(path)
-        print(f"✅ Modèle chargé depuis: {path}")
-        break
-    except:
-        continue
-
-if model is None:
+if model_store.version is None:
     print("⚠️  Mode simulation - Modèle non trouvé")
+else:
+    print(f"✅ Modèle actif: {model_store.version}")
+
+# Modèles par magasin / catégorie : chargés à la demande, LRU sous budget mémoire
+model_cache = ModelCache(warmup_batch=WARMUP_BATCH)
+
+def route_model(store_id=None, category=None):
+    """(clé, version, modèle) : partition la plus précise disponible, sinon modèle global"""
+    found = model_cache.resolve(store_id, category)
+    if found is not None:
+        key, version, model = found
+        return key, f"{key}/{version}", model
+    version, model = model_store.get()
+    return 'global', version, model
+
+# Admission du chemin modèle : au-delà du SLO, formule fermée ("degraded") ou 429
+admission = admission_from_env()
+
+def admitted_scores(model, features):
+    """(scores, model_used) ; scores None si la requête est rejetée (mode shed)"""
+    if model is None:
+        return heuristic_risk(*features.T), "simulation_intelligent"
+    with admission.slot() as admitted:
+        if admitted:
+            return model.predict(features), "real"
+    if admission.mode == SHED:
+        return None, "shed"
+    return heuristic_risk(*features.T), "degraded"
+
+def overloaded():
+    response = jsonify({"error": "Service surchargé, réessayez plus tard", "admission": admission.stats()})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(admission.retry_after())
+    return response
+
+# Journal asynchrone : les requêtes n'écrivent jamais sur disque elles-mêmes
+prediction_log = PredictionLog().start()
+
+def score_features(stock, expiration, price, sold):
+    """Scores vectorisés avec le modèle actif (heuristique en mode simulation)"""
+    version, model = model_store.get()
+    if model:
+        return model.predict(features_matrix(stock, expiration, price, sold, dtype=np.float32))
+    return heuristic_risk(stock, expiration, price, sold)
+
+# État vivant du catalogue : seuls les produits touchés sont re-scorés
+CATALOG_PATH = os.path.join(DATA_DIR, 'synthetic_data.csv')
+live_scorer = (LiveRiskScorer.from_frame(load_dataset(CATALOG_PATH), score_fn=score_features)
+               if os.path.exists(CATALOG_PATH) else LiveRiskScorer(score_fn=score_features))
+# Flux SSE : un calcul par changement, partagé par tous les dashboards
+live_feed = LiveFeed(live_scorer)
+# File d'événements locale (NDJSON) en attendant une vraie file de messages
+if os.environ.get('LIVE_EVENTS_FILE'):
+    event_source = FileEventSource(live_scorer, os.environ['LIVE_EVENTS_FILE']).start()
+
+def load_reference():
+    """Profil d'entraînement du modèle actif (métadonnées du registre, sinon CSV)"""
+    version = model_store.version
+    profile = None
+    if version not in (None, 'legacy'):
+        profile = model_store.registry.metadata(version).get('reference_profile')
+    if profile is None and os.path.exists(CATALOG_PATH):
+        profile = csv_reference(CATALOG_PATH)
+    return version, profile  # None : dérive suspendue jusqu'à un profil disponible
+
+# Dérive des features servies : esquisses en mémoire constante, PSI/KS périodiques
+drift_monitor = DriftMonitor(
+    load_reference,
+    version_fn=lambda: model_store.version,
+    interval=float(os.environ.get('DRIFT_CHECK_SECONDS', 60.0))
+).start()
+
+# Entraînement / analytics en arrière-plan : processus séparés, de priorité basse
+job_queue = JobQueue()
+
+# Structures dérivées du modèle actif, reconstruites seulement quand la version change
+_derived = {}
+_derived_lock = threading.Lock()
+
+def per_version(kind, version, model, build, model_key='global'):
+    if model is not None and model_key != 'global':
+        # Modèle de partition : gardée dans son entrée du cache LRU, évincée avec lui
+        return model_cache.derived(model_key, model, kind, build)
+    key = (kind, version if model else 'simulation')
+    # Lecture, purge et construction sous verrou : une bascule à chaud pendant
+    # des requêtes concurrentes ne peut ni lever KeyError ni reconstruire en double
+    with _derived_lock:
+        value = _derived.get(key)
+        if value is None:
+            value = build()
+            for old in [k for k in _derived if k[0] == kind]:
+                del _derived[old]
+            _derived[key] = value
+        return value
+
+def get_explainer(version, model, model_key='global'):
+    # Ligne de base des contributions : moyennes des features d'entraînement
+    reference = drift_monitor.reference
+    if reference is None:
+        # Pas encore de profil : ligne de base nulle, non mise en cache
+        return make_explainer(model, np.zeros(len(FEATURES)))
+    baseline = [sketch.total / max(sketch.count, 1) for sketch in reference.values()]
+    return per_version('explainer', version, model, lambda: make_explainer(model, baseline), model_key)
+
+def risk_intervals(version, model, features, model_key='global'):
+    """P10/P50/P90 par produit (arbres de la forêt en un calcul tableau), None sinon"""
+    if not is_forest(model):
+        return None
+    packed = per_version('packed', version, model, lambda: PackedForest(model), model_key)
+    bands = packed.predict_quantiles(features)
+    return [{'p10': round(float(p10), 2), 'p50': round(float(p50), 2), 'p90': round(float(p90), 2)}
+            for p10, p50, p90 in zip(bands['p10'], bands['p50'], bands['p90'])]
+
+def parse_products(data):
+    """Un produit ou {"products": [...]} -> (liste, matrice de features).
+    Corps validé avant tout calcul : ValueError nommant le champ fautif"""
+    if not isinstance(data, (dict, list)):
+        raise ValueError("Corps JSON attendu : un produit ou {\"products\": [...]}")
+    products = data.get('products', [data]) if isinstance(data, dict) else data
+    if not isinstance(products, list):
+        raise ValueError("products doit être une liste")
+    for i, product in enumerate(products):
+        if not isinstance(product, dict):
+            raise ValueError(f"products[{i}] doit être un objet: {product!r}")
+        for name in FEATURES:
+            if name not in product:
+                raise ValueError(f"Feature manquante: products[{i}].{name}")
+            value = product[name]
+            if isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value):
+                raise ValueError(f"products[{i}].{name} doit être un nombre: {value!r}")
+    columns = [[product[name] for product in products] for name in FEATURES]
+    return products, features_matrix(*columns)
+
+# Moteur de remises : élasticités sauvegardées ou apprises sur les ventes, chargées
+# à la première demande ; sans données, élasticité par défaut (nouvel essai ensuite)
+_pricing = None
+_pricing_lock = threading.Lock()
+
+def get_pricing():
+    global _pricing
+    with _pricing_lock:
+        if _pricing is None:
+            try:
+                _pricing = load_or_fit()
+            except FileNotFoundError as e:
+                print(f"⚠️ Élasticités indisponibles ({e}) : élasticité par défaut")
+                return MarkdownOptimizer()
+        return _pricing
+
+ACTIONS = (
+    "Niveau normal",
+    "Surveillance renforcée",
+    "Promotion 30% recommandée",
+    "Promotion 50% urgente",
+)
+# Colonne de codes -> libellés (format compact : codes + dictionnaire envoyé une fois)
+RISK_LABELS = {'risk_code': {'risk_level': NIVEAUX, 'recommendation': ACTIONS}}
 
 @app.route('/')
 def home():
-    return jsonify({"message": "API Anti-Gaspillage 🚀", "status": "active", "model_loaded": model is not None})
+    version, model = model_store.get()
+    return jsonify({
+        "message": "API Anti-Gaspillage 🚀",
+        "status": "active",
+        "model_loaded": model is not None,
+        "model_version": version
+    })
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -45,34 +220,295 @@ def predict():
         price = data.get('price', 5.0)
         sold = data.get('quantity_sold', 30)
         
-        if model:
-            features = [[stock, expiration, price, sold]]
-            risk_score = model.predict(features)[0]
-        else:
-            # Mode simulation
-            risk_score = (stock - sold) / expiration
+        # Une seule lecture : la requête garde ce modèle même si un swap arrive
+        model_key, version, model = route_model(data.get('store_id'), data.get('category'))
+        features = features_matrix(stock, expiration, price, sold)
+        drift_monitor.observe(features)
+        # Sans modèle ou sous surcharge : formule "simulation_intelligent" du noyau partagé
+        scores, model_used = admitted_scores(model, features)
+        if scores is None:
+            return overloaded()
+        risk_score = float(scores[0])
         
         # Logique métier
-        if risk_score > 15:
-            level = "🚨 CRITIQUE"
-            action = "Promotion 50% urgente"
-        elif risk_score > 8:
-            level = "⚠️ ÉLEVÉ"
-            action = "Promotion 30% recommandée"
-        elif risk_score > 3:
-            level = "🔶 MODÉRÉ"
-            action = "Surveillance renforcée"
+        code = risk_codes(risk_score)
+        level = NIVEAUX[code]
+        action = ACTIONS[code]
+        
+        prediction_log.record({
+            'stock_quantity': stock,
+            'expiration_days': expiration,
+            'price': price,
+            'quantity_sold': sold,
+            'risk_score': risk_score,
+            'risk_code': code,
+            'model_used': model_used,
+            'model_version': version,
+            'model_key': model_key
+        })
+        
+        fmt = response_format()
+        if compact_requested(fmt):
+            response = {"risk_score": round(risk_score, 2), "risk_code": code,
+                        "labels": {name: list(values) for name, values in RISK_LABELS['risk_code'].items()}}
         else:
-            level = "✅ FAIBLE"
-            action = "Niveau normal"
+            response = {"risk_score": round(risk_score, 2), "risk_level": level, "recommendation": action}
+        response.update({
+            "model_used": model_used,
+            "model_version": version,
+            "model_key": model_key
+        })
+        if data.get('interval'):
+            intervals = risk_intervals(version, model, features, model_key) if model_used == "real" else None
+            response["risk_interval"] = intervals[0] if intervals else None
+        return respond(response, fmt=fmt)
         
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Prédictions pour un lot, avec contributions par feature si explain=true"""
+    try:
+        data = request.get_json(silent=True)
+        explain = bool(data.get('explain')) if isinstance(data, dict) else False
+        interval = bool(data.get('interval')) if isinstance(data, dict) else False
+        try:
+            products, features = parse_products(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if explain and len(products) > MAX_EXPLAIN_ROWS:
+            return jsonify({"error": f"explain limité à {MAX_EXPLAIN_ROWS} produits par requête"}), 400
+
+        # store_id / category au niveau du lot : un seul modèle pour toutes les lignes
+        routing = data if isinstance(data, dict) else {}
+        model_key, version, model = route_model(routing.get('store_id'), routing.get('category'))
+        drift_monitor.observe(features)
+        scores, model_used = admitted_scores(model, features)
+        if scores is None:
+            return overloaded()
+        if model_used == "degraded":
+            model = None  # Explications cohérentes avec la formule fermée, pas d'intervalles
+        columns = {"risk_score": np.round(np.asarray(scores, dtype=np.float64), 2),
+                   "risk_code": risk_codes(scores)}
+        if explain:
+            columns["explanation"] = explain_rows(get_explainer(version, model, model_key), features)
+        intervals = risk_intervals(version, model, features, model_key) if interval else None
+        if intervals:
+            columns["risk_interval"] = intervals
+
+        fmt = response_format()
+        predictions, labels = tabulate(columns, RISK_LABELS, compact_requested(fmt))
+        payload = {
+            "predictions": predictions,
+            "model_used": model_used,
+            "model_version": version,
+            "model_key": model_key
+        }
+        if labels:
+            payload["labels"] = labels
+        return respond(payload, table="predictions", fmt=fmt)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/explain', methods=['POST'])
+def explain():
+    """Pourquoi ce niveau de risque : biais + contribution de chaque feature"""
+    try:
+        try:
+            products, features = parse_products(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if len(products) > MAX_EXPLAIN_ROWS:
+            return jsonify({"error": f"Au plus {MAX_EXPLAIN_ROWS} produits par requête"}), 400
+
+        version, model = model_store.get()
+        explainer = get_explainer(version, model)
+        rows = explain_rows(explainer, features)
+        columns = {
+            'prediction': [row['prediction'] for row in rows],
+            'bias': [row['bias'] for row in rows],
+            'contributions': [row['contributions'] for row in rows],
+            'risk_code': risk_codes([row['prediction'] for row in rows]),
+            # Feature qui pousse le plus le score vers le haut
+            'main_driver': [max(row['contributions'], key=row['contributions'].get) for row in rows],
+        }
+
+        fmt = response_format()
+        explanations, labels = tabulate(columns, {'risk_code': {'risk_level': NIVEAUX}}, compact_requested(fmt))
+        payload = {
+            "explanations": explanations,
+            "method": type(explainer).__name__,
+            "model_version": version
+        }
+        if labels:
+            payload["labels"] = labels
+        return respond(payload, table="explanations", fmt=fmt)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Dérive (PSI/KS par feature), journal des prédictions et état vivant"""
+    if request.args.get('check'):
+        drift_monitor.check(force=True)
+    return respond({
+        "model_version": model_store.version,
+        "drift": drift_monitor.metrics(),
+        "prediction_log": prediction_log.stats(),
+        "live": live_scorer.stats(),
+        "model_cache": model_cache.stats(),
+        "admission": admission.stats(),
+        "jobs": job_queue.stats()
+    })
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    """Lance train / optimize / analytics hors du processus de l'API (202 + Location)"""
+    if kind not in JOB_KINDS:
+        return jsonify({"error": f"Tâche inconnue: {kind}", "kinds": list(JOB_KINDS)}), 404
+    params = request.get_json(silent=True) or {}
+    job, created = job_queue.submit(kind, params if isinstance(params, dict) else {})
+    response = jsonify(job)
+    # Tâche identique déjà en file ou en cours : on la renvoie au lieu d'en créer une
+    response.status_code = 202 if created else 200
+    response.headers['Location'] = f"/jobs/{job['id']}"
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Statut, avancement par étape et durées d'une tâche"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Tâche inconnue: {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"jobs": job_queue.list(request.args.get('limit', 20, type=int)), "stats": job_queue.stats()})
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Mouvements de stock / ventes : met à jour l'état et re-score les produits touchés"""
+    try:
+        data = request.get_json(silent=True)
+        events = data.get('events', []) if isinstance(data, dict) else data
+        changes = live_scorer.apply_events(events)
         return jsonify({
-            "risk_score": round(risk_score, 2),
-            "risk_level": level,
-            "recommendation": action,
-            "model_used": "real" if model else "simulation"
+            "events": len(events),
+            "rescored": len(changes),
+            "level_changes": [c for c in changes if c['risk_code'] != c['previous_code']]
         })
-        
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Événement invalide: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/live/top', methods=['GET'])
+def live_top():
+    """Produits les plus risqués de l'état vivant"""
+    k = request.args.get('k', 10, type=int)
+    return respond({"products": live_scorer.top_k(k), "stats": live_scorer.stats()}, table="products")
+
+@app.route('/priorities', methods=['GET'])
+def priorities():
+    """Top-K par perte attendue (risque x prix), lu dans l'index maintenu"""
+    k = min(request.args.get('k', 10, type=int), 1000)
+    category = request.args.get('category') or None
+    return respond({
+        "category": category,
+        "products": live_scorer.top_k(k, category),
+        "categories": live_scorer.priorities.categories()
+    }, table="products")
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """Server-Sent Events : instantané puis changements de niveau et deltas par catégorie"""
+    return Response(stream_with_context(live_feed.stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/export', methods=['GET'])
+def export():
+    """Catalogue scoré en flux (CSV / NDJSON / Parquet), bloc par bloc depuis la base d'inventaire.
+    ?dataset=products|sales|waste&format=&category=&start=&end=&product_id=&chunk_size="""
+    dataset = request.args.get('dataset', 'products')
+    if dataset not in TABLES:
+        return jsonify({"error": f"Jeu de données inconnu: {dataset}", "datasets": list(TABLES)}), 404
+    fmt = export_format(request.headers.get('Accept'), request.args.get('format'))
+    if fmt is None:
+        return jsonify({"error": f"Format non disponible: {request.args.get('format')}",
+                        "formats": export_formats()}), 406
+    # Paramètres invalides refusés (400) plutôt qu'ignorés : pas d'export complet par erreur
+    filters = {'category': request.args.get('category')}
+    try:
+        chunk_size = int(request.args.get('chunk_size', EXPORT_CHUNK_ROWS))
+    except ValueError:
+        return jsonify({"error": f"chunk_size invalide: {request.args.get('chunk_size')!r}"}), 400
+    chunk_size = min(max(chunk_size, 1), MAX_CHUNK_ROWS)
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value:
+            try:
+                # Même format que la base : comparaison lexicographique correcte
+                filters[name] = pd.Timestamp(value).strftime(DATE_FORMAT)
+            except ValueError:
+                return jsonify({"error": f"{name} invalide (date attendue): {value!r}"}), 400
+    if dataset == 'products' and request.args.get('product_id'):
+        try:
+            filters['product_id'] = int(request.args['product_id'])
+        except ValueError:
+            return jsonify({"error": f"product_id invalide: {request.args['product_id']!r}"}), 400
+    # Version figée au début : un export long ne change pas de modèle en cours de route
+    version, model = model_store.get()
+    chunks = get_store().iter_chunks(dataset, chunk_size, first_chunk=min(chunk_size, FIRST_CHUNK_ROWS),
+                                     **filters)
+    score_fn = model_scorer(model) if dataset == 'products' else None
+    return Response(stream_with_context(export_stream(chunks, fmt, score_fn)),
+                    content_type=EXPORT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{dataset}.{fmt}"',
+                             'X-Model-Version': str(version if model else 'simulation'),
+                             'X-Accel-Buffering': 'no'})
+
+@app.route('/recommend_discount', methods=['POST'])
+def recommend_discount():
+    """Remise optimale pour un lot de produits (évaluation vectorisée)"""
+    try:
+        data = request.get_json()
+        products = data.get('products', []) if isinstance(data, dict) else data
+        if not products:
+            return jsonify({"recommendations": []})
+
+        catalog = pd.DataFrame(products)
+        missing = [c for c in ('stock_quantity', 'expiration_days', 'price', 'quantity_sold')
+                   if c not in catalog.columns]
+        if missing:
+            return jsonify({"error": f"Colonnes manquantes: {missing}"}), 400
+
+        version, model = model_store.get()
+        columns = [catalog[c].to_numpy() for c in ('stock_quantity', 'expiration_days', 'price', 'quantity_sold')]
+        features = features_matrix(*columns)
+        drift_monitor.observe(features)
+        if model:
+            scores = model.predict(features)
+        else:
+            scores = heuristic_risk(*columns)
+        recommendations = get_pricing().recommend(catalog)
+        columns = {
+            "risk_score": np.round(np.asarray(scores, dtype=np.float64), 2),
+            "risk_code": risk_codes(scores),
+            "recommended_discount": recommendations['recommended_discount'].to_numpy(),
+            "expected_sold": recommendations['expected_sold'].round(1).to_numpy(),
+            "expected_revenue": recommendations['expected_revenue'].round(2).to_numpy(),
+            "revenue_gain": recommendations['revenue_gain'].round(2).to_numpy(),
+        }
+
+        fmt = response_format()
+        rows, labels = tabulate(columns, {'risk_code': {'risk_level': NIVEAUX}}, compact_requested(fmt))
+        payload = {"recommendations": rows, "model_version": version}
+        if labels:
+            payload["labels"] = labels
+        return respond(payload, table="recommendations", fmt=fmt)
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,491 @@
+# benchmarks.py - Mesures de performance des chemins critiques
+# Usage : python benchmarks.py [nom ...]   (sans argument : tous les benchmarks)
+import sys
+import time
+
+import numpy as np
+
+
+def measure_latency(fn, repeat=200, warmup=5):
+    """Latences de fn() en millisecondes (p50 / p99) sur `repeat` appels"""
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    timings *= 1000
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+    }
+
+
+def bench_scoring(n_rows=1_000_000, n_scalar=10_000):
+    """Noyau de risque : appels scalaires un par un vs un appel vectorisé"""
+    from risk_scoring import heuristic_risk, risk_codes
+
+    rng = np.random.default_rng(42)
+    stock = rng.integers(5, 150, n_rows)
+    expiration = rng.integers(1, 10, n_rows)
+    price = rng.uniform(0.5, 15.0, n_rows)
+    sold = rng.integers(0, 30, n_rows)
+
+    start = time.perf_counter()
+    for i in range(n_scalar):
+        risk_codes(heuristic_risk(stock[i], expiration[i], price[i], sold[i]))
+    scalar_us = (time.perf_counter() - start) / n_scalar * 1e6
+
+    start = time.perf_counter()
+    risk_codes(heuristic_risk(stock, expiration, price, sold))
+    vector_us = (time.perf_counter() - start) / n_rows * 1e6
+
+    print(f"   Scalaire   : {scalar_us:.2f} µs/produit ({n_scalar} appels)")
+    print(f"   Vectorisé  : {vector_us:.4f} µs/produit ({n_rows} produits)")
+    print(f"   Accélération: x{scalar_us / vector_us:.0f}")
+
+
+def _legacy_prepare_features(df):
+    """Ancienne préparation (copie, to_datetime sans format, get_dummies)"""
+    import pandas as pd
+
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df['day_of_week'] = df['date'].dt.dayofweek
+    df['month'] = df['date'].dt.month
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+    feature_columns = ['day_of_week', 'month', 'is_weekend', 'price', 'promotion', 'weather_effect']
+    category_dummies = pd.get_dummies(df['category'], prefix='cat')
+    return pd.concat([df[feature_columns], category_dummies], axis=1)
+
+
+def bench_feature_pipeline(n_rows=10_000_000):
+    """Préparation des features de demande : ancienne version vs pipeline ajusté"""
+    import pandas as pd
+    from feature_pipeline import DemandFeaturePipeline
+
+    rng = np.random.default_rng(42)
+    dates = pd.date_range('2023-01-01', periods=1095).strftime('%Y-%m-%d').to_numpy()
+    categories = np.array(['Lait', 'Pain', 'Yaourt', 'Fromage', 'Fruits', 'Légumes'], dtype=object)
+    df = pd.DataFrame({
+        'date': dates[rng.integers(0, len(dates), n_rows)],
+        'category': categories[rng.integers(0, len(categories), n_rows)],
+        'quantity_sold': rng.integers(10, 100, n_rows),
+        'price': rng.uniform(0.5, 5.0, n_rows),
+        'promotion': rng.integers(0, 2, n_rows),
+        'weather_effect': rng.uniform(0.8, 1.2, n_rows),
+    })
+
+    start = time.perf_counter()
+    legacy = _legacy_prepare_features(df)
+    legacy_s = time.perf_counter() - start
+    legacy_mb = legacy.memory_usage(deep=True).sum() / 1e6
+    del legacy
+
+    pipeline = DemandFeaturePipeline()
+    start = time.perf_counter()
+    pipeline.fit(df)
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    X = pipeline.transform(df)
+    transform_s = time.perf_counter() - start
+
+    print(f"   {n_rows:,} lignes")
+    print(f"   Ancienne préparation : {legacy_s:.2f} s, {legacy_mb:.0f} MB")
+    print(f"   Pipeline fit         : {fit_s:.2f} s")
+    print(f"   Pipeline transform   : {transform_s:.2f} s, {X.nbytes / 1e6:.0f} MB (float32)")
+
+
+def bench_replenishment(n_skus=1_000_000, n_milp=200):
+    """Commandes du lendemain : newsvendor vectorisé sur un catalogue complet vs milp"""
+    import pandas as pd
+    from replenishment import optimize_orders, optimize_orders_milp
+
+    rng = np.random.default_rng(42)
+    catalog = pd.DataFrame({
+        'forecast': rng.uniform(0, 30, n_skus),
+        'stock_quantity': rng.integers(5, 150, n_skus),
+        'expiration_days': rng.integers(1, 10, n_skus),
+        'price': rng.uniform(0.5, 15.0, n_skus),
+    })
+
+    start = time.perf_counter()
+    optimize_orders(catalog)
+    newsvendor_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    optimize_orders_milp(catalog.head(n_milp))
+    milp_s = time.perf_counter() - start
+
+    print(f"   Newsvendor : {n_skus:,} SKU en {newsvendor_s:.2f} s")
+    print(f"   MILP       : {n_milp} SKU x 50 scénarios en {milp_s:.2f} s")
+
+
+def bench_pricing(n_products=1_000_000):
+    """Remises optimales sur un catalogue complet (grille évaluée en bloc)"""
+    import pandas as pd
+    from pricing_engine import MarkdownOptimizer
+
+    rng = np.random.default_rng(42)
+    catalog = pd.DataFrame({
+        'stock_quantity': rng.integers(5, 150, n_products),
+        'quantity_sold': rng.integers(0, 30, n_products),
+        'expiration_days': rng.integers(1, 10, n_products),
+        'price': rng.uniform(0.5, 15.0, n_products),
+        'category': rng.choice(['dairy', 'meat', 'fish', 'produce'], n_products),
+    })
+    optimizer = MarkdownOptimizer({'dairy': 2.0, 'meat': 1.9, 'fish': 2.1, 'produce': 1.9})
+
+    start = time.perf_counter()
+    recommendations = optimizer.recommend(catalog)
+    elapsed = time.perf_counter() - start
+
+    print(f"   {n_products:,} produits x {len(optimizer.discount_grid)} remises en {elapsed:.2f} s")
+    print(f"   Produits remisés: {(recommendations['recommended_discount'] > 0).mean():.1%}")
+
+
+def bench_priorities(n_products=1_000_000, n_updates=100_000, k=10):
+    """Top-K par perte attendue : tri complet vs index maintenu"""
+    from priority_index import PriorityIndex
+
+    rng = np.random.default_rng(42)
+    categories = rng.choice(['laitage', 'viande', 'legumes', 'fruits', 'boulangerie'], n_products)
+    losses = rng.exponential(50.0, n_products)
+
+    start = time.perf_counter()
+    index = PriorityIndex.from_items(zip(range(n_products), categories, losses, range(n_products)))
+    build_s = time.perf_counter() - start
+
+    keys = rng.integers(0, n_products, n_updates)
+    new_losses = rng.exponential(50.0, n_updates)
+    start = time.perf_counter()
+    for key, loss in zip(keys.tolist(), new_losses.tolist()):
+        index.update(key, categories[key], loss, key)
+        losses[key] = loss
+    update_us = (time.perf_counter() - start) / n_updates * 1e6
+
+    full_sort = measure_latency(lambda: np.argsort(-losses)[:k], repeat=10, warmup=1)
+    indexed = measure_latency(lambda: index.top_k(k), repeat=200)
+    by_category = measure_latency(lambda: index.top_k(k, 'viande'), repeat=200)
+
+    print(f"   Construction : {n_products:,} produits en {build_s:.2f} s")
+    print(f"   Mise à jour  : {update_us:.1f} µs ({n_updates:,} re-scorings)")
+    print(f"   Tri complet  : p50 {full_sort['p50_ms']:.1f} ms")
+    print(f"   Index top-{k} : p50 {indexed['p50_ms']:.3f} ms (catégorie: {by_category['p50_ms']:.3f} ms)")
+
+
+def bench_explain(sizes=(1, 100, 1000)):
+    """Coût d'explication par ligne : chemins de décision (forêt) vs Shapley exact"""
+    import joblib
+    from explain import ShapleyExplainer, TreeExplainer
+    from fast_models import RatioLinearRegressor
+    from paths import MODELS_DIR
+
+    rng = np.random.default_rng(42)
+    n = max(sizes)
+    X = np.column_stack([rng.integers(5, 150, n), rng.integers(1, 10, n),
+                         rng.uniform(0.5, 15.0, n), rng.integers(0, 30, n)]).astype(np.float64)
+    forest = joblib.load(f"{MODELS_DIR}/model.joblib")
+    linear = RatioLinearRegressor().fit(X, (X[:, 0] - X[:, 3]) / X[:, 1])
+    explainers = {
+        f'Forêt ({len(forest.estimators_)} arbres)': TreeExplainer(forest),
+        'Shapley (forme fermée)': ShapleyExplainer(linear.predict, X.mean(axis=0)),
+    }
+    for name, explainer in explainers.items():
+        for size in sizes:
+            latency = measure_latency(lambda: explainer.explain(X[:size]), repeat=20, warmup=2)
+            print(f"   {name:24s} {size:5d} lignes : p50 {latency['p50_ms']:.2f} ms "
+                  f"({latency['p50_ms'] * 1000 / size:.1f} µs/ligne)")
+
+
+def bench_intervals(sizes=(1, 100, 10_000)):
+    """Intervalles P10/P50/P90 (forêt empilée) vs prédiction ponctuelle et boucle sur les arbres"""
+    import joblib
+    from packed_forest import PackedForest
+    from paths import MODELS_DIR
+
+    rng = np.random.default_rng(42)
+    n = max(sizes)
+    X = np.column_stack([rng.integers(5, 150, n), rng.integers(1, 10, n),
+                         rng.uniform(0.5, 15.0, n), rng.integers(0, 30, n)]).astype(np.float64)
+    model = joblib.load(f"{MODELS_DIR}/model.joblib")
+    packed = PackedForest(model)
+
+    def tree_loop(rows):
+        per_tree = np.column_stack([estimator.predict(rows.astype(np.float32)) for estimator in model.estimators_])
+        return np.percentile(per_tree, (10, 50, 90), axis=1)
+
+    variants = {
+        'Ponctuelle (predict)': model.predict,
+        'Boucle sur les arbres': tree_loop,
+        'Forêt empilée P10-P90': packed.predict_quantiles,
+    }
+    for size in sizes:
+        repeat = 10 if size >= 10_000 else 50
+        for name, fn in variants.items():
+            latency = measure_latency(lambda: fn(X[:size]), repeat=repeat, warmup=2)
+            print(f"   {size:6d} lignes | {name:22s} : p50 {latency['p50_ms']:.2f} ms")
+
+
+def bench_serialization(sizes=(100, 10_000, 100_000)):
+    """Temps d'encodage et taille des réponses /predict_batch par format"""
+    import gzip
+    import json
+    from risk_scoring import NIVEAUX, risk_codes
+    from serialization import ARROW, JSON, MSGPACK, available_formats, encode, tabulate
+
+    actions = ("Niveau normal", "Surveillance renforcée", "Promotion 30% recommandée", "Promotion 50% urgente")
+    labels = {'risk_code': {'risk_level': NIVEAUX, 'recommendation': actions}}
+    rng = np.random.default_rng(42)
+
+    def payload(columns, compact):
+        predictions, names = tabulate(columns, labels, compact)
+        return {'predictions': predictions, 'labels': names, 'model_version': 'v1'}
+
+    variants = {
+        'jsonify (stdlib, lignes)': lambda c: json.dumps(payload(c, False), sort_keys=True).encode(),
+        'orjson, lignes': lambda c: encode(payload(c, False), JSON),
+        'orjson, compact': lambda c: encode(payload(c, True), JSON),
+    }
+    if MSGPACK in available_formats():
+        variants['msgpack, compact'] = lambda c: encode(payload(c, True), MSGPACK)
+    if ARROW in available_formats():
+        variants['arrow, compact'] = lambda c: encode(payload(c, True), ARROW, 'predictions')
+
+    for size in sizes:
+        scores = rng.gamma(2.0, 4.0, size)
+        columns = {'risk_score': np.round(scores, 2), 'risk_code': risk_codes(scores)}
+        for name, fn in variants.items():
+            body = fn(columns)
+            latency = measure_latency(lambda: fn(columns), repeat=10 if size >= 100_000 else 50, warmup=2)
+            print(f"   {size:7d} lignes | {name:24s} : p50 {latency['p50_ms']:8.2f} ms, "
+                  f"{len(body) / 1024:9.1f} Ko (gzip {len(gzip.compress(body, 5)) / 1024:8.1f} Ko)")
+
+
+def bench_overload(n_requests=1500, clients=32, slo_ms=25.0, port=8765):
+    """Test de surcharge local : /predict sans limiteur, en mode dégradé et en délestage (429).
+    L'API tourne dans un processus séparé pour que les clients ne partagent pas son GIL."""
+    import os
+    import subprocess
+    import threading
+    from collections import Counter
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    url = f"http://127.0.0.1:{port}/predict"
+    body = {'stock_quantity': 80, 'expiration_days': 2, 'price': 3.5, 'quantity_sold': 5}
+    sessions = threading.local()
+
+    def call(_):
+        session = getattr(sessions, 'session', None) or requests.Session()
+        sessions.session = session
+        start = time.perf_counter()
+        response = session.post(url, json=body)
+        elapsed = time.perf_counter() - start
+        used = response.json().get('model_used') if response.status_code == 200 else str(response.status_code)
+        return elapsed, used
+
+    settings = {
+        'sans limiteur': {'ADMISSION_MAX_CONCURRENCY': '10000', 'LATENCY_SLO_MS': '1e9'},
+        f'dégradé (SLO {slo_ms:g} ms)': {'ADMISSION_MAX_CONCURRENCY': '2', 'LATENCY_SLO_MS': str(slo_ms),
+                                         'OVERLOAD_MODE': 'degrade'},
+        f'délestage (SLO {slo_ms:g} ms)': {'ADMISSION_MAX_CONCURRENCY': '2', 'LATENCY_SLO_MS': str(slo_ms),
+                                           'OVERLOAD_MODE': 'shed'},
+    }
+    for name, config in settings.items():
+        env = dict(os.environ, FLASK_PORT=str(port), PYTHONWARNINGS='ignore', **config)
+        server = subprocess.Popen([sys.executable, 'api_flask_correct.py'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(200):  # Attente du démarrage (chargement des modèles)
+                try:
+                    requests.get(url.replace('/predict', '/'), timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                results = list(pool.map(call, range(n_requests)))
+        finally:
+            server.terminate()
+            server.wait()
+        latencies = np.array([elapsed for elapsed, _ in results]) * 1000
+        outcomes = Counter(used for _, used in results)
+        print(f"   {name:24s} : p50 {np.percentile(latencies, 50):6.1f} ms, "
+              f"p99 {np.percentile(latencies, 99):6.1f} ms | {dict(outcomes)}")
+
+
+def bench_jobs(kind='optimize', port=8766, idle_requests=300):
+    """Latence de /predict au repos puis pendant une tâche d'entraînement (POST /jobs),
+    worker en priorité normale (nice 0) puis basse (JOB_NICE par défaut)"""
+    import os
+    import subprocess
+
+    import requests
+
+    from jobs import JOB_NICE
+
+    base = f"http://127.0.0.1:{port}"
+    body = {'stock_quantity': 80, 'expiration_days': 2, 'price': 3.5, 'quantity_sold': 5}
+
+    def latencies(session, until):
+        values = []
+        while not until(len(values)):
+            start = time.perf_counter()
+            session.post(f"{base}/predict", json=body)
+            values.append((time.perf_counter() - start) * 1000)
+        return np.array(values)
+
+    for label, nice in (('nice 0', 0), (f'nice {JOB_NICE}', JOB_NICE)):
+        env = dict(os.environ, FLASK_PORT=str(port), PYTHONWARNINGS='ignore', JOB_NICE=str(nice))
+        server = subprocess.Popen([sys.executable, 'api_flask_correct.py'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            session = requests.Session()
+            for _ in range(200):  # Attente du démarrage (chargement des modèles)
+                try:
+                    session.get(f"{base}/", timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+            if nice == 0:
+                idle = latencies(session, lambda n: n >= idle_requests)
+                print(f"   {'au repos':18s} : p50 {np.percentile(idle, 50):6.2f} ms, "
+                      f"p99 {np.percentile(idle, 99):6.2f} ms")
+            job = session.post(f"{base}/jobs/{kind}", json={'force': True}).json()
+            last_check = [0]
+
+            def finished(n):
+                if n - last_check[0] < 20:
+                    return False
+                last_check[0] = n
+                return session.get(f"{base}/jobs/{job['id']}").json()['status'] not in ('queued', 'running')
+
+            busy = latencies(session, finished)
+            state = session.get(f"{base}/jobs/{job['id']}").json()
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"   {kind + ' ' + label:18s} : p50 {np.percentile(busy, 50):6.2f} ms, "
+              f"p99 {np.percentile(busy, 99):6.2f} ms | tâche {state['status']} en {state['duration_s']:.1f} s")
+
+
+def bench_lots(n_products=1_000_000, n_loop=10_000, lots_per_product=3):
+    """Gaspillage attendu par lots FIFO : boucle par produit et par jour vs calcul tableau"""
+    import pandas as pd
+    from lot_inventory import LotInventory
+
+    rng = np.random.default_rng(42)
+    n_lots = n_products * lots_per_product
+    lots = pd.DataFrame({'product_id': rng.integers(0, n_products, n_lots),
+                         'stock_quantity': rng.integers(1, 60, n_lots),
+                         'expiration_days': rng.integers(1, 15, n_lots)})
+    inventory = LotInventory.from_frame(lots, 0)
+    demand = rng.uniform(1, 30, len(inventory))
+
+    def loop_waste(row):
+        """Simulation jour par jour : vente FIFO puis retrait des lots périmés"""
+        n = int(inventory.count[row])
+        quantity = inventory.quantity[row, :n].astype(np.float64).tolist()
+        expiry = inventory.expiry[row, :n].tolist()
+        waste = 0.0
+        for day in range(max(expiry, default=0)):
+            need = demand[row]
+            for i in range(n):
+                taken = min(need, quantity[i])
+                quantity[i] -= taken
+                need -= taken
+            for i in range(n):
+                if expiry[i] == day + 1:
+                    waste += quantity[i]
+                    quantity[i] = 0.0
+        return waste
+
+    start = time.perf_counter()
+    reference = [loop_waste(row) for row in range(n_loop)]
+    loop_us = (time.perf_counter() - start) / n_loop * 1e6
+    start = time.perf_counter()
+    waste = inventory.expected_waste(demand, 0)
+    vector_us = (time.perf_counter() - start) / len(inventory) * 1e6
+    print(f"   Boucle     : {loop_us:.1f} µs/produit ({n_loop:,} produits)")
+    print(f"   Vectorisé  : {vector_us:.3f} µs/produit ({len(inventory):,} produits, {n_lots:,} lots)")
+    print(f"   Écart max  : {np.abs(waste[:n_loop] - reference).max():.2e} | Accélération: x{loop_us / vector_us:.0f}")
+
+
+def bench_export(n_rows=1_000_000, port=8767, chunk_size=50_000):
+    """GET /export sur n_rows produits scorés : premier octet, débit et mémoire maximale du serveur"""
+    import os
+    import subprocess
+    import tempfile
+
+    import requests
+
+    from export import export_formats
+    from inventory_store import InventoryStore
+    from schema import synthetic_frame
+
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, db_path = os.path.join(tmp, 'synthetic_data.csv'), os.path.join(tmp, 'inventory.db')
+        synthetic_frame(n_rows).to_csv(csv_path, index=False)
+        InventoryStore(db_path).load_csv('products', csv_path)
+        env = dict(os.environ, FLASK_PORT=str(port), PYTHONWARNINGS='ignore', INVENTORY_DB=db_path)
+        server = subprocess.Popen([sys.executable, 'api_flask_correct.py'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        def peak_mb():
+            """VmHWM du serveur (Linux), None ailleurs"""
+            try:
+                with open(f'/proc/{server.pid}/status') as f:
+                    return next(int(line.split()[1]) / 1024 for line in f if line.startswith('VmHWM'))
+            except OSError:
+                return None
+
+        try:
+            session = requests.Session()
+            for _ in range(200):  # Attente du démarrage (chargement des modèles)
+                try:
+                    session.get(f"{base}/", timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+            print(f"   Serveur prêt : {peak_mb() or 0:.0f} Mo (VmHWM)")
+            for fmt in export_formats():
+                start = time.perf_counter()
+                size, first_byte = 0, None
+                with session.get(f"{base}/export", params={'format': fmt, 'chunk_size': chunk_size},
+                                 stream=True) as response:
+                    for data in response.iter_content(chunk_size=1 << 16):
+                        first_byte = first_byte or time.perf_counter() - start
+                        size += len(data)
+                elapsed = time.perf_counter() - start
+                print(f"   {fmt:8s}: premier octet {first_byte * 1000:6.1f} ms | {size / 1e6:7.1f} Mo en "
+                      f"{elapsed:5.1f} s ({size / 1e6 / elapsed:5.1f} Mo/s, {n_rows / elapsed:,.0f} lignes/s) | "
+                      f"serveur max {peak_mb() or 0:.0f} Mo")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+BENCHMARKS = {
+    'scoring': bench_scoring,
+    'features': bench_feature_pipeline,
+    'replenishment': bench_replenishment,
+    'pricing': bench_pricing,
+    'priorities': bench_priorities,
+    'explain': bench_explain,
+    'intervals': bench_intervals,
+    'serialization': bench_serialization,
+    'overload': bench_overload,
+    'jobs': bench_jobs,
+    'lots': bench_lots,
+    'export': bench_export,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"⏱️  BENCHMARK {name}")
+        BENCHMARKS[name]()
@@ -0,0 +1,248 @@
+# drift_monitor.py - Surveillance de dérive des features servies (mémoire constante)
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from paths import DATA_DIR
+from risk_scoring import FEATURES, features_matrix
+from schema import load_dataset
+
+N_BINS = 10
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+EPSILON = 1e-4  # Évite log(0) quand un bin est vide
+
+
+def reference_profile(X, n_bins=N_BINS):
+    """Esquisses de référence (JSON) calculées sur les features d'entraînement.
+
+    Les bornes des bins sont les quantiles de la référence : chaque bin y
+    contient ~1/n_bins des valeurs, les deux bins extrêmes sont ouverts.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    profile = {}
+    for j, name in enumerate(FEATURES):
+        values = X[:, j][~np.isnan(X[:, j])]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        sketch = FeatureSketch(edges)
+        sketch.update(values)
+        profile[name] = sketch.to_dict()
+    return profile
+
+
+class FeatureSketch:
+    """Histogramme à bornes fixes + min/max/somme/valeurs manquantes"""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.missing = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.total = 0.0
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        nan = np.isnan(values)
+        self.missing += int(nan.sum())
+        values = values[~nan]
+        if len(values) == 0:
+            return
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side='right'),
+                                   minlength=len(self.counts))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.total += float(values.sum())
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.missing += other.missing
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.total += other.total
+
+    def proportions(self):
+        return self.counts / max(self.count, 1)
+
+    def quantile(self, q):
+        """Quantile approché par interpolation linéaire dans les bins"""
+        if self.count == 0:
+            return None
+        lows = np.concatenate([[self.minimum], self.edges])
+        highs = np.concatenate([self.edges, [self.maximum]])
+        cumulative = np.cumsum(self.counts) / self.count
+        b = min(int(np.searchsorted(cumulative, q)), len(cumulative) - 1)
+        before = cumulative[b - 1] if b > 0 else 0.0
+        within = (q - before) / max(cumulative[b] - before, 1e-12)
+        low, high = max(lows[b], self.minimum), min(highs[b], self.maximum)
+        return float(low + within * max(high - low, 0))
+
+    def to_dict(self):
+        return {
+            'edges': self.edges.tolist(), 'counts': self.counts.tolist(), 'missing': self.missing,
+            'min': self.minimum, 'max': self.maximum, 'sum': self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['edges'])
+        sketch.counts = np.asarray(data['counts'], dtype=np.int64)
+        sketch.missing = data.get('missing', 0)
+        sketch.minimum = data['min']
+        sketch.maximum = data['max']
+        sketch.total = data.get('sum', 0.0)
+        return sketch
+
+
+def psi(reference, current):
+    """Population Stability Index entre deux histogrammes de mêmes bornes"""
+    ref = np.maximum(reference.proportions(), EPSILON)
+    cur = np.maximum(current.proportions(), EPSILON)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks(reference, current):
+    """Statistique de Kolmogorov-Smirnov évaluée aux bornes des bins"""
+    return float(np.max(np.abs(np.cumsum(reference.proportions()) - np.cumsum(current.proportions()))))
+
+
+class DriftMonitor:
+    """Esquisses des requêtes servies comparées aux esquisses d'entraînement.
+
+    observe() ne fait qu'un searchsorted + bincount par feature ; un thread
+    calcule PSI/KS toutes les `interval` secondes sur la fenêtre écoulée
+    (si elle contient assez de requêtes), puis la fusionne dans le cumul.
+    reference_loader() -> (version, profil) est rappelé quand version_fn()
+    signale un changement de modèle actif ; sans profil (None), PSI/KS sont
+    suspendus et le chargement est retenté à chaque intervalle.
+    """
+
+    def __init__(self, reference_loader, version_fn=None, interval=60.0, min_count=100):
+        self.reference_loader = reference_loader
+        self.version_fn = version_fn
+        self.interval = interval
+        self.min_count = min_count
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.latest = {}
+        self.checks = 0
+        self._load_reference()
+
+    def _load_reference(self):
+        version, profile = self.reference_loader()
+        with self._lock:
+            self.version = version
+            if profile is None:
+                self.reference = self.window = self.cumulative = None
+                return
+            self.reference = {name: FeatureSketch.from_dict(profile[name]) for name in FEATURES}
+            self.window = {name: FeatureSketch(s.edges) for name, s in self.reference.items()}
+            self.cumulative = {name: FeatureSketch(s.edges) for name, s in self.reference.items()}
+
+    def observe(self, X):
+        """Enregistre un lot de features servies (n, 4) dans l'ordre FEATURES"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        with self._lock:
+            if self.reference is None:
+                return
+            for j, name in enumerate(FEATURES):
+                self.window[name].update(X[:, j])
+
+    def check(self, force=False):
+        """Calcule PSI/KS sur la fenêtre et la fusionne dans le cumul"""
+        with self._lock:
+            if self.reference is None:
+                return self.latest
+            window_count = self.window[FEATURES[0]].count
+            if window_count < self.min_count and not force:
+                return self.latest
+            window, self.window = self.window, {name: FeatureSketch(s.edges) for name, s in self.window.items()}
+            for name in FEATURES:
+                self.cumulative[name].merge(window[name])
+            report = {'model_version': self.version, 'window_count': window_count,
+                      'checked_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'features': {}}
+            for name in FEATURES:
+                ref, cur = self.reference[name], window[name]
+                score = psi(ref, cur) if cur.count else None
+                report['features'][name] = {
+                    'psi': score,
+                    'ks': ks(ref, cur) if cur.count else None,
+                    'status': (None if score is None else 'drift' if score > PSI_DRIFT
+                               else 'warning' if score > PSI_WARNING else 'ok'),
+                    'missing': cur.missing,
+                    'min': cur.minimum if cur.count else None,
+                    'max': cur.maximum if cur.count else None,
+                    'p50': cur.quantile(0.5),
+                    'reference_min': ref.minimum,
+                    'reference_max': ref.maximum,
+                    'reference_p50': ref.quantile(0.5),
+                }
+            self.latest = report
+            self.checks += 1
+            return report
+
+    def metrics(self):
+        with self._lock:
+            if self.reference is None:
+                return {'model_version': self.version, 'checks': self.checks, 'pending': 0,
+                        'latest': self.latest, 'served': {}, 'reference': None}
+            cumulative = {name: {'count': s.count, 'missing': s.missing,
+                                 'min': s.minimum if s.count else None,
+                                 'max': s.maximum if s.count else None,
+                                 'p50': s.quantile(0.5), 'p99': s.quantile(0.99)}
+                          for name, s in self.cumulative.items()}
+            return {'model_version': self.version, 'checks': self.checks,
+                    'pending': self.window[FEATURES[0]].count,
+                    'latest': self.latest, 'served': cumulative}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.reference is None:
+                    self._load_reference()  # Profil de référence pas encore disponible
+                elif self.version_fn is not None and self.version_fn() != self.version:
+                    self.check(force=True)  # Clôt la fenêtre de l'ancien modèle
+                    self._load_reference()
+                else:
+                    self.check()
+            except Exception as e:
+                print(f"⚠️  Contrôle de dérive en échec: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name='drift-monitor')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def csv_reference(path=os.path.join(DATA_DIR, 'synthetic_data.csv')):
+    """Profil de référence recalculé sur le CSV d'entraînement (modèles sans profil)"""
+    df = load_dataset(path)
+    return reference_profile(features_matrix(*(df[name].to_numpy() for name in FEATURES)))
+
+
+if __name__ == '__main__':
+    print("📈 CONTRÔLE DE DÉRIVE")
+    reference = csv_reference()
+    monitor = DriftMonitor(lambda: ('csv', reference), min_count=1)
+
+    # Trafic simulé : prix envoyés en CFA (100-50000) au lieu d'euros
+    rng = np.random.default_rng(42)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    monitor.observe(features_matrix(rng.integers(10, 150, n), rng.integers(1, 10, n),
+                                    rng.uniform(100, 50000, n), rng.integers(0, 30, n)))
+    report = monitor.check()
+    for name, values in report['features'].items():
+        print(f"   {name}: PSI {values['psi']:.3f}, KS {values['ks']:.3f} -> {values['status']} "
+              f"(p50 {values['p50']:.1f} vs {values['reference_p50']:.1f})")
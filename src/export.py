@@ -0,0 +1,160 @@
+# export.py - Export en flux du catalogue scoré (CSV, NDJSON, Parquet) à mémoire constante
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from risk_scoring import FEATURES, NIVEAUX, features_matrix, heuristic_risk, risk_codes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+CSV, NDJSON, PARQUET = 'csv', 'ndjson', 'parquet'
+EXPORT_MIMETYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    NDJSON: 'application/x-ndjson',
+    PARQUET: 'application/vnd.apache.parquet',
+}
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 50_000))
+MAX_CHUNK_ROWS = 500_000
+FIRST_CHUNK_ROWS = 1_000  # Premier bloc réduit : les premiers octets partent sans attendre un bloc entier
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'  # Même format que la base d'inventaire
+RISK_LEVELS = pd.CategoricalDtype(NIVEAUX)
+
+
+def export_formats():
+    return [fmt for fmt in EXPORT_MIMETYPES if fmt != PARQUET or PARQUET_AVAILABLE]
+
+
+def export_format(accept=None, requested=None):
+    """?format= en priorité, sinon type MIME exact de l'en-tête Accept, CSV par défaut.
+    None si le format demandé n'est pas disponible."""
+    formats = export_formats()
+    if requested:
+        return requested if requested in formats else None
+    for item in (accept or '').split(','):
+        mimetype = item.split(';')[0].strip()
+        for fmt in formats:
+            if EXPORT_MIMETYPES[fmt].split(';')[0] == mimetype:
+                return fmt
+    return CSV
+
+
+def model_scorer(model):
+    """Fonction de score par bloc : modèle actif en float32, heuristique sans modèle"""
+    if model is None:
+        return lambda X: heuristic_risk(*X.T)
+    return lambda X: model.predict(X)
+
+
+def score_chunk(chunk, score_fn):
+    """Ajoute risk_score / risk_code / risk_level aux blocs qui ont les FEATURES"""
+    if score_fn is None or not all(name in chunk.columns for name in FEATURES):
+        return chunk
+    X = features_matrix(*(chunk[name].to_numpy() for name in FEATURES), dtype=np.float32)
+    scores = np.asarray(score_fn(X), dtype=np.float32) if len(chunk) else np.empty(0, dtype=np.float32)
+    codes = risk_codes(scores) if len(chunk) else np.empty(0, dtype=np.int8)
+    return chunk.assign(
+        risk_score=scores.astype(np.float64).round(2),
+        risk_code=codes,
+        risk_level=pd.Categorical.from_codes(codes, dtype=RISK_LEVELS),
+    )
+
+
+def encode_csv(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, date_format=DATE_FORMAT).encode('utf-8')
+        header = False
+
+
+def encode_ndjson(chunks):
+    for chunk in chunks:
+        if len(chunk):
+            # 6 décimales : précision utile des colonnes float32 (pas de 11.8500003815)
+            text = chunk.to_json(orient='records', lines=True, date_format='iso', force_ascii=False,
+                                 double_precision=6)
+            yield (text if text.endswith('\n') else text + '\n').encode('utf-8')
+
+
+class _DrainSink(io.RawIOBase):
+    """Fichier en écriture seule dont on retire les octets au fur et à mesure"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def encode_parquet(chunks, compression='zstd'):
+    """Un groupe de lignes Parquet par bloc, envoyé dès qu'il est écrit (pied de page à la fin)"""
+    sink, writer, schema = _DrainSink(), None, None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False).replace_schema_metadata(None)
+            if writer is None:
+                # Schéma du premier bloc (les blocs suivants y sont convertis)
+                schema = table.schema
+                writer = pq.ParquetWriter(sink, schema, compression=compression)
+            if table.num_rows:
+                writer.write_table(table.cast(schema))
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {CSV: encode_csv, NDJSON: encode_ndjson, PARQUET: encode_parquet}
+
+
+def export_stream(chunks, fmt=CSV, score_fn=None):
+    """Générateur d'octets : chaque bloc est scoré, encodé puis libéré avant le suivant"""
+    scored = (score_chunk(chunk, score_fn) for chunk in chunks)
+    for data in ENCODERS[fmt](scored):
+        if data:
+            yield data
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    import joblib
+
+    from inventory_store import get_store
+    from paths import MODELS_DIR
+
+    fmt = sys.argv[1] if len(sys.argv) > 1 else CSV
+    print(f"📤 EXPORT DU CATALOGUE SCORÉ ({fmt})")
+    store = get_store()
+    model = joblib.load(os.path.join(MODELS_DIR, 'model.joblib'))
+    start = time.perf_counter()
+    size, first_byte = 0, None
+    chunks = store.iter_chunks('products', EXPORT_CHUNK_ROWS, first_chunk=FIRST_CHUNK_ROWS)
+    for data in export_stream(chunks, fmt, model_scorer(model)):
+        first_byte = first_byte or time.perf_counter() - start
+        size += len(data)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {store.count('products'):,} lignes, {size / 1e6:.2f} Mo en {elapsed * 1000:.0f} ms "
+          f"(premier octet après {first_byte * 1000:.1f} ms)")
@@ -0,0 +1,31 @@
+# fast_models.py - Modèles légers pour le scoring à faible latence
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+
+
+class RatioLinearRegressor(RegressorMixin, BaseEstimator):
+    """Régression linéaire sur des features dérivées de la péremption.
+
+    La cible waste_risk vaut (stock - ventes) / péremption : une combinaison
+    linéaire de stock/péremption et ventes/péremption la reproduit, pour un
+    artefact de quelques octets et une prédiction en un produit matriciel.
+    Colonnes attendues : stock_quantity, expiration_days, price, quantity_sold.
+    """
+
+    def _engineer(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        stock, price, sold = X[:, 0], X[:, 2], X[:, 3]
+        inv_expiration = 1.0 / np.maximum(X[:, 1], 1)
+        return np.column_stack([stock * inv_expiration, sold * inv_expiration, price, inv_expiration])
+
+    def fit(self, X, y):
+        Z = self._engineer(X)
+        A = np.column_stack([Z, np.ones(len(Z))])
+        solution, *_ = np.linalg.lstsq(A, np.asarray(y, dtype=np.float64), rcond=None)
+        self.coef_ = solution[:-1]
+        self.intercept_ = float(solution[-1])
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X):
+        return self._engineer(X) @ self.coef_ + self.intercept_
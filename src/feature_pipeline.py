@@ -0,0 +1,267 @@
+# feature_pipeline.py - Préparation vectorisée des features de demande
+import numpy as np
+import pandas as pd
+
+# Anciens noms de colonnes (données françaises) -> noms attendus
+COLUMN_ALIASES = {
+    'Date': 'date',
+    'Produit': 'category',
+    'Ventes': 'quantity_sold',
+    'Prix': 'price',
+}
+
+CALENDAR_FEATURES = ['day_of_week', 'month', 'is_weekend']
+NUMERIC_FEATURES = ['price', 'promotion', 'weather_effect']
+NUMERIC_DEFAULTS = {'promotion': 0.0, 'weather_effect': 1.0}
+
+# Historique des ventes par produit (ou catégorie) : fenêtres en jours observés
+HISTORY_FEATURES = ['sales_lag_1', 'sales_lag_7', 'sales_mean_7', 'sales_mean_28', 'days_since_promo']
+HISTORY_WINDOW = 28
+MISSING = -1.0  # Historique insuffisant
+
+
+def history_key(df):
+    """Clé de l'historique : le produit s'il existe, sinon la catégorie"""
+    return 'product' if 'product' in df.columns else 'category'
+
+
+def _day_numbers(dates, date_format='ISO8601'):
+    """Dates -> numéros de jour entiers (parsing sur les dates distinctes)"""
+    codes, uniques = pd.factorize(dates, sort=False)
+    days = pd.to_datetime(pd.Index(uniques), format=date_format).normalize()
+    return (days.to_numpy().astype('datetime64[D]').astype(np.int64))[codes]
+
+
+def _daily(keys, day, sales, promotion):
+    """Agrège les observations par (clé, jour) : ventes sommées, promo si au moins une.
+    Retourne le tableau journalier trié par (clé, jour) et, pour chaque ligne, sa position."""
+    frame = pd.DataFrame({'key': keys, 'day': day, 'quantity_sold': sales, 'promotion': promotion})
+    grouped = frame.groupby(['key', 'day'], sort=True)
+    daily = grouped.agg(quantity_sold=('quantity_sold', 'sum'), promotion=('promotion', 'max')).reset_index()
+    return daily, grouped.ngroup().to_numpy()
+
+
+def add_history_features(df, key=None, date_format='ISO8601'):
+    """Features d'historique (n, 5) alignées sur df, sans fuite du jour courant.
+
+    Les ventes sont d'abord agrégées par (clé, jour) : toutes les lignes d'un
+    même jour reçoivent les mêmes features, calculées sur les jours précédents
+    seulement (shift/rolling groupés vectorisés sur la série journalière).
+    """
+    key = key or history_key(df)
+    promotion = df['promotion'].to_numpy() if 'promotion' in df.columns else np.zeros(len(df))
+    daily, positions = _daily(pd.factorize(df[key])[0], _day_numbers(df['date'], date_format),
+                              df['quantity_sold'].to_numpy(dtype=np.float64), promotion)
+
+    groups = daily['key'].to_numpy()
+    sales = daily['quantity_sold']
+    previous = sales.groupby(groups).shift(1)
+    lag_7 = sales.groupby(groups).shift(7)
+    mean_7 = previous.groupby(groups).rolling(7, min_periods=1).mean().reset_index(level=0, drop=True)
+    mean_28 = previous.groupby(groups).rolling(HISTORY_WINDOW, min_periods=1).mean().reset_index(level=0, drop=True)
+
+    day = daily['day'].astype(np.float64)
+    promo_day = day.where(daily['promotion'] == 1)
+    last_promo = promo_day.groupby(groups).shift(1).groupby(groups).ffill()
+    days_since_promo = day - last_promo
+
+    features = np.column_stack([previous, lag_7, mean_7, mean_28, days_since_promo]).astype(np.float32)
+    features[np.isnan(features)] = MISSING
+    return features[positions]
+
+
+class _Window:
+    """Fenêtre circulaire des dernières ventes d'un produit"""
+    __slots__ = ('sales', 'head', 'count', 'sum_7', 'sum_28', 'last_day', 'last_promo_day')
+
+    def __init__(self):
+        self.sales = np.zeros(HISTORY_WINDOW, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+        self.sum_7 = 0.0
+        self.sum_28 = 0.0
+        self.last_day = None
+        self.last_promo_day = None
+
+    def ago(self, k):
+        """Ventes du k-ième jour observé en arrière (k=1 : le dernier)"""
+        return self.sales[(self.head - k) % HISTORY_WINDOW]
+
+    def push(self, quantity):
+        if self.count >= 7:
+            self.sum_7 -= self.ago(7)
+        if self.count >= HISTORY_WINDOW:
+            self.sum_28 -= self.ago(HISTORY_WINDOW)
+        self.sales[self.head] = quantity
+        self.head = (self.head + 1) % HISTORY_WINDOW
+        self.count += 1
+        self.sum_7 += quantity
+        self.sum_28 += quantity
+
+    def add(self, quantity):
+        """Ajoute des ventes au dernier jour de la fenêtre (même jour)"""
+        self.sales[(self.head - 1) % HISTORY_WINDOW] += quantity
+        self.sum_7 += quantity
+        self.sum_28 += quantity
+
+
+class HistoryState:
+    """État incrémental par produit pour le service : O(1) par mise à jour.
+
+    Reproduit add_history_features sans relire l'historique : on garde les
+    ventes des 28 derniers jours observés, deux sommes glissantes et le jour
+    de la dernière promo ; plusieurs ventes d'un même jour sont cumulées.
+    """
+
+    def __init__(self, key='category'):
+        self.key = key
+        self._windows = {}
+
+    @classmethod
+    def from_frame(cls, df, key=None, date_format='ISO8601'):
+        """Initialise l'état avec les HISTORY_WINDOW dernières observations de chaque produit"""
+        state = cls(key or history_key(df))
+        promotion = df['promotion'].to_numpy() if 'promotion' in df.columns else np.zeros(len(df))
+        frame, _ = _daily(df[state.key].to_numpy(), _day_numbers(df['date'], date_format),
+                          df['quantity_sold'].to_numpy(dtype=np.float64), promotion)
+
+        # Dernière promotion sur tout l'historique, ventes sur la fenêtre seulement
+        promos = frame[frame['promotion'] == 1].groupby('key')['day'].max()
+        for key, rows in frame.groupby('key', sort=False).tail(HISTORY_WINDOW).groupby('key', sort=False):
+            window = state._windows.setdefault(key, _Window())
+            for quantity in rows['quantity_sold'].to_numpy():
+                window.push(quantity)
+            window.last_day = int(rows['day'].iloc[-1])
+            if key in promos.index:
+                window.last_promo_day = int(promos[key])
+        return state
+
+    def update(self, key, date, quantity_sold, promotion=0):
+        """Ajoute les ventes réalisées à la fenêtre du produit (cumulées si même jour)"""
+        window = self._windows.setdefault(key, _Window())
+        day = int(pd.Timestamp(date).normalize().value // 86_400_000_000_000)
+        if window.count and window.last_day == day:
+            window.add(float(quantity_sold))
+        else:
+            window.push(float(quantity_sold))
+        window.last_day = day
+        if promotion:
+            window.last_promo_day = day
+
+    def features(self, key, date):
+        """Vecteur HISTORY_FEATURES pour une prévision à la date donnée"""
+        window = self._windows.get(key)
+        if window is None or window.count == 0:
+            return np.full(len(HISTORY_FEATURES), MISSING, dtype=np.float32)
+        day = int(pd.Timestamp(date).normalize().value // 86_400_000_000_000)
+        return np.array([
+            window.ago(1),
+            window.ago(7) if window.count >= 7 else MISSING,
+            window.sum_7 / min(window.count, 7),
+            window.sum_28 / min(window.count, HISTORY_WINDOW),
+            day - window.last_promo_day if window.last_promo_day is not None else MISSING,
+        ], dtype=np.float32)
+
+    def __len__(self):
+        return len(self._windows)
+
+
+class DemandFeaturePipeline:
+    """Pipeline ajusté : calendrier, numériques et code de catégorie en float32.
+
+    - les dates sont parsées avec un format explicite, une seule fois par date
+      distincte ; la table calendrier est mise en cache par jour entre les
+      appels (non sérialisée avec le pipeline) ;
+    - la catégorie devient un code entier (catégories figées au fit) au lieu
+      de colonnes get_dummies denses ; une catégorie inconnue vaut -1 ;
+    - la sortie est une matrice numpy float32 contiguë ;
+    - avec use_history, les features d'historique sont calculées sur le
+      DataFrame (entraînement) ou lues dans un HistoryState (service).
+    """
+
+    def __init__(self, date_format='ISO8601', use_history=False):
+        self.date_format = date_format
+        self.use_history = use_history
+        self.categories_ = None
+        self.history_key_ = None
+        self.feature_names_ = CALENDAR_FEATURES + NUMERIC_FEATURES + ['category_code']
+        if use_history:
+            self.feature_names_ = self.feature_names_ + HISTORY_FEATURES
+        self._reset_calendar()
+
+    def _reset_calendar(self):
+        self._calendar_days = pd.DatetimeIndex([])
+        self._calendar_rows = np.empty((0, 3), dtype=np.float32)
+
+    def __getstate__(self):
+        # Le cache calendrier dépend des données vues : il n'est pas sauvegardé avec le modèle
+        state = self.__dict__.copy()
+        for name in ('_calendar_days', '_calendar_rows', '_calendar_cache'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        state.pop('_calendar_cache', None)  # Anciens pipelines : cache indexé par date brute
+        self.__dict__.update(state)
+        self._reset_calendar()
+
+    def normalize(self, df):
+        """Renomme les colonnes alternatives sans copier le DataFrame si inutile"""
+        renames = {old: new for old, new in COLUMN_ALIASES.items()
+                   if old in df.columns and new not in df.columns}
+        return df.rename(columns=renames) if renames else df
+
+    def _calendar(self, dates):
+        """Features calendrier (n, 3) : parsing sur les dates distinctes, cache par jour"""
+        codes, uniques = pd.factorize(dates, sort=False)
+        days = pd.to_datetime(pd.Index(uniques), format=self.date_format).normalize()
+        positions = self._calendar_days.get_indexer(days)
+        if (positions < 0).any():
+            new_days = days[positions < 0].unique()
+            day_of_week = new_days.dayofweek.to_numpy()
+            rows = np.column_stack([day_of_week, new_days.month.to_numpy(), day_of_week >= 5])
+            self._calendar_days = self._calendar_days.append(new_days)
+            self._calendar_rows = np.vstack([self._calendar_rows, rows.astype(np.float32)])
+            positions = self._calendar_days.get_indexer(days)
+        return self._calendar_rows[positions][codes]
+
+    def fit(self, df):
+        df = self.normalize(df)
+        # astype(str) : index simple même si la colonne est de type category
+        self.categories_ = pd.Index(pd.unique(df['category'])).astype(str).sort_values()
+        self.history_key_ = history_key(df)
+        return self
+
+    def transform(self, df, history=None):
+        if self.categories_ is None:
+            raise ValueError("Pipeline non ajusté : appeler fit() d'abord")
+        df = self.normalize(df)
+        n_rows = len(df)
+
+        X = np.empty((n_rows, len(self.feature_names_)), dtype=np.float32)
+        X[:, 0:3] = self._calendar(df['date'])
+        for i, column in enumerate(NUMERIC_FEATURES, start=3):
+            if column in df.columns:
+                X[:, i] = df[column].to_numpy(dtype=np.float32)
+            else:
+                X[:, i] = NUMERIC_DEFAULTS[column]
+        # Correspondance calculée sur les catégories distinctes puis propagée
+        codes, uniques = pd.factorize(df['category'], sort=False)
+        lookup = np.append(self.categories_.get_indexer(uniques), -1).astype(np.float32)
+        X[:, 6] = lookup[codes]  # code -1 (valeur manquante) -> dernière case = -1
+
+        if self.use_history:
+            if history is not None:
+                # Service : lecture O(1) de l'état incrémental par produit
+                keys = df[history.key] if history.key in df.columns else [None] * n_rows
+                X[:, 7:] = np.array([history.features(key, date) for key, date
+                                     in zip(keys, df['date'])], dtype=np.float32)
+            else:
+                X[:, 7:] = add_history_features(df, self.history_key_, self.date_format)
+        return X
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def target(self, df):
+        return self.normalize(df)['quantity_sold'].to_numpy(dtype=np.float32)
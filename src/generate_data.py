@@ -1,10 +1,14 @@
+import argparse
 import pandas as pd
 import numpy as np
 import os
+from paths import DATA_DIR
 
-def generate_urgent_data(n=500):
-    """Génère des données supermarché réalistes"""
-    os.makedirs('../data', exist_ok=True)
+def generate_urgent_data(n=500, seed=None):
+    """Génère des données supermarché réalistes (seed : génération reproductible)"""
+    if seed is not None:
+        np.random.seed(seed)
+    os.makedirs(DATA_DIR, exist_ok=True)
     
     dates = pd.date_range('2024-09-15', periods=n)
     categories = ['laitage', 'viande', 'legumes', 'fruits', 'boulangerie']
@@ -25,11 +29,15 @@ def generate_urgent_data(n=500):
     # Calcul du risque de gaspillage
     df['waste_risk'] = ((df['stock_quantity'] - df['quantity_sold']) / df['expiration_days']).round(2)
     
-    df.to_csv('../data/synthetic_data.csv', index=False)
+    df.to_csv(os.path.join(DATA_DIR, 'synthetic_data.csv'), index=False)
     print(f" {n} lignes générées dans data/synthetic_data.csv")
     print(" Aperçu des données:")
     print(df.head())
     return df
 
 if __name__ == "__main__":
-    generate_urgent_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Génère data/synthetic_data.csv")
+    parser.add_argument('--n', type=int, default=500, help="Nombre de lignes")
+    parser.add_argument('--seed', type=int, default=None, help="Graine aléatoire")
+    args = parser.parse_args()
+    generate_urgent_data(args.n, args.seed)
@@ -0,0 +1,259 @@
+# inventory_store.py - Base SQLite locale (WAL) avec index et pool de connexions
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+
+import pandas as pd
+
+from paths import DATA_DIR
+from schema import SCHEMAS, compact_dtypes
+
+DB_PATH = os.environ.get('INVENTORY_DB', os.path.join(DATA_DIR, 'inventory.db'))
+
+# table -> (fichier CSV source, colonnes typées, index)
+TABLES = {
+    'products': (
+        'synthetic_data.csv',
+        {
+            'date': 'TEXT', 'product_id': 'INTEGER', 'category': 'TEXT',
+            'quantity_sold': 'INTEGER', 'stock_quantity': 'INTEGER',
+            'expiration_days': 'INTEGER', 'price': 'REAL', 'promotion': 'INTEGER',
+            'day_of_week': 'INTEGER', 'waste_risk': 'REAL',
+        },
+        [('date',), ('category',), ('product_id',), ('category', 'date')],
+    ),
+    'sales': (
+        'supermarket_sales.csv',
+        {
+            'date': 'TEXT', 'product': 'TEXT', 'category': 'TEXT',
+            'quantity_sold': 'INTEGER', 'initial_stock': 'INTEGER',
+            'wasted_quantity': 'INTEGER', 'price': 'REAL', 'promotion': 'INTEGER',
+            'day_of_week': 'INTEGER', 'month': 'INTEGER', 'is_weekend': 'INTEGER',
+            'is_summer': 'INTEGER', 'weather_effect': 'REAL',
+        },
+        [('date',), ('category',), ('product',), ('product', 'date')],
+    ),
+    'waste': (
+        'waste_data.csv',
+        {
+            'date': 'TEXT', 'category': 'TEXT', 'quantity_kg': 'REAL',
+            'price_euros': 'REAL', 'reason': 'TEXT',
+        },
+        [('date',), ('category',), ('category', 'date')],
+    ),
+}
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite partagé entre les threads de l'API"""
+
+    def __init__(self, db_path, size=4):
+        self.db_path = db_path
+        self._pool = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')  # Lecteurs non bloqués par l'écrivain
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+
+def _where(category=None, start=None, end=None, **equals):
+    """Construit une clause WHERE paramétrée sur les colonnes indexées"""
+    clauses, params = [], []
+    if category is not None:
+        clauses.append('category = ?')
+        params.append(category)
+    if start is not None:
+        clauses.append('date >= ?')
+        params.append(str(start))
+    if end is not None:
+        clauses.append('date < ?')
+        params.append(str(end))
+    for column, value in equals.items():
+        if value is not None:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+class InventoryStore:
+    def __init__(self, db_path=DB_PATH, pool_size=4):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.create_schema()
+
+    def create_schema(self):
+        with self.pool.connection() as conn:
+            for table, (_, columns, indexes) in TABLES.items():
+                column_sql = ', '.join(f'{name} {sql_type}' for name, sql_type in columns.items())
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {column_sql})')
+                for index_columns in indexes:
+                    index_name = f"idx_{table}_{'_'.join(index_columns)}"
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(index_columns)})")
+            # Fichier source de chaque table (chemin, mtime, taille) pour détecter les CSV réécrits
+            conn.execute('CREATE TABLE IF NOT EXISTS sources '
+                         '(name TEXT PRIMARY KEY, path TEXT, mtime_ns INTEGER, size INTEGER)')
+            conn.commit()
+
+    def load_csv(self, table, csv_path=None, chunksize=50_000):
+        """Remplace le contenu d'une table par un CSV, inséré par blocs en une transaction"""
+        source, columns, _ = TABLES[table]
+        csv_path = csv_path or os.path.join(DATA_DIR, source)
+        names = list(columns)
+        insert_sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+        total = 0
+        stat = os.stat(csv_path)  # Relevé avant lecture : une réécriture pendant le chargement sera rechargée
+        with self.pool.connection() as conn:
+            with conn:  # Transaction unique : commit à la fin, rollback en cas d'erreur
+                conn.execute(f'DELETE FROM {table}')
+                for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+                    chunk = chunk.reindex(columns=names)
+                    # Dates normalisées en ISO pour des comparaisons lexicographiques indexées
+                    chunk['date'] = pd.to_datetime(chunk['date'], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M:%S')
+                    chunk = chunk.astype(object).where(chunk.notna(), None)
+                    conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
+                    total += len(chunk)
+                conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                             (table, os.path.abspath(csv_path), stat.st_mtime_ns, stat.st_size))
+            conn.execute(f'ANALYZE {table}')
+        return total
+
+    def load_all(self):
+        counts = {}
+        for table, (source, _, _) in TABLES.items():
+            path = os.path.join(DATA_DIR, source)
+            if os.path.exists(path):
+                counts[table] = self.load_csv(table, path)
+        return counts
+
+    def sync(self):
+        """Recharge les tables dont le CSV source a changé (mtime ou taille) ou n'a jamais été chargé ;
+        une table chargée depuis un autre fichier (import manuel) n'est pas écrasée"""
+        with self.pool.connection() as conn:
+            loaded = {row[0]: tuple(row[1:]) for row in conn.execute('SELECT * FROM sources')}
+        counts = {}
+        for table, (source, _, _) in TABLES.items():
+            path = os.path.abspath(os.path.join(DATA_DIR, source))
+            if not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            previous = loaded.get(table)
+            if previous is not None and (previous[0] != path or previous[1:] == (stat.st_mtime_ns, stat.st_size)):
+                continue
+            counts[table] = self.load_csv(table, path)
+        return counts
+
+    def count(self, table):
+        with self.pool.connection() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+    def iter_chunks(self, table, chunksize=50_000, category=None, start=None, end=None, first_chunk=None, **equals):
+        """Lignes filtrées par blocs de chunksize (pagination sur id, une connexion
+        du pool par bloc seulement) ; au moins un bloc, éventuellement vide.
+        first_chunk : taille réduite du premier bloc (premières lignes plus tôt)"""
+        source, columns, _ = TABLES[table]
+        where, params = _where(category, start, end, **equals)
+        where = f"{where} AND id > ?" if where else ' WHERE id > ?'
+        sql = f"SELECT id, {', '.join(columns)} FROM {table}{where} ORDER BY id LIMIT ?"
+        schema = SCHEMAS.get(os.path.splitext(source)[0], {})
+        last_id, limit, first = 0, int(first_chunk or chunksize), True
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(sql, params + [last_id, limit]).fetchall()
+            if not rows and not first:
+                return
+            chunk = pd.DataFrame.from_records(rows, columns=['id'] + list(columns))
+            if rows:
+                last_id = rows[-1][0]
+            yield compact_dtypes(chunk.drop(columns='id'), schema)
+            if len(rows) < limit:
+                return
+            limit, first = int(chunksize), False
+
+    # -----------------------------
+    # REQUÊTES MÉTIER (index sur date / category / product_id)
+    # -----------------------------
+    def waste_stats(self, category=None, start=None, end=None):
+        where, params = _where(category, start, end)
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f'SELECT COALESCE(SUM(quantity_kg), 0), COALESCE(SUM(price_euros), 0), COUNT(*) FROM waste{where}',
+                params
+            ).fetchone()
+        return {'quantity_kg': row[0], 'price_euros': row[1], 'count': row[2]}
+
+    def waste_by_category(self, start=None, end=None):
+        where, params = _where(None, start, end)
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f'SELECT category, SUM(quantity_kg) AS quantity_kg, MAX(date) AS date '
+                f'FROM waste{where} GROUP BY category ORDER BY category',
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def products(self, category=None, product_id=None, start=None, end=None, limit=None):
+        where, params = _where(category, start, end, product_id=product_id)
+        sql = f'SELECT * FROM products{where} ORDER BY date'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return self.query(sql, params).drop(columns='id')
+
+    def product_categories(self):
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute('SELECT DISTINCT category FROM products ORDER BY category')]
+
+    def risk_summary(self, category=None, threshold=8):
+        """Agrégats du tableau de bord calculés par SQLite"""
+        where, params = _where(category)
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(waste_risk > ?), 0), COALESCE(SUM(waste_risk * price), 0) '
+                f'FROM products{where}',
+                [threshold] + params
+            ).fetchone()
+        return {'products': row[0], 'high_risk': row[1], 'financial_risk': row[2]}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(autoload=True):
+    """Instance partagée du processus ; (re)charge les tables dont le CSV source a changé"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = InventoryStore()
+        if autoload:
+            _store.sync()  # Un stat par fichier : rechargement seulement si le CSV a été réécrit
+    return _store
+
+
+if __name__ == '__main__':
+    print("🗄️  CHARGEMENT DE LA BASE D'INVENTAIRE")
+    store = InventoryStore()
+    for table, count in store.load_all().items():
+        print(f"   {table}: {count} lignes")
+    print(f"✅ Base prête: {store.db_path}")
@@ -0,0 +1,335 @@
+# jobs.py - File de tâches d'entraînement / analytics lancées depuis l'API
+# Usage worker (interne) : python jobs.py worker --cpu-seconds N --memory-mb N --nice N -- commande...
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from paths import ROOT_DIR
+from pipeline import SRC_DIR
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows : pas de limites rlimit
+    RESOURCE_AVAILABLE = False
+
+JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(ROOT_DIR, 'logs', 'jobs'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+JOB_CPU_SECONDS = int(os.environ.get('JOB_CPU_SECONDS', 1800))  # Temps CPU max par tâche
+JOB_MEMORY_MB = int(os.environ.get('JOB_MEMORY_MB', 4096))  # Espace d'adressage max par processus
+JOB_NICE = int(os.environ.get('JOB_NICE', 10))  # Priorité basse : l'API garde le CPU
+JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', 3600))
+MAX_HISTORY = 100  # Tâches terminées gardées en mémoire
+
+# Type de tâche -> étapes du pipeline (les étapes amont en cache sont restaurées)
+JOB_KINDS = {
+    'train': ['train'],
+    'optimize': ['optimize'],
+    'analytics': ['analytics'],
+}
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+# Lignes de pipeline.py : "🔁 PIPELINE: train, optimize" et "✅ train: run en 1.23 s (...)"
+PLAN_LINE = re.compile(r'PIPELINE: (.+)$')
+STAGE_LINE = re.compile(r'(\w+): (run|cached|failed) en ([\d.]+) s')
+SKIPPED_LINE = re.compile(r'(\w+): ignorée')
+# Une seule thread de calcul par bibliothèque dans les workers
+THREAD_LIMITS = {name: '1' for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')}
+
+
+def worker_command(args, cpu_seconds=JOB_CPU_SECONDS, memory_mb=JOB_MEMORY_MB, nice=JOB_NICE):
+    """Commande qui applique les limites dans un nouveau processus puis exécute args.
+    Les limites passent par exec (pas de preexec_fn, risqué dans une API multi-thread)."""
+    return [sys.executable, os.path.abspath(__file__), 'worker', '--cpu-seconds', str(cpu_seconds),
+            '--memory-mb', str(memory_mb), '--nice', str(nice), '--'] + list(args)
+
+
+def kill(process):
+    """Arrête le worker et les étapes qu'il a lancées (groupe de processus)"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def is_worker(pid):
+    """Le processus pid est-il encore un worker de pipeline (pid non réutilisé) ?"""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return b'pipeline.py' in f.read()
+    except OSError:
+        return False
+
+
+def process_start(pid):
+    """Instant de démarrage du processus (/proc/pid/stat), None s'il n'existe pas ou hors Linux.
+    Avec le pid, identifie un processus même si son pid est réutilisé plus tard."""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            return int(f.read().rsplit(b')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def owner_alive(owner):
+    """Le processus API propriétaire d'une tâche tourne-t-il encore ?"""
+    if not owner:
+        return False
+    started = process_start(owner['pid'])
+    if started is not None or owner.get('started') is not None:
+        return started == owner.get('started')
+    try:  # Sans /proc : simple test d'existence du pid
+        os.kill(owner['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def kill_group(pid):
+    """Arrête un worker orphelin (chef de son groupe de processus)"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        pass
+
+
+def apply_limits(cpu_seconds, memory_mb, nice):
+    """Limites du processus courant, héritées par ses enfants (étapes du pipeline)"""
+    if nice:
+        os.nice(nice)
+        # Le worker ouvre une session, donc un autogroupe Linux : nice ne joue qu'à
+        # l'intérieur du groupe, la priorité du groupe face à l'API se règle ici
+        try:
+            with open('/proc/self/autogroup', 'w') as f:
+                f.write(str(nice))
+        except OSError:
+            pass
+    if RESOURCE_AVAILABLE:
+        if cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class JobQueue:
+    """Tâches exécutées hors du processus de l'API.
+
+    Chaque tâche lance pipeline.py dans un processus séparé, de priorité
+    basse et limité en temps CPU / mémoire ; un pool de JOB_WORKERS threads
+    ne fait qu'attendre ces processus et lire leur sortie pour suivre
+    l'avancement étape par étape. L'état de chaque tâche est écrit dans
+    JOBS_DIR (JSON + journal) pour rester consultable après redémarrage.
+    Une tâche déjà en attente ou en cours pour le même type est réutilisée.
+    Chaque tâche enregistre son processus API propriétaire (pid + instant de
+    démarrage) ; au démarrage, seules les tâches en attente ou en cours dont le
+    propriétaire a disparu sont marquées en échec (interrompues) et leur worker
+    orphelin arrêté : une autre API vivante sur le même JOBS_DIR garde les siennes.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, root=JOBS_DIR, cpu_seconds=JOB_CPU_SECONDS,
+                 memory_mb=JOB_MEMORY_MB, nice=JOB_NICE, timeout=JOB_TIMEOUT):
+        self.root = root
+        self.limits = {'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb, 'nice': nice}
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._processes = {}
+        self.owner = {'pid': os.getpid(), 'started': process_start(os.getpid())}
+        os.makedirs(root, exist_ok=True)
+        self.interrupted = self._recover()
+
+    def _recover(self):
+        """Tâches inachevées d'une exécution précédente -> échec ; renvoie leurs ids"""
+        interrupted = []
+        for name in os.listdir(self.root):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.root, name), encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if job.get('status') not in (QUEUED, RUNNING) or owner_alive(job.get('owner')):
+                continue
+            if job.get('pid') and is_worker(job['pid']):
+                kill_group(job['pid'])
+            finished = time.time()
+            job.update(status=FAILED, finished_at=finished, error="interrompue (redémarrage de l'API)",
+                       duration_s=round(finished - job['started_at'], 3) if job.get('started_at') else None)
+            self._save(job)
+            interrupted.append(job['id'])
+        return interrupted
+
+    def _save(self, job):
+        path = os.path.join(self.root, f"{job['id']}.json")
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+            snapshot = dict(job)
+        self._save(snapshot)
+
+    def command(self, job):
+        args = [sys.executable, '-u', os.path.join(SRC_DIR, 'pipeline.py'), *JOB_KINDS[job['kind']], '--jobs', '1']
+        if job['params'].get('force'):
+            args.append('--force')
+        if job['params'].get('publish'):
+            args.append('--publish')
+        return worker_command(args, **self.limits)
+
+    def submit(self, kind, params=None):
+        """Met une tâche en file ; renvoie (tâche, créée)"""
+        if kind not in JOB_KINDS:
+            raise KeyError(kind)
+        params = {key: bool(value) for key, value in (params or {}).items() if key in ('force', 'publish')}
+        with self._lock:
+            for job in self._jobs.values():
+                if job['kind'] == kind and job['params'] == params and job['status'] in (QUEUED, RUNNING):
+                    return dict(job), False
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'kind': kind,
+                'params': params,
+                'status': QUEUED,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'queue_s': None,
+                'duration_s': None,
+                'planned': [],
+                'stages': {},
+                'progress': 0.0,
+                'returncode': None,
+                'pid': None,
+                'owner': self.owner,
+                'error': None,
+                'limits': self.limits,
+            }
+            self._jobs[job['id']] = job
+            self._trim()
+        self._save(job)
+        self._pool.submit(self._run, job)
+        return dict(job), True
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in (SUCCEEDED, FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - MAX_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        started = time.time()
+        self._update(job, status=RUNNING, started_at=started, queue_s=round(started - job['submitted_at'], 3))
+        log_path = os.path.join(self.root, f"{job['id']}.log")
+        env = dict(os.environ, PYTHONIOENCODING='utf-8', MPLBACKEND='Agg', **THREAD_LIMITS)
+        stages, planned = {}, []
+        try:
+            with open(log_path, 'w', encoding='utf-8') as log:
+                process = subprocess.Popen(self.command(job), cwd=SRC_DIR, env=env, text=True, encoding='utf-8',
+                                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                           start_new_session=True)
+                self._processes[job['id']] = process
+                self._update(job, pid=process.pid)
+                timer = threading.Timer(self.timeout, kill, (process,))
+                timer.start()
+                try:
+                    for line in process.stdout:
+                        log.write(line)
+                        plan, stage, skipped = PLAN_LINE.search(line), STAGE_LINE.search(line), SKIPPED_LINE.search(line)
+                        if plan:
+                            planned = [name.strip() for name in plan.group(1).split(',')]
+                        elif stage or skipped:
+                            name = (stage or skipped).group(1)
+                            stages[name] = ({'status': stage.group(2), 'duration_s': float(stage.group(3))}
+                                            if stage else {'status': 'skipped', 'duration_s': 0.0})
+                        else:
+                            continue
+                        self._update(job, stages=dict(stages), planned=planned,
+                                     progress=round(len(stages) / max(len(planned), 1), 3))
+                    returncode = process.wait()
+                finally:
+                    timer.cancel()
+                    self._processes.pop(job['id'], None)
+            error = None if returncode == 0 else f"code {returncode}, voir {log_path}"
+        except Exception as e:
+            returncode, error = None, str(e)
+        finished = time.time()
+        self._update(job, status=SUCCEEDED if returncode == 0 else FAILED, returncode=returncode, error=error,
+                     finished_at=finished, duration_s=round(finished - started, 3),
+                     progress=1.0 if returncode == 0 else job['progress'])
+
+    def get(self, job_id):
+        """État d'une tâche (mémoire, sinon fichier JSON), None si inconnue"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        if not re.fullmatch(r'[0-9a-f]{12}', job_id):
+            return None
+        try:
+            with open(os.path.join(self.root, f"{job_id}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list(self, limit=20):
+        with self._lock:
+            return [dict(job) for job in list(self._jobs.values())[::-1][:limit]]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+
+    def shutdown(self):
+        for process in list(self._processes.values()):
+            kill(process)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _worker(argv):
+    """Processus worker : applique les limites puis se remplace par la commande"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cpu-seconds', type=int, default=JOB_CPU_SECONDS)
+    parser.add_argument('--memory-mb', type=int, default=JOB_MEMORY_MB)
+    parser.add_argument('--nice', type=int, default=JOB_NICE)
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    apply_limits(args.cpu_seconds, args.memory_mb, args.nice)
+    os.execv(command[0], command)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['worker']:
+        _worker(sys.argv[2:])
+
+    print("🧵 FILE DE TÂCHES")
+    kinds = sys.argv[1:] or list(JOB_KINDS)
+    queue = JobQueue()
+    jobs = [queue.submit(kind)[0] for kind in kinds]
+    for job in jobs:
+        while (state := queue.get(job['id']))['status'] in (QUEUED, RUNNING):
+            time.sleep(0.5)
+        stages = ', '.join(f"{name} {stage['status']}" for name, stage in state['stages'].items())
+        icon = '✅' if state['status'] == SUCCEEDED else '❌'
+        print(f"   {icon} {state['kind']}: {state['status']} | attente {state['queue_s']:.2f} s, "
+              f"exécution {state['duration_s']:.2f} s ({stages})")
+    queue.shutdown()
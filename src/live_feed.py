@@ -0,0 +1,208 @@
+# live_feed.py - Flux Server-Sent Events des changements de risque
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+
+from risk_scoring import NIVEAUX
+
+
+def format_sse(event, payload, event_id=None):
+    """Message SSE encodé une seule fois (partagé par tous les abonnés)"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(payload, ensure_ascii=False, separators=(',', ':')))
+    return ("\n".join(lines) + "\n\n").encode('utf-8')
+
+
+HEARTBEAT = b": ping\n\n"
+
+
+class Broadcaster:
+    """Diffusion 1 -> N : chaque message est sérialisé une fois puis la même
+    chaîne d'octets est déposée dans la file de chaque abonné.
+
+    Un abonné trop lent perd ses plus vieux messages (file bornée) au lieu
+    de ralentir la diffusion ; l'id de séquence lui permet de le détecter.
+    """
+
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        client = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    @property
+    def sequence(self):
+        """Id du dernier message publié"""
+        with self._lock:
+            return self._sequence
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def publish(self, event, payload):
+        with self._lock:
+            self._sequence += 1
+            message = format_sse(event, payload, self._sequence)
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                try:
+                    client.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                client.put_nowait(message)
+        return message
+
+    def stream(self, initial=(), heartbeat=15.0):
+        """Générateur pour une réponse text/event-stream (un par connexion).
+        initial peut être une fonction : appelée après l'abonnement, ses messages
+        ne peuvent pas manquer ce qui est publié entre-temps."""
+        client = self.subscribe()
+        try:
+            for message in (initial() if callable(initial) else initial):
+                yield message
+            while True:
+                try:
+                    yield client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield HEARTBEAT  # Garde la connexion ouverte derrière un proxy
+        finally:
+            self.unsubscribe(client)
+
+    def __len__(self):
+        return len(self._clients)
+
+
+class LiveFeed:
+    """Relie le LiveRiskScorer au diffuseur.
+
+    Publie les changements de niveau (risk_change) et les deltas de comptage
+    par catégorie et par niveau (category_delta) ; les compteurs sont tenus
+    à jour ici pour fournir un instantané aux nouvelles connexions.
+    """
+
+    def __init__(self, scorer, broadcaster=None, top_k=10):
+        self.scorer = scorer
+        self.broadcaster = broadcaster or Broadcaster()
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self.counts = {}
+        n = len(scorer)
+        for category, code in zip(scorer.categories, scorer.codes[:n].tolist()):
+            self.counts.setdefault(category, [0] * len(NIVEAUX))[code] += 1
+        scorer.subscribe(self.on_changes)
+
+    def on_changes(self, changes):
+        moved = [c for c in changes if c['risk_code'] != c['previous_code']]
+        if not moved:
+            return
+        deltas = {}
+        # Compteurs et publication sous le même verrou : un instantané voit un
+        # delta dans ses compteurs si et seulement si son id est <= au sien
+        with self._lock:
+            for change in moved:
+                delta = deltas.setdefault(change['category'], [0] * len(NIVEAUX))
+                counts = self.counts.setdefault(change['category'], [0] * len(NIVEAUX))
+                if change['previous_code'] >= 0:  # -1 : nouveau produit
+                    delta[change['previous_code']] -= 1
+                    counts[change['previous_code']] -= 1
+                delta[change['risk_code']] += 1
+                counts[change['risk_code']] += 1
+            self.broadcaster.publish('risk_change', {'changes': moved})
+            self.broadcaster.publish('category_delta', {'deltas': deltas})
+
+    def snapshot(self):
+        """Message initial d'une connexion : compteurs par catégorie + top-K.
+        Son id est celui du dernier message déjà compté."""
+        with self._lock:
+            counts = {category: list(values) for category, values in self.counts.items()}
+            sequence = self.broadcaster.sequence
+        return format_sse('snapshot', {
+            'levels': list(NIVEAUX),
+            'categories': counts,
+            'top': self.scorer.top_k(self.top_k),
+        }, sequence)
+
+    def stream(self):
+        # Instantané construit après l'abonnement : aucun delta perdu entre les deux
+        return self.broadcaster.stream(initial=lambda: [self.snapshot()])
+
+
+class LiveFeedClient:
+    """Abonné SSE côté dashboard : un thread lit /stream et maintient l'état
+    local (compteurs par catégorie, derniers changements) sans re-calcul."""
+
+    def __init__(self, url, history=50):
+        self.url = url
+        self.categories = {}
+        self.recent = deque(maxlen=history)
+        self.connected = False
+        self.last_id = None
+        self.snapshot_id = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='live-feed')
+        self._thread.start()
+
+    def _apply(self, event, payload, event_id=None):
+        with self._lock:
+            if event == 'snapshot':
+                self.categories = payload['categories']
+                self.snapshot_id = event_id
+            elif event == 'category_delta':
+                if event_id is not None and self.snapshot_id is not None and event_id <= self.snapshot_id:
+                    return  # Déjà compté dans l'instantané
+                for category, delta in payload['deltas'].items():
+                    counts = self.categories.setdefault(category, [0] * len(delta))
+                    self.categories[category] = [c + d for c, d in zip(counts, delta)]
+            elif event == 'risk_change':
+                self.recent.extendleft(payload['changes'])
+
+    def _run(self):
+        while True:
+            try:
+                with requests.get(self.url, stream=True, timeout=(3, 60)) as response:
+                    self.connected = True
+                    event, event_id, data = None, None, []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line is None:
+                            continue
+                        if line == '':
+                            if event and data:
+                                self._apply(event, json.loads('\n'.join(data)), event_id)
+                            event, event_id, data = None, None, []
+                        elif line.startswith('event:'):
+                            event = line[6:].strip()
+                        elif line.startswith('id:'):
+                            self.last_id = line[3:].strip()
+                            event_id = int(self.last_id)
+                        elif line.startswith('data:'):
+                            data.append(line[5:].strip())
+            except Exception:
+                pass
+            self.connected = False
+            time.sleep(2)  # Reconnexion (un nouvel instantané resynchronise l'état)
+
+    def state(self):
+        with self._lock:
+            return {
+                'categories': {c: list(v) for c, v in self.categories.items()},
+                'recent': list(self.recent),
+                'connected': self.connected,
+            }
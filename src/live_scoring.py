@@ -0,0 +1,365 @@
+# live_scoring.py - Re-scoring incrémental sur mouvements de stock et ventes
+import json
+import math
+import numbers
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from priority_index import PriorityIndex
+from risk_scoring import FEATURES, heuristic_risk, risk_codes
+from schema import load_dataset
+
+# Types d'événements acceptés
+#   sale  : quantity unités vendues (stock - q, ventes du jour + q)
+#   stock : livraison / correction de quantity unités (stock + q)
+#   set   : valeurs absolues (stock_quantity, expiration_days, price,
+#           quantity_sold = ventes du jour, category) ; crée le produit s'il est inconnu
+#   day   : passage au jour suivant (ou à date), sans product_id ; les
+#           jours avant péremption diminuent des jours écoulés
+# Tout événement peut porter une date (AAAA-MM-JJ) : une date plus récente
+# que le jour courant déclenche le changement de jour avant l'événement.
+EVENT_TYPES = ('sale', 'stock', 'set', 'day')
+FLOAT_DECIMALS = 6  # Précision utile des colonnes float32 du catalogue
+
+
+def day_number(value):
+    """Jour (entier depuis 1970) d'une date AAAA-MM-JJ[...]"""
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+def _check_number(event, name):
+    value = event[name]
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value):
+        raise ValueError(f"{name} doit être un nombre: {value!r}")
+
+
+def validate_events(events):
+    """Vérifie tout le lot (types, product_id, champs numériques) ; ValueError sinon"""
+    if not isinstance(events, (list, tuple)):
+        raise ValueError("Les événements doivent être une liste")
+    for event in events:
+        if not isinstance(event, dict):
+            raise ValueError(f"Événement invalide (objet attendu): {event!r}")
+        kind = event.get('type', 'set')
+        if kind not in EVENT_TYPES:
+            raise ValueError(f"Type d'événement inconnu: {kind}")
+        if event.get('date') is not None:
+            try:
+                day_number(event['date'])
+            except ValueError:
+                raise ValueError(f"date invalide: {event['date']!r}") from None
+        if kind == 'day':
+            continue
+        product_id = event.get('product_id')
+        if product_id is None:
+            raise ValueError("Événement sans product_id")
+        if isinstance(product_id, bool) or not isinstance(product_id, (numbers.Integral, str)):
+            raise ValueError(f"product_id invalide: {product_id!r}")
+        for name in ('quantity', *FEATURES):
+            if name in event:
+                _check_number(event, name)
+        if event.get('category') is not None and not isinstance(event['category'], str):
+            raise ValueError(f"category invalide: {event['category']!r}")
+
+
+class LiveRiskScorer:
+    """État par produit en tableaux + re-scoring des seuls produits touchés.
+
+    apply_events() agrège un lot d'événements, met à jour les tableaux puis
+    appelle score_fn une seule fois sur les produits modifiés : le coût est
+    proportionnel au nombre de produits touchés, pas à la taille du catalogue.
+    Un PriorityIndex (perte attendue = risque x prix, par catégorie) est mis
+    à jour à chaque re-scoring et chaque lot est poussé aux abonnés.
+
+    quantity_sold est une vente journalière : les ventes du jour sont cumulées
+    à part et la feature vaut max(ventes d'hier, ventes du jour), estimation
+    d'une journée complète qui ne grandit pas indéfiniment. Au changement de
+    jour, les ventes du jour deviennent celles d'hier.
+    """
+
+    def __init__(self, score_fn=heuristic_risk, capacity=1024):
+        # score_fn(stock, expiration, price, sold) -> scores (tableaux)
+        self.score_fn = score_fn
+        self.index = {}
+        self.product_ids = []
+        self.categories = []
+        self.state = {name: np.zeros(capacity, dtype=np.float64) for name in FEATURES}
+        self.sold_today = np.zeros(capacity, dtype=np.float64)
+        self.sold_previous = np.zeros(capacity, dtype=np.float64)
+        self.day = None  # Jour courant (entier), fixé par la première date vue
+        self.scores = np.zeros(capacity, dtype=np.float64)
+        self.codes = np.zeros(capacity, dtype=np.int8)
+        self.priorities = PriorityIndex()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.events_applied = 0
+        self.products_rescored = 0
+
+    @classmethod
+    def from_frame(cls, df, score_fn=heuristic_risk):
+        """État initial : dernière observation de chaque product_id"""
+        if 'date' in df.columns:
+            df = df.sort_values('date', kind='stable')
+        latest = df.drop_duplicates('product_id', keep='last')
+        scorer = cls(score_fn, capacity=max(1024, 2 * len(latest)))
+        # Colonnes float32 (schéma compact) -> float64 arrondi : 12.91 et non 12.90999984741211
+        events = latest[['product_id'] + FEATURES + (['category'] if 'category' in latest else [])].assign(
+            **{name: latest[name].astype(np.float64).round(FLOAT_DECIMALS) for name in FEATURES})
+        scorer.apply_events([dict(record, type='set') for record in events.to_dict('records')])
+        if 'date' in df.columns and len(df):
+            scorer.day = day_number(df['date'].iloc[-1])
+        return scorer
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def _grow(self, size):
+        capacity = len(self.scores)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, values in self.state.items():
+            self.state[name] = np.resize(values, capacity)
+        self.sold_today = np.resize(self.sold_today, capacity)
+        self.sold_previous = np.resize(self.sold_previous, capacity)
+        self.scores = np.resize(self.scores, capacity)
+        self.codes = np.resize(self.codes, capacity)
+
+    def _slot(self, product_id, category=None):
+        idx = self.index.get(product_id)
+        if idx is None:
+            idx = len(self.product_ids)
+            self._grow(idx + 1)
+            self.index[product_id] = idx
+            self.product_ids.append(product_id)
+            self.categories.append(category or 'Unknown')
+            for values in self.state.values():
+                values[idx] = 0.0
+            self.sold_today[idx] = self.sold_previous[idx] = 0.0
+            self.state['expiration_days'][idx] = 1.0
+            self.codes[idx] = -1  # Jamais scoré (previous_code = -1)
+        elif category is not None:
+            self.categories[idx] = category
+        return idx
+
+    def apply_events(self, events):
+        """Applique un lot d'événements et renvoie les changements poussés aux abonnés"""
+        # Validation du lot complet avant toute modification de l'état
+        validate_events(events)
+
+        with self._lock:
+            touched = []
+            deltas = {'sale': ([], []), 'stock': ([], [])}
+            for event in events:
+                kind = event.get('type', 'set')
+                if event.get('date') is not None or kind == 'day':
+                    day = day_number(event['date']) if event.get('date') is not None else None
+                    if kind == 'day' and day is None and self.day is not None:
+                        day = self.day + 1
+                    if self.day is None:
+                        self.day = day
+                    elif day > self.day:
+                        self._apply_deltas(deltas)
+                        touched.extend(self._roll_over(day))
+                if kind == 'day':
+                    continue
+                if kind != 'set' and event['product_id'] not in self.index:
+                    continue  # Mouvement sur un produit inconnu : ignoré
+                idx = self._slot(event['product_id'], event.get('category'))
+                touched.append(idx)
+                if kind == 'set':
+                    self._apply_deltas(deltas)  # Respecte l'ordre set / mouvements
+                    for name in FEATURES:
+                        if name in event:
+                            self.state[name][idx] = event[name]
+                    if 'quantity_sold' in event:
+                        self.sold_today[idx] = event['quantity_sold']
+                        self.state['quantity_sold'][idx] = max(self.sold_previous[idx], self.sold_today[idx])
+                else:
+                    deltas[kind][0].append(idx)
+                    deltas[kind][1].append(event.get('quantity', 1 if kind == 'sale' else 0))
+            self._apply_deltas(deltas)
+            self.events_applied += len(events)
+            changes = self._rescore(np.unique(np.asarray(touched, dtype=np.int64)))
+
+        for callback in list(self._subscribers):
+            callback(changes)
+        return changes
+
+    def _apply_deltas(self, deltas):
+        """Deltas agrégés en une opération (plusieurs événements par produit)"""
+        sale_idx, sale_qty = deltas['sale']
+        stock_idx, stock_qty = deltas['stock']
+        if sale_idx:
+            np.subtract.at(self.state['stock_quantity'], sale_idx, sale_qty)
+            np.add.at(self.sold_today, sale_idx, sale_qty)
+            self.state['quantity_sold'][sale_idx] = np.maximum(self.sold_previous[sale_idx],
+                                                               self.sold_today[sale_idx])
+        if stock_idx:
+            np.add.at(self.state['stock_quantity'], stock_idx, stock_qty)
+        if sale_idx or stock_idx:
+            np.maximum(self.state['stock_quantity'], 0, out=self.state['stock_quantity'])
+        for indices, quantities in deltas.values():
+            indices.clear()
+            quantities.clear()
+
+    def _roll_over(self, day):
+        """Nouveau jour : ventes du jour -> ventes d'hier (0 si des jours sont sautés),
+        jours avant péremption diminués des jours écoulés (plancher 0).
+        Renvoie les produits dont une feature a changé."""
+        n = len(self.product_ids)
+        expiration = self.state['expiration_days']
+        aged = np.flatnonzero(expiration[:n] > 0)
+        expiration[:n] = np.maximum(expiration[:n] - (day - self.day), 0)
+        if day - self.day == 1:
+            self.sold_previous[:n] = self.sold_today[:n]
+        else:
+            self.sold_previous[:n] = 0.0
+        self.sold_today[:n] = 0.0
+        self.day = day
+        sold = self.state['quantity_sold']
+        changed = np.flatnonzero(sold[:n] != self.sold_previous[:n])
+        sold[:n] = self.sold_previous[:n]
+        return np.union1d(changed, aged).tolist()
+
+    def _rescore(self, idx):
+        if len(idx) == 0:
+            return []
+        previous = self.codes[idx].copy()
+        scores = np.asarray(self.score_fn(*(self.state[name][idx] for name in FEATURES)), dtype=np.float64)
+        codes = np.atleast_1d(risk_codes(scores))
+        self.scores[idx] = scores
+        self.codes[idx] = codes
+        self.products_rescored += len(idx)
+
+        losses = np.maximum(scores, 0) * self.state['price'][idx]
+        for i, loss in zip(idx.tolist(), losses.tolist()):
+            self.priorities.update(self.product_ids[i], self.categories[i], loss, i)
+
+        return [{
+            'product_id': self.product_ids[i],
+            'category': self.categories[i],
+            'risk_score': round(score, 2),
+            'risk_code': int(code),
+            'previous_code': int(before),
+        } for i, score, code, before in zip(idx.tolist(), scores.tolist(), codes.tolist(), previous.tolist())]
+
+    def top_k(self, k=10, category=None):
+        """K produits à plus forte perte attendue (toutes catégories ou une seule)"""
+        return [dict(self.product(i), expected_loss=round(loss, 2))
+                for _, loss, i in self.priorities.top_k(k, category)]
+
+    def product(self, i):
+        return {
+            'product_id': self.product_ids[i],
+            'category': self.categories[i],
+            **{name: round(float(self.state[name][i]), FLOAT_DECIMALS) for name in FEATURES},
+            'risk_score': round(float(self.scores[i]), 2),
+            'risk_code': int(self.codes[i]),
+        }
+
+    def subscribe(self, callback):
+        """callback(changes) après chaque lot ; renvoie la fonction de désabonnement"""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def stats(self):
+        return {
+            'products': len(self.product_ids),
+            'day': str(np.datetime64(self.day, 'D')) if self.day is not None else None,
+            'events_applied': self.events_applied,
+            'products_rescored': self.products_rescored,
+            'subscribers': len(self._subscribers),
+        }
+
+
+class FileEventSource:
+    """Consommateur de file locale : suit un fichier NDJSON d'événements.
+
+    Remplace une vraie file de messages en développement : chaque ligne
+    ajoutée au fichier est un événement, lu par lots et appliqué au scorer.
+    """
+
+    def __init__(self, scorer, path, batch_size=1000, poll_interval=0.5):
+        self.scorer = scorer
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._offset = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Lit les nouvelles lignes complètes et les applique ; renvoie le nombre d'événements"""
+        if not os.path.exists(self.path):
+            return 0
+        applied = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            batch = []
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Ligne en cours d'écriture : relue au prochain passage
+                self._offset += len(line)
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= self.batch_size:
+                    self.scorer.apply_events(batch)
+                    applied += len(batch)
+                    batch = []
+            if batch:
+                self.scorer.apply_events(batch)
+                applied += len(batch)
+        return applied
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️  Événements ignorés: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='event-source')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+if __name__ == '__main__':
+    print("📡 RE-SCORING INCRÉMENTAL")
+    catalog = load_dataset('synthetic_data')
+    scorer = LiveRiskScorer.from_frame(catalog)
+    print(f"   {len(scorer)} produits en mémoire")
+
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rng = np.random.default_rng(42)
+    ids = rng.choice(scorer.product_ids, n_events)
+    kinds = rng.choice(['sale', 'stock'], n_events, p=[0.95, 0.05])
+    quantities = np.where(kinds == 'sale', rng.integers(1, 3, n_events), rng.integers(20, 60, n_events))
+    events = [{'type': kind, 'product_id': int(pid), 'quantity': int(q)}
+              for kind, pid, q in zip(kinds, ids, quantities)]
+
+    escalations = []
+    scorer.subscribe(lambda changes: escalations.extend(
+        c for c in changes if c['risk_code'] > c['previous_code']))
+
+    start = time.perf_counter()
+    for i in range(0, n_events, 100):
+        scorer.apply_events(events[i:i + 100])
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {n_events} événements en {elapsed * 1000:.1f} ms "
+          f"({scorer.products_rescored} re-scorings, {len(escalations)} aggravations)")
+    print("\n🚨 TOP 5 PRODUITS PRIORITAIRES:")
+    for product in scorer.top_k(5):
+        print(f"   Produit {product['product_id']} ({product['category']}): score {product['risk_score']}"
+              f" - perte attendue {product['expected_loss']}€")
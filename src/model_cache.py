@@ -0,0 +1,263 @@
+# model_cache.py - Modèles par magasin / catégorie, chargés à la demande sous budget mémoire
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from model_registry import ARTIFACT_NAME, CURRENT_FILE, ModelRegistry
+from paths import REGISTRY_DIR
+
+PARTITIONS_DIR = os.path.join(REGISTRY_DIR, 'partitions')
+DEFAULT_BUDGET_MB = float(os.environ.get('MODEL_CACHE_MB', 512))
+SCAN_INTERVAL = 5.0  # Secondes entre deux relectures des pointeurs CURRENT
+
+
+def partition_key(store_id=None, category=None):
+    """Nom de dossier d'une partition : store-12, category-laitage, store-12_category-laitage"""
+    parts = []
+    if store_id not in (None, ''):
+        parts.append(f"store-{store_id}")
+    if category not in (None, ''):
+        parts.append(f"category-{category}")
+    return re.sub(r'[^\w.-]', '_', '_'.join(parts)) or None
+
+
+def candidate_keys(store_id=None, category=None):
+    """Ordre de résolution : magasin x catégorie, magasin, catégorie (puis modèle global)"""
+    keys = [partition_key(store_id, category), partition_key(store_id=store_id), partition_key(category=category)]
+    return [key for i, key in enumerate(keys) if key and key not in keys[:i]]
+
+
+def partition_registry(key, root=PARTITIONS_DIR):
+    return ModelRegistry(os.path.join(root, key))
+
+
+def publish_partition(model, store_id=None, category=None, metadata=None, root=PARTITIONS_DIR):
+    """Publie (et active) un modèle dans le registre de sa partition"""
+    key = partition_key(store_id, category)
+    if key is None:
+        raise ValueError("store_id ou category requis")
+    metadata = dict(metadata or {}, store_id=store_id, category=category)
+    return key, partition_registry(key, root).publish(model, metadata)
+
+
+def model_nbytes(model, artifact_path=None):
+    """Empreinte mémoire : tableaux des arbres pour les ensembles, sinon taille de l'artefact"""
+    estimators = np.ravel(getattr(model, 'estimators_', [model]))
+    if all(hasattr(estimator, 'tree_') for estimator in estimators):
+        total = 0
+        for estimator in estimators:
+            state = estimator.tree_.__getstate__()
+            total += state['nodes'].nbytes + state['values'].nbytes
+        return total
+    if artifact_path and os.path.exists(artifact_path):
+        return os.path.getsize(artifact_path)
+    return 0
+
+
+def derived_nbytes(value):
+    """Empreinte d'une structure dérivée : ses tableaux numpy propres (les arbres
+    partagés avec le modèle sont déjà comptés)"""
+    return sum(array.nbytes for array in vars(value).values() if isinstance(array, np.ndarray))
+
+
+class ModelCache:
+    """Cache LRU de modèles de partition borné en mémoire.
+
+    Les pointeurs CURRENT des partitions sont relus au plus toutes les
+    scan_interval secondes ; un modèle n'est chargé qu'à sa première
+    requête (un seul chargement par partition même sous concurrence),
+    puis les moins récemment utilisés sont évincés tant que la somme des
+    empreintes dépasse le budget. Une nouvelle version activée dans le
+    registre d'une partition remplace l'ancienne au scan suivant.
+    """
+
+    def __init__(self, root=PARTITIONS_DIR, budget_mb=DEFAULT_BUDGET_MB, warmup_batch=None,
+                 scan_interval=SCAN_INTERVAL):
+        self.root = root
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.warmup_batch = warmup_batch
+        self.scan_interval = scan_interval
+        self._entries = OrderedDict()  # clé -> (version, modèle, octets, structures dérivées)
+        self._lock = threading.Lock()
+        self._loading = {}  # clé -> verrou de chargement
+        self._current = {}
+        self._scanned_at = -np.inf
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.evictions = 0
+        self.load_errors = 0
+        self._load_times = deque(maxlen=256)
+
+    def scan(self, force=False):
+        """Partitions disponibles -> version active (relu au plus toutes les scan_interval s)"""
+        now = time.monotonic()
+        if not force and now - self._scanned_at < self.scan_interval:
+            return self._current
+        current = {}
+        if os.path.isdir(self.root):
+            for key in os.listdir(self.root):
+                path = os.path.join(self.root, key)
+                try:
+                    with open(os.path.join(path, CURRENT_FILE), encoding='utf-8') as f:
+                        version = f.read().strip() or None
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                if version and os.path.isfile(os.path.join(path, version, ARTIFACT_NAME)):
+                    current[key] = version
+        self._current, self._scanned_at = current, now
+        return current
+
+    def _load(self, key, version):
+        start = time.perf_counter()
+        _, model = partition_registry(key, self.root).load(version)
+        if self.warmup_batch is not None:
+            model.predict(self.warmup_batch)
+        self._load_times.append(time.perf_counter() - start)
+        return model, model_nbytes(model, os.path.join(self.root, key, version, ARTIFACT_NAME))
+
+    def _evict(self, keep):
+        while self.memory > self.budget and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            nbytes = self._entries.pop(key)[2]
+            self.memory -= nbytes
+            self.evictions += 1
+
+    def get(self, key):
+        """(version, modèle) de la partition, ou None si elle n'a pas de modèle"""
+        version = self.scan().get(key)
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    return entry[0], entry[1]  # Chargé pendant l'attente
+            try:
+                model, nbytes = self._load(key, version)
+            except Exception as e:
+                self.load_errors += 1
+                print(f"⚠️  Échec du chargement de {key}/{version}: {e}")
+                return None
+            with self._lock:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.memory -= previous[2]
+                self._entries[key] = (version, model, nbytes, {})
+                self.memory += nbytes
+                self._evict(keep=key)
+            return version, model
+
+    def derived(self, key, model, kind, build):
+        """Structure dérivée d'un modèle en cache (explainer, forêt compacte...).
+        Gardée dans l'entrée du modèle (son empreinte s'y ajoute) : évincée ou
+        remplacée avec lui."""
+        with self._lock:
+            entry = self._entries.get(key)
+            cached = entry is not None and entry[1] is model
+            value = entry[3].get(kind) if cached else None
+        if value is not None:
+            return value
+        value = build()  # Hors verrou : les autres partitions restent servies
+        if cached:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] is model and kind not in entry[3]:
+                    # Taille ajoutée à celle du modèle : comptée dans le budget, libérée avec lui
+                    entry[3][kind] = value
+                    nbytes = derived_nbytes(value)
+                    self._entries[key] = (entry[0], entry[1], entry[2] + nbytes, entry[3])
+                    self.memory += nbytes
+                    self._evict(keep=key)
+                elif entry is not None and entry[1] is model:
+                    value = entry[3][kind]
+        return value
+
+    def resolve(self, store_id=None, category=None):
+        """(clé, version, modèle) de la partition la plus précise disponible, None sinon"""
+        for key in candidate_keys(store_id, category):
+            found = self.get(key)
+            if found is not None:
+                return key, found[0], found[1]
+        if store_id not in (None, '') or category not in (None, ''):
+            self.fallbacks += 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            load_times = np.asarray(self._load_times) * 1000
+            return {
+                'partitions': len(self._current),
+                'cached': list(self._entries),
+                'memory_mb': round(self.memory / 1024 / 1024, 2),
+                'budget_mb': round(self.budget / 1024 / 1024, 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 4) if requests else None,
+                'fallbacks': self.fallbacks,
+                'evictions': self.evictions,
+                'load_errors': self.load_errors,
+                'load_ms_p50': round(float(np.percentile(load_times, 50)), 2) if len(load_times) else None,
+                'load_ms_p99': round(float(np.percentile(load_times, 99)), 2) if len(load_times) else None,
+            }
+
+
+if __name__ == '__main__':
+    from sklearn.ensemble import RandomForestRegressor
+
+    from risk_scoring import FEATURES
+    from schema import load_dataset
+
+    print("🗂️  MODÈLES PAR PARTITION (cache LRU)")
+    df = load_dataset('synthetic_data')
+    n_stores = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    budget_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    # Un modèle par magasin simulé x catégorie (échantillon bootstrap de l'historique)
+    rng = np.random.default_rng(42)
+    cache = ModelCache(budget_mb=budget_mb)
+    if not cache.scan(force=True):
+        for store_id in range(n_stores):
+            for category, group in df.groupby('category'):
+                sample = group.sample(len(group), replace=True, random_state=int(rng.integers(1 << 31)))
+                model = RandomForestRegressor(n_estimators=20, random_state=42, n_jobs=1)
+                model.fit(sample[FEATURES].to_numpy(np.float32), sample['waste_risk'])
+                publish_partition(model, store_id, category, {'rows': len(sample)})
+        print(f"📦 {n_stores * df['category'].nunique()} modèles publiés dans {PARTITIONS_DIR}")
+        cache.scan(force=True)
+
+    # Trafic : quelques magasins très actifs (loi de Zipf), magasins inconnus -> modèle global
+    categories = df['category'].unique()
+    stores = np.minimum(rng.zipf(1.5, 2000) - 1, n_stores + 2)
+    X = df[FEATURES].to_numpy(np.float32)[:1]
+    start = time.perf_counter()
+    for store_id, category in zip(stores, rng.choice(categories, len(stores))):
+        found = cache.resolve(int(store_id), category)
+        if found is not None:
+            found[2].predict(X)
+    elapsed = time.perf_counter() - start
+    stats = cache.stats()
+    print(f"⏱️  {len(stores)} requêtes en {elapsed:.2f} s")
+    print(f"   Taux de succès: {stats['hit_rate']:.1%} | évictions: {stats['evictions']} | "
+          f"repli global: {stats['fallbacks']}")
+    print(f"   Mémoire: {stats['memory_mb']} / {stats['budget_mb']} Mo ({len(stats['cached'])} modèles en cache)")
+    print(f"   Chargement: p50 {stats['load_ms_p50']} ms, p99 {stats['load_ms_p99']} ms")
@@ -1,61 +1,165 @@
 # model_optimizer.py
+import argparse
+import os
+import tempfile
+import time
+
 import pandas as pd
 import joblib
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import cross_validate
 import numpy as np
+from benchmarks import measure_latency
+from drift_monitor import reference_profile
+from fast_models import RatioLinearRegressor
+from model_registry import ModelRegistry
+from paths import MODELS_DIR, REPORTS_DIR
+from risk_scoring import FEATURES
+from schema import load_dataset
 
-print("🎯 ÉTAPE 2: OPTIMISATION DU MODÈLE")
-
-# 1. CHARGER LES DONNÉES
-df = pd.read_csv('../data/synthetic_data.csv')
-X = df[['stock_quantity', 'expiration_days', 'price', 'quantity_sold']]
-y = df['waste_risk']
-
-print(f"📊 Données: {X.shape[0]} produits, {X.shape[1]} features")
-
-# 2. TESTER DIFFÉRENTS MODÈLES
-models = {
-    'RandomForest_Basic': RandomForestRegressor(n_estimators=50, random_state=42),
-    'RandomForest_Optimized': RandomForestRegressor(
-        n_estimators=100, 
+# Candidats du plus lourd au plus léger : la cible est un ratio fermé,
+# donc des modèles bien plus petits suffisent souvent
+CANDIDATES = {
+    'RandomForest_Basic': lambda: RandomForestRegressor(n_estimators=50, random_state=42),
+    'RandomForest_Optimized': lambda: RandomForestRegressor(
+        n_estimators=100,
         max_depth=15,
         min_samples_split=3,
         random_state=42
     ),
-    'GradientBoost': GradientBoostingRegressor(n_estimators=100, random_state=42)
+    'RandomForest_Small': lambda: RandomForestRegressor(n_estimators=10, max_depth=8, random_state=42),
+    'RandomForest_Tiny': lambda: RandomForestRegressor(n_estimators=4, max_depth=6, random_state=42),
+    'GradientBoost': lambda: GradientBoostingRegressor(n_estimators=100, random_state=42),
+    'GradientBoost_Light': lambda: GradientBoostingRegressor(
+        n_estimators=25, max_depth=3, learning_rate=0.3, random_state=42
+    ),
+    'ClosedForm_Linear': lambda: RatioLinearRegressor(),
 }
 
-# 3. ÉVALUATION PAR CROSS-VALIDATION
-best_score = -np.inf
-best_model_name = None
-
-print("🔍 Évaluation des modèles...")
-for name, model in models.items():
-    scores = cross_val_score(model, X, y, cv=5, scoring='r2')
-    mean_score = scores.mean()
-    print(f"   {name}: R² = {mean_score:.3f} (+/- {scores.std() * 2:.3f})")
-    
-    if mean_score > best_score:
-        best_score = mean_score
-        best_model_name = name
-        best_model = model
-
-# 4. ENTRAÎNER LE MEILLEUR MODÈLE
-print(f"🏆 Meilleur modèle: {best_model_name}")
-best_model.fit(X, y)
-
-# 5. SAUVEGARDER LE MODÈLE OPTIMISÉ
-joblib.dump(best_model, '../models/optimized_model.joblib')
-print(f"💾 Modèle optimisé sauvegardé: {best_model_name}")
-
-# 6. COMPARAISON AVEC ANCIEN MODÈLE
-old_model = joblib.load('../models/model.joblib')
-old_score = cross_val_score(old_model, X, y, cv=5, scoring='r2').mean()
-
-print(f"📈 Comparaison:")
-print(f"   Ancien modèle: R² = {old_score:.3f}")
-print(f"   Nouveau modèle: R² = {best_score:.3f}")
-print(f"   Amélioration: {best_score - old_score:.3f}")
-
-print("🎉 ÉTAPE 2 TERMINÉE - MODÈLE OPTIMISÉ!")
\ No newline at end of file
+
+def evaluate_candidate(name, X, y, batch_size=1000):
+    """Précision (CV 5 plis) + taille, chargement et latences du modèle entraîné"""
+    scores = cross_validate(CANDIDATES[name](), X, y, cv=5,
+                            scoring=('r2', 'neg_mean_absolute_error'))
+    model = CANDIDATES[name]().fit(X, y)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.joblib')
+        joblib.dump(model, path)
+        size_kb = os.path.getsize(path) / 1024
+        start = time.perf_counter()
+        joblib.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    row = X[:1]
+    batch = X[np.arange(batch_size) % len(X)]
+    single = measure_latency(lambda: model.predict(row), repeat=200)
+    batched = measure_latency(lambda: model.predict(batch), repeat=30)
+
+    result = {
+        'model': name,
+        'r2': scores['test_r2'].mean(),
+        'r2_std': scores['test_r2'].std(),
+        'mae': -scores['test_neg_mean_absolute_error'].mean(),
+        'size_kb': size_kb,
+        'load_ms': load_ms,
+        'single_p50_ms': single['p50_ms'],
+        'single_p99_ms': single['p99_ms'],
+        'batch_p50_ms': batched['p50_ms'],
+        'batch_p99_ms': batched['p99_ms'],
+    }
+    return model, result
+
+
+def pareto_front(results):
+    """Candidats non dominés sur (R² max, latence unitaire p50 min, taille min)"""
+    def dominates(a, b):
+        better_or_equal = (a['r2'] >= b['r2'] and a['single_p50_ms'] <= b['single_p50_ms']
+                           and a['size_kb'] <= b['size_kb'])
+        strictly_better = (a['r2'] > b['r2'] or a['single_p50_ms'] < b['single_p50_ms']
+                           or a['size_kb'] < b['size_kb'])
+        return better_or_equal and strictly_better
+
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+
+def select_fastest(results, tolerance):
+    """Le plus rapide parmi les modèles à moins de `tolerance` du meilleur R²"""
+    best_r2 = max(r['r2'] for r in results)
+    eligible = [r for r in results if r['r2'] >= best_r2 - tolerance]
+    return min(eligible, key=lambda r: (r['single_p50_ms'], r['batch_p50_ms']))
+
+
+def main(tolerance=0.01, publish=True):
+    print("🎯 ÉTAPE 2: OPTIMISATION DU MODÈLE")
+
+    # 1. CHARGER LES DONNÉES
+    df = load_dataset('synthetic_data')
+    X = df[FEATURES].to_numpy(dtype=np.float32)
+    y = df['waste_risk'].to_numpy()
+
+    print(f"📊 Données: {X.shape[0]} produits, {X.shape[1]} features")
+
+    # 2. ÉVALUATION DES CANDIDATS (précision + coût de service)
+    print("🔍 Évaluation des modèles...")
+    models, results = {}, []
+    for name in CANDIDATES:
+        models[name], result = evaluate_candidate(name, X, y)
+        results.append(result)
+        print(f"   {name}: R² = {result['r2']:.3f} (+/- {result['r2_std'] * 2:.3f}), "
+              f"MAE = {result['mae']:.2f}, {result['size_kb']:.0f} KB, "
+              f"unitaire p50/p99 = {result['single_p50_ms']:.3f}/{result['single_p99_ms']:.3f} ms")
+
+    # 3. FRONT DE PARETO ET SÉLECTION
+    front = {r['model'] for r in pareto_front(results)}
+    report = pd.DataFrame(results)
+    report['pareto'] = report['model'].isin(front)
+    report = report.sort_values('single_p50_ms')
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_path = os.path.join(REPORTS_DIR, 'model_tradeoff_report.csv')
+    report.round(4).to_csv(report_path, index=False)
+    print(f"📄 Rapport précision/latence: {report_path}")
+    print(f"⚖️  Front de Pareto: {', '.join(sorted(front))}")
+
+    chosen = select_fastest(results, tolerance)
+    best_model_name = chosen['model']
+    best_model = models[best_model_name]
+    best_score = chosen['r2']
+    print(f"🏆 Modèle retenu (tolérance R² {tolerance}): {best_model_name}")
+
+    # 4. SAUVEGARDER LE MODÈLE OPTIMISÉ
+    joblib.dump(best_model, os.path.join(MODELS_DIR, 'optimized_model.joblib'))
+    print(f"💾 Modèle optimisé sauvegardé: {best_model_name}")
+
+    # Publication dans le registre : l'API bascule dessus sans redémarrage
+    if publish:
+        version = ModelRegistry().publish(best_model, {
+            'name': best_model_name,
+            'cv_r2': round(best_score, 4),
+            'single_p50_ms': round(chosen['single_p50_ms'], 4),
+            # Esquisses des features d'entraînement pour le contrôle de dérive
+            'reference_profile': reference_profile(X),
+        })
+        print(f"📦 Version publiée dans le registre: {version}")
+
+    # 5. COMPARAISON AVEC ANCIEN MODÈLE
+    old_model = joblib.load(os.path.join(MODELS_DIR, 'model.joblib'))
+    old_score = cross_validate(old_model, df[FEATURES], y, cv=5, scoring='r2')['test_score'].mean()
+
+    print(f"📈 Comparaison:")
+    print(f"   Ancien modèle: R² = {old_score:.3f}")
+    print(f"   Nouveau modèle: R² = {best_score:.3f}")
+    print(f"   Amélioration: {best_score - old_score:.3f}")
+
+    print("🎉 ÉTAPE 2 TERMINÉE - MODÈLE OPTIMISÉ!")
+    return chosen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Optimisation précision/latence du modèle de risque")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Perte de R² acceptée pour un modèle plus rapide")
+    parser.add_argument('--no-publish', action='store_true', help="Ne pas publier dans le registre")
+    args = parser.parse_args()
+    main(tolerance=args.tolerance, publish=not args.no_publish)
@@ -0,0 +1,205 @@
+# model_registry.py - Registre local de modèles versionnés + rechargement à chaud
+import errno
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+
+import joblib
+
+from paths import MODELS_DIR, REGISTRY_DIR
+
+CURRENT_FILE = 'CURRENT'
+ARTIFACT_NAME = 'model.joblib'
+METADATA_NAME = 'metadata.json'
+
+
+class ModelRegistry:
+    """Dossier de versions (v0001, v0002...) et pointeur CURRENT vers la version active"""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def versions(self):
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith('v') and os.path.isfile(os.path.join(self.root, name, ARTIFACT_NAME))
+        )
+
+    def artifact_path(self, version):
+        return os.path.join(self.root, version, ARTIFACT_NAME)
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding='utf-8') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def set_current(self, version):
+        """Bascule atomique du pointeur (écriture temporaire + os.replace)"""
+        if not os.path.isfile(self.artifact_path(version)):
+            raise ValueError(f"Version inconnue: {version}")
+        tmp_path = os.path.join(self.root, f'.{CURRENT_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    def metadata(self, version):
+        try:
+            with open(os.path.join(self.root, version, METADATA_NAME), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _publish(self, write_artifact, metadata, activate):
+        tmp_dir = os.path.join(self.root, f'.tmp-{os.getpid()}-{threading.get_ident()}')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            write_artifact(os.path.join(tmp_dir, ARTIFACT_NAME))
+
+            metadata = dict(metadata or {})
+            metadata.setdefault('created_at', datetime.now().isoformat(timespec='seconds'))
+
+            # Le renommage du dossier rend la version visible d'un coup
+            existing = self.versions()
+            number = int(existing[-1][1:]) + 1 if existing else 1
+            while True:
+                version = f"v{number:04d}"
+                metadata['version'] = version
+                with open(os.path.join(tmp_dir, METADATA_NAME), 'w', encoding='utf-8') as f:
+                    json.dump(metadata, f, indent=2, ensure_ascii=False)
+                target = os.path.join(self.root, version)
+                try:
+                    os.rename(tmp_dir, target)
+                    break
+                except OSError as e:
+                    # Seule une collision de nom (version publiée en parallèle) justifie
+                    # de prendre la suivante ; droits, disque plein... remontent
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY) and not os.path.exists(target):
+                        raise
+                    number += 1
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        if activate:
+            self.set_current(version)
+        return version
+
+    def publish(self, model, metadata=None, activate=True):
+        """Publie un modèle en mémoire comme nouvelle version"""
+        return self._publish(lambda path: joblib.dump(model, path), metadata, activate)
+
+    def publish_file(self, artifact_path, metadata=None, activate=True):
+        """Publie un fichier .joblib existant comme nouvelle version"""
+        metadata = dict(metadata or {})
+        metadata.setdefault('source', os.path.abspath(artifact_path))
+        return self._publish(lambda path: shutil.copy2(artifact_path, path), metadata, activate)
+
+    def load(self, version=None):
+        version = version or self.current_version()
+        if version is None:
+            return None, None
+        return version, joblib.load(self.artifact_path(version))
+
+
+class HotSwapModel:
+    """Modèle servi par l'API, remplacé à chaud quand CURRENT change.
+
+    Le chargement et le préchauffage se font dans un thread de fond ; la
+    bascule est une seule affectation du couple (version, modèle), donc les
+    requêtes en cours gardent l'ancien modèle jusqu'à la fin.
+    """
+
+    def __init__(self, registry=None, warmup_batch=None, poll_interval=2.0,
+                 fallback_path=os.path.join(MODELS_DIR, 'model.joblib')):
+        self.registry = registry or ModelRegistry()
+        self.warmup_batch = warmup_batch
+        self.poll_interval = poll_interval
+        self.fallback_path = fallback_path
+        self._active = (None, None)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def get(self):
+        """Couple (version, modèle) actif - lecture sans verrou"""
+        return self._active
+
+    @property
+    def version(self):
+        return self._active[0]
+
+    def _warm(self, model):
+        if self.warmup_batch is not None:
+            model.predict(self.warmup_batch)
+
+    def load_initial(self):
+        """Chargement bloquant au démarrage : registre, sinon ancien fichier"""
+        try:
+            version, model = self.registry.load()
+        except Exception as e:
+            self.last_error = str(e)
+            version, model = None, None
+        if model is None and self.fallback_path and os.path.exists(self.fallback_path):
+            version, model = 'legacy', joblib.load(self.fallback_path)
+        if model is not None:
+            self._warm(model)
+            self._active = (version, model)
+        return self._active
+
+    def refresh(self):
+        """Charge la version pointée par CURRENT si elle a changé"""
+        target = self.registry.current_version()
+        if target is None or target == self._active[0]:
+            return False
+        try:
+            version, model = self.registry.load(target)
+            self._warm(model)
+        except Exception as e:
+            # On garde le modèle actif si le nouvel artefact est illisible
+            self.last_error = f"{target}: {e}"
+            print(f"⚠️  Échec du chargement de {target}: {e}")
+            return False
+        self._active = (version, model)
+        self.last_error = None
+        print(f"🔄 Modèle {version} activé à chaud")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.refresh()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    # python model_registry.py list | publish <fichier.joblib> | activate <version>
+    registry = ModelRegistry()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    if command == 'publish':
+        version = registry.publish_file(sys.argv[2])
+        print(f"📦 {sys.argv[2]} publié en {version} (actif)")
+    elif command == 'activate':
+        registry.set_current(sys.argv[2])
+        print(f"✅ Version active: {sys.argv[2]}")
+    else:
+        current = registry.current_version()
+        print(f"📚 Registre: {registry.root}")
+        for version in registry.versions():
+            marker = '*' if version == current else ' '
+            print(f" {marker} {version} {registry.metadata(version)}")
@@ -4,49 +4,31 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import joblib
+from feature_pipeline import DemandFeaturePipeline, HistoryState
+from packed_forest import QUANTILES, PackedForest
+from paths import DATA_DIR, MODELS_DIR
+from schema import load_dataset
 import os
 import warnings
 warnings.filterwarnings('ignore')
 
+PREDICTOR_PATH = os.path.join(MODELS_DIR, 'demand_predictor.pkl')
+PIPELINE_PATH = os.path.join(MODELS_DIR, 'demand_pipeline.pkl')
+HISTORY_PATH = os.path.join(MODELS_DIR, 'demand_history.pkl')
+SALES_PATH = os.path.join(DATA_DIR, 'supermarket_sales.csv')
+
 class DemandPredictor:
-    def __init__(self):
+    def __init__(self, use_history=True):
         self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+        self.pipeline = DemandFeaturePipeline(use_history=use_history)
+        self.history = None
         self.features = []
         
     def prepare_features(self, df):
-        df = df.copy()
-        
-        # Vérifier et corriger les noms de colonnes
-        if 'date' not in df.columns and 'Date' in df.columns:
-            df = df.rename(columns={'Date': 'date'})
-        if 'category' not in df.columns and 'Produit' in df.columns:
-            df = df.rename(columns={'Produit': 'category'})
-        if 'quantity_sold' not in df.columns and 'Ventes' in df.columns:
-            df = df.rename(columns={'Ventes': 'quantity_sold'})
-        if 'price' not in df.columns and 'Prix' in df.columns:
-            df = df.rename(columns={'Prix': 'price'})
-        
-        # Créer les colonnes manquantes avec des valeurs par défaut
-        if 'promotion' not in df.columns:
-            df['promotion'] = 0
-        if 'weather_effect' not in df.columns:
-            df['weather_effect'] = 1.0
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df['day_of_week'] = df['date'].dt.dayofweek
-        df['month'] = df['date'].dt.month
-        df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-        
-        feature_columns = [
-            'day_of_week', 'month', 'is_weekend', 
-            'price', 'promotion', 'weather_effect'
-        ]
-        
-        category_dummies = pd.get_dummies(df['category'], prefix='cat')
-        
-        self.features = feature_columns + list(category_dummies.columns)
-        X = pd.concat([df[feature_columns], category_dummies], axis=1)
-        y = df['quantity_sold']
+        # Pipeline ajusté : dates au format explicite, codes de catégorie, float32
+        X = self.pipeline.fit_transform(df)
+        y = self.pipeline.target(df)
+        self.features = list(self.pipeline.feature_names_)
         
         return X, y
     
@@ -68,35 +50,26 @@ class DemandPredictor:
         print(f'MAE: {mae:.2f}, RMSE: {rmse:.2f}')
         
         # Créer le dossier models s'il n'existe pas
-        os.makedirs('models', exist_ok=True)
-        joblib.dump(self.model, 'models/demand_predictor.pkl')
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        joblib.dump(self.model, PREDICTOR_PATH)
+        joblib.dump(self.pipeline, PIPELINE_PATH)
+        if self.pipeline.use_history:
+            # Fenêtres par produit pour servir sans relire tout l'historique
+            self.history = HistoryState.from_frame(self.pipeline.normalize(df), self.pipeline.history_key_)
+            joblib.dump(self.history, HISTORY_PATH)
         print('Modèle sauvegardé')
         
         return mae, rmse
     
     def predict_demand(self, product_data):
         try:
-            model = joblib.load('models/demand_predictor.pkl')
-            
-            df = pd.DataFrame([product_data])
-            df['date'] = pd.to_datetime(df['date'])
-            df['day_of_week'] = df['date'].dt.dayofweek
-            df['month'] = df['date'].dt.month
-            df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-            
-            feature_columns = ['day_of_week', 'month', 'is_weekend', 'price', 'promotion', 'weather_effect']
-            category_dummies = pd.get_dummies(df['category'], prefix='cat')
+            model = joblib.load(PREDICTOR_PATH)
+            if self.pipeline.categories_ is None:
+                self.pipeline = joblib.load(PIPELINE_PATH)
+            if self.pipeline.use_history and self.history is None:
+                self.history = joblib.load(HISTORY_PATH)
             
-            X_pred = pd.concat([df[feature_columns], category_dummies], axis=1)
-            
-            # Obtenir les caractéristiques attendues du modèle entraîné
-            expected_features = self.features
-            
-            for col in expected_features:
-                if col not in X_pred.columns:
-                    X_pred[col] = 0
-            
-            X_pred = X_pred[expected_features]
+            X_pred = self.pipeline.transform(pd.DataFrame([product_data]), history=self.history)
             
             prediction = model.predict(X_pred)[0]
             return max(0, int(prediction))
@@ -104,6 +77,36 @@ class DemandPredictor:
         except Exception as e:
             print(f'Erreur de prédiction: {e}')
             return None
+    
+    def predict_demand_batch(self, df):
+        """Prévisions pour tout un catalogue en un seul appel au modèle"""
+        model = joblib.load(PREDICTOR_PATH)
+        if self.pipeline.categories_ is None:
+            self.pipeline = joblib.load(PIPELINE_PATH)
+        if self.pipeline.use_history and self.history is None:
+            self.history = joblib.load(HISTORY_PATH)
+        
+        X_pred = self.pipeline.transform(df, history=self.history)
+        return np.maximum(model.predict(X_pred), 0)
+    
+    def predict_demand_quantiles(self, df, quantiles=QUANTILES):
+        """Prévision + quantiles de demande (distribution des arbres), en un calcul tableau"""
+        model = joblib.load(PREDICTOR_PATH)
+        if self.pipeline.categories_ is None:
+            self.pipeline = joblib.load(PIPELINE_PATH)
+        if self.pipeline.use_history and self.history is None:
+            self.history = joblib.load(HISTORY_PATH)
+        
+        X_pred = self.pipeline.transform(df, history=self.history)
+        bands = PackedForest(model).predict_quantiles(X_pred, quantiles)
+        return pd.DataFrame({name: np.maximum(values, 0) for name, values in bands.items()}, index=df.index)
+    
+    def update_history(self, sale):
+        """Enregistre les ventes réalisées d'un jour (date, produit/catégorie, quantity_sold)"""
+        if self.history is None:
+            self.history = joblib.load(HISTORY_PATH)
+        self.history.update(sale[self.history.key], sale['date'],
+                            sale['quantity_sold'], sale.get('promotion', 0))
 
 def create_sample_data():
     """Crée un fichier de données d'exemple pour l'anti-gaspillage"""
@@ -129,16 +132,16 @@ def create_sample_data():
 
 if __name__ == '__main__':
     # Créer le dossier data s'il n'existe pas
-    os.makedirs('data', exist_ok=True)
+    os.makedirs(DATA_DIR, exist_ok=True)
     
     # Essayer de lire le fichier, le créer s'il n'existe pas
     try:
-        df = pd.read_csv('data/supermarket_sales.csv')
+        df = load_dataset(SALES_PATH)
         print("Fichier de données chargé avec succès !")
     except FileNotFoundError:
         print("Création du fichier de données d'exemple...")
         df = create_sample_data()
-        df.to_csv('data/supermarket_sales.csv', index=False)
+        df.to_csv(SALES_PATH, index=False)
         print("Fichier data/supermarket_sales.csv créé avec succès !")
     
     # Afficher les premières lignes pour vérification
@@ -0,0 +1,10 @@
+# paths.py - Chemins du projet, indépendants du dossier de lancement
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+MODELS_DIR = os.path.join(ROOT_DIR, 'models')
+REPORTS_DIR = os.path.join(ROOT_DIR, 'reports')
+
+# Registre des modèles versionnés (surcharge possible pour Docker)
+REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join(MODELS_DIR, 'registry'))
@@ -0,0 +1,311 @@
+# pipeline.py - Exécution des étapes ML avec cache adressé par contenu
+# Usage : python pipeline.py [étape ...] [--force] [--jobs N] [--publish] [--list]
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+
+from paths import ROOT_DIR
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get('PIPELINE_CACHE_DIR', os.path.join(ROOT_DIR, '.pipeline_cache'))
+# Entrée dossier (suffixe /) : facultative, empreinte sur la liste de ses fichiers
+PREDICTION_LOG = os.path.join(os.environ.get('PREDICTION_LOG_DIR', 'logs/predictions'), '')
+
+
+@dataclass
+class Stage:
+    """Étape : script de src/ + fichiers lus / écrits (relatifs à la racine)"""
+    name: str
+    script: str
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    default: bool = True  # False : seulement si demandée explicitement
+
+    def command(self):
+        args = [sys.executable, self.script]
+        for key, value in self.params.items():
+            if value is True:
+                args.append(f'--{key}')
+            elif value not in (False, None):
+                args += [f'--{key}', str(value)]
+        return args
+
+
+STAGES = [
+    Stage('generate', 'generate_data.py', outputs=['data/synthetic_data.csv'],
+          params={'n': 500, 'seed': 42}, default=False),
+    Stage('train', 'train.py', inputs=['data/synthetic_data.csv'], outputs=['models/model.joblib']),
+    Stage('optimize', 'model_optimizer.py', inputs=['data/synthetic_data.csv', 'models/model.joblib'],
+          outputs=['models/optimized_model.joblib', 'reports/model_tradeoff_report.csv'],
+          params={'no-publish': True}),
+    Stage('service', 'prediction_service.py',
+          inputs=['models/optimized_model.joblib', 'models/model.joblib']),
+    Stage('analytics', 'analytics.py',
+          inputs=['data/synthetic_data.csv', 'models/optimized_model.joblib', 'models/model.joblib',
+                  PREDICTION_LOG],
+          outputs=['reports/analytics_report.txt']),
+    Stage('demand', 'model_training.py', inputs=['data/supermarket_sales.csv'],
+          outputs=['models/demand_predictor.pkl', 'models/demand_pipeline.pkl', 'models/demand_history.pkl']),
+    Stage('pricing', 'pricing_engine.py', inputs=['data/supermarket_sales.csv', 'data/synthetic_data.csv'],
+          outputs=['models/pricing_elasticity.json']),
+    Stage('replenishment', 'replenishment.py', inputs=['data/synthetic_data.csv'],
+          outputs=['reports/replenishment_orders.csv']),
+    Stage('backtest', 'backtesting.py', inputs=['data/supermarket_sales.csv', 'models/model.joblib'],
+          outputs=['reports/backtest_report.csv']),
+]
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """Objets adressés par leur sha256 + index (taille, mtime) -> hash
+    pour ne pas relire les gros fichiers inchangés."""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.manifests = os.path.join(root, 'stages')
+        self.logs = os.path.join(root, 'logs')
+        for directory in (self.objects, self.manifests, self.logs):
+            os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(root, 'hashes.json')
+        try:
+            with open(self._index_path, encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._index = {}
+
+    def hash_file(self, path):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = f"{stat.st_size}:{stat.st_mtime_ns}"
+        cached = self._index.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = _sha256_file(path)
+        self._index[path] = [key, digest]
+        return digest
+
+    def save_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def put(self, path):
+        digest = self.hash_file(path)
+        target = os.path.join(self.objects, digest)
+        if not os.path.exists(target):
+            shutil.copy2(path, f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+        return digest
+
+    def restore(self, digest, path):
+        """Remet un objet du cache à sa place s'il diffère du fichier présent"""
+        if self.hash_file(path) == digest:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy2(os.path.join(self.objects, digest), path)
+        return True
+
+    def has(self, digest):
+        return os.path.exists(os.path.join(self.objects, digest))
+
+    def manifest_path(self, stage, fingerprint):
+        return os.path.join(self.manifests, stage, f"{fingerprint}.json")
+
+
+def code_dependencies(script):
+    """Script + modules locaux de src/ importés (transitivement)"""
+    seen, pending = set(), [script]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        with open(os.path.join(SRC_DIR, name), encoding='utf-8-sig') as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            modules = ([alias.name for alias in node.names] if isinstance(node, ast.Import)
+                       else [node.module] if isinstance(node, ast.ImportFrom) and node.module else [])
+            for module in modules:
+                candidate = f"{module.split('.')[0]}.py"
+                if os.path.exists(os.path.join(SRC_DIR, candidate)):
+                    pending.append(candidate)
+    return sorted(seen)
+
+
+def is_directory_input(path):
+    return path.endswith(('/', os.sep))
+
+
+def hash_directory(path):
+    """Empreinte d'un dossier en ajout seul (journal) : chemin, taille et mtime de
+    chaque fichier, sans relire le contenu ; None si le dossier n'existe pas"""
+    if not os.path.isdir(path):
+        return None
+    files = []
+    for directory, _, names in os.walk(path):
+        for name in names:
+            if name.startswith('.') or name.endswith(('.part', '.tmp')):
+                continue  # Écriture en cours
+            file_path = os.path.join(directory, name)
+            stat = os.stat(file_path)
+            files.append([os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha256(json.dumps(sorted(files)).encode()).hexdigest()
+
+
+def hash_input(path, store):
+    full_path = os.path.join(ROOT_DIR, path)
+    return hash_directory(full_path) if is_directory_input(path) else store.hash_file(full_path)
+
+
+def fingerprint(stage, store):
+    """sha256 du code, des entrées et des paramètres de l'étape"""
+    payload = {
+        'stage': stage.name,
+        'params': stage.params,
+        'code': {name: store.hash_file(os.path.join(SRC_DIR, name)) for name in code_dependencies(stage.script)},
+        'inputs': {path: hash_input(path, store) for path in stage.inputs},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def select_stages(names):
+    """Étapes demandées + leurs producteurs en amont (generate seulement si demandée
+    ou si ses sorties manquent)"""
+    by_name = {stage.name: stage for stage in STAGES}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise SystemExit(f"Étapes inconnues: {unknown} (disponibles: {list(by_name)})")
+    producers = {output: stage for stage in STAGES for output in stage.outputs}
+    selected = {name for name in names} or {stage.name for stage in STAGES if stage.default}
+    pending = list(selected)
+    while pending:
+        for path in by_name[pending.pop()].inputs:
+            producer = producers.get(path)
+            if producer is None or producer.name in selected:
+                continue
+            if producer.default or not os.path.exists(os.path.join(ROOT_DIR, path)):
+                selected.add(producer.name)
+                pending.append(producer.name)
+    return [stage for stage in STAGES if stage.name in selected]
+
+
+def run_stage(stage, store, force=False):
+    """Exécute ou restaure une étape ; renvoie (statut, durée, empreinte)"""
+    start = time.perf_counter()
+    missing = [path for path in stage.inputs
+               if not is_directory_input(path) and not os.path.exists(os.path.join(ROOT_DIR, path))]
+    if missing:
+        return 'failed', 0.0, f"entrées manquantes: {missing}"
+    key = fingerprint(stage, store)
+    manifest_path = store.manifest_path(stage.name, key)
+
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if all(store.has(digest) for digest in manifest['outputs'].values()):
+            for path, digest in manifest['outputs'].items():
+                store.restore(digest, os.path.join(ROOT_DIR, path))
+            return 'cached', time.perf_counter() - start, key[:12]
+
+    log_path = os.path.join(store.logs, f"{stage.name}.log")
+    env = dict(os.environ, PYTHONIOENCODING='utf-8', MPLBACKEND='Agg')
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run(stage.command(), cwd=SRC_DIR, stdout=log, stderr=subprocess.STDOUT, env=env)
+    if result.returncode != 0:
+        return 'failed', time.perf_counter() - start, f"code {result.returncode}, voir {log_path}"
+
+    outputs = {}
+    for path in stage.outputs:
+        absolute = os.path.join(ROOT_DIR, path)
+        if not os.path.exists(absolute):
+            return 'failed', time.perf_counter() - start, f"sortie absente: {path}"
+        outputs[path] = store.put(absolute)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'stage': stage.name, 'outputs': outputs,
+                   'duration_s': round(time.perf_counter() - start, 3)}, f, indent=2)
+    return 'run', time.perf_counter() - start, key[:12]
+
+
+def run_pipeline(names=(), force=False, jobs=None, publish=False):
+    stages = select_stages(names)
+    if publish:
+        stages = [replace(stage, params={**stage.params, 'no-publish': False}) if stage.name == 'optimize'
+                  else stage for stage in stages]
+    store = ContentStore()
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    upstream = {stage.name: {producers[path] for path in stage.inputs
+                             if path in producers and producers[path] != stage.name}
+                for stage in stages}
+
+    results, running = {}, {}
+    print(f"🔁 PIPELINE: {', '.join(stage.name for stage in stages)}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while len(results) < len(stages):
+            for stage in stages:
+                if stage.name in results or stage.name in running:
+                    continue
+                deps = upstream[stage.name]
+                if any(results.get(dep, ('',))[0] in ('failed', 'skipped') for dep in deps):
+                    results[stage.name] = ('skipped', 0.0, 'étape amont en échec')
+                    print(f"   ⏭️  {stage.name}: ignorée (étape amont en échec)")
+                elif deps <= results.keys():
+                    # Étapes indépendantes lancées en parallèle
+                    running[stage.name] = pool.submit(run_stage, stage, store, force)
+            if not running:
+                continue
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future in done:
+                    results[name] = future.result()
+                    del running[name]
+                    status, duration, detail = results[name]
+                    icon = {'run': '✅', 'cached': '💾', 'failed': '❌'}[status]
+                    print(f"   {icon} {name}: {status} en {duration:.2f} s ({detail})")
+    store.save_index()
+
+    print("\n⏱️  RÉSUMÉ PAR ÉTAPE")
+    print(f"   {'étape':<14} {'statut':<8} {'durée (s)':>9}")
+    for stage in stages:
+        status, duration, _ = results[stage.name]
+        print(f"   {stage.name:<14} {status:<8} {duration:>9.2f}")
+    print(f"   {'total':<14} {'':<8} {time.perf_counter() - start:>9.2f}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pipeline ML anti-gaspillage avec cache")
+    parser.add_argument('stages', nargs='*', help="Étapes à exécuter (défaut : toutes sauf generate)")
+    parser.add_argument('--force', action='store_true', help="Ignorer le cache")
+    parser.add_argument('--jobs', type=int, default=None, help="Étapes en parallèle")
+    parser.add_argument('--publish', action='store_true', help="Publier le modèle optimisé dans le registre")
+    parser.add_argument('--list', action='store_true', help="Lister les étapes et leurs dépendances")
+    args = parser.parse_args()
+
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name:<14} {stage.script:<24} entrées={stage.inputs} sorties={stage.outputs}")
+            print(f"{'':<14} code={code_dependencies(stage.script)}")
+        sys.exit(0)
+    results = run_pipeline(args.stages, args.force, args.jobs, args.publish)
+    sys.exit(1 if any(status == 'failed' for status, _, _ in results.values()) else 0)
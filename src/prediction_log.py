@@ -0,0 +1,207 @@
+# prediction_log.py - Journal asynchrone des prédictions servies
+import atexit
+import collections
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+from paths import ROOT_DIR
+
+try:
+    import pyarrow  # noqa: F401 - moteur Parquet pour la compaction
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+LOG_DIR = os.environ.get('PREDICTION_LOG_DIR', os.path.join(ROOT_DIR, 'logs', 'predictions'))
+SEGMENTS_DIR = 'segments'
+BATCH_PREFIX = 'compacting-'  # Segments réservés par une compaction : segments/compacting-<lot>/
+
+
+def _utc_stamp():
+    return time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _batch_of(path):
+    """Lot d'une partie Parquet (part-<lot>.parquet)"""
+    return os.path.basename(path)[len('part-'):-len('.parquet')]
+
+
+class PredictionLog:
+    """Journal des prédictions : tampon circulaire en mémoire + écrivain de fond.
+
+    Les handlers ne font qu'un append sur une deque (O(1), sans I/O). Un thread
+    vide le tampon par lots dans des segments NDJSON en ajout seul, puis les
+    compacte périodiquement en Parquet partitionné par jour (day=AAAA-MM-JJ).
+    """
+
+    def __init__(self, log_dir=LOG_DIR, capacity=100_000, flush_interval=1.0,
+                 compact_interval=300.0):
+        self.log_dir = log_dir
+        self.segments_dir = os.path.join(log_dir, SEGMENTS_DIR)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._buffer = collections.deque(maxlen=capacity)
+        self._io_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._segment_counter = 0
+        self.dropped = 0
+        self.written = 0
+        os.makedirs(self.segments_dir, exist_ok=True)
+
+    def record(self, entry):
+        """Ajoute une prédiction au tampon (appelé depuis les requêtes)"""
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1  # Le plus ancien est écrasé si l'écrivain ne suit pas
+        entry.setdefault('ts', time.time())
+        self._buffer.append(entry)
+
+    def _drain(self):
+        entries = []
+        try:
+            while True:
+                entries.append(self._buffer.popleft())
+        except IndexError:
+            return entries
+
+    def flush(self):
+        """Écrit tout le tampon dans un nouveau segment ; renvoie le nombre de lignes"""
+        entries = self._drain()
+        if not entries:
+            return 0
+        with self._io_lock:
+            self._segment_counter += 1
+            name = f"seg-{_utc_stamp()}-{os.getpid()}-{self._segment_counter:06d}"
+            tmp_path = os.path.join(self.segments_dir, name + '.part')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(json.dumps(entry, ensure_ascii=False, default=str) for entry in entries))
+                f.write('\n')
+            # Segment visible seulement une fois complet
+            os.replace(tmp_path, os.path.join(self.segments_dir, name + '.ndjson'))
+        self.written += len(entries)
+        return len(entries)
+
+    def compact(self):
+        """Fusionne les segments fermés en fichiers Parquet par jour (UTC).
+
+        Les segments sont d'abord déplacés dans un dossier de lot
+        (segments/compacting-<lot>/), puis écrits en part-<lot>.parquet et
+        enfin supprimés. Un lot interrompu par un arrêt est rejoué au passage
+        suivant : les parties portent le nom du lot et sont simplement
+        réécrites, donc aucune ligne n'est fusionnée deux fois.
+        """
+        if not PARQUET_AVAILABLE:
+            return 0
+        with self._io_lock:
+            total = 0
+            for batch_dir in sorted(glob.glob(os.path.join(self.segments_dir, BATCH_PREFIX + '*'))):
+                pid = int(os.path.basename(batch_dir).rsplit('-', 2)[1])
+                if pid == os.getpid() or not _alive(pid):
+                    total += self._compact_batch(batch_dir)
+
+            segments = sorted(glob.glob(os.path.join(self.segments_dir, '*.ndjson')))
+            if not segments:
+                return total
+            self._segment_counter += 1
+            batch_dir = os.path.join(self.segments_dir,
+                                     f"{BATCH_PREFIX}{_utc_stamp()}-{os.getpid()}-{self._segment_counter:06d}")
+            os.makedirs(batch_dir)
+            for path in segments:
+                try:
+                    os.rename(path, os.path.join(batch_dir, os.path.basename(path)))
+                except FileNotFoundError:
+                    pass  # Réservé par une autre compaction (autre processus)
+            return total + self._compact_batch(batch_dir)
+
+    def _compact_batch(self, batch_dir):
+        batch = os.path.basename(batch_dir)[len(BATCH_PREFIX):]
+        segments = sorted(glob.glob(os.path.join(batch_dir, '*.ndjson')))
+        if not segments:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return 0
+        df = pd.concat([pd.read_json(path, lines=True) for path in segments], ignore_index=True)
+        df['day'] = pd.to_datetime(df['ts'], unit='s').dt.strftime('%Y-%m-%d')
+        for day, part in df.groupby('day'):
+            day_dir = os.path.join(self.log_dir, f'day={day}')
+            os.makedirs(day_dir, exist_ok=True)
+            tmp_path = os.path.join(day_dir, f'.part-{batch}.tmp')
+            part.drop(columns='day').to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(day_dir, f'part-{batch}.parquet'))
+        shutil.rmtree(batch_dir)
+        return len(df)
+
+    def _run(self):
+        next_compaction = time.monotonic() + self.compact_interval
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() >= next_compaction:
+                    self.compact()
+                    next_compaction = time.monotonic() + self.compact_interval
+            except Exception as e:
+                print(f"⚠️  Journal des prédictions: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        return {'buffered': len(self._buffer), 'written': self.written, 'dropped': self.dropped}
+
+
+def read_log(log_dir=LOG_DIR, start_day=None, end_day=None):
+    """Charge le journal (Parquet compacté + segments en attente) en DataFrame.
+    Un lot de compaction inachevé est lu depuis ses segments, pas ses parties."""
+    frames = []
+    pending = glob.glob(os.path.join(log_dir, SEGMENTS_DIR, BATCH_PREFIX + '*'))
+    unfinished = {os.path.basename(path)[len(BATCH_PREFIX):] for path in pending}
+    for day_dir in sorted(glob.glob(os.path.join(log_dir, 'day=*'))):
+        day = os.path.basename(day_dir)[len('day='):]
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        frames.extend(pd.read_parquet(path) for path in sorted(glob.glob(os.path.join(day_dir, '*.parquet')))
+                      if _batch_of(path) not in unfinished)
+    segments = glob.glob(os.path.join(log_dir, SEGMENTS_DIR, '*.ndjson'))
+    segments += glob.glob(os.path.join(log_dir, SEGMENTS_DIR, BATCH_PREFIX + '*', '*.ndjson'))
+    for path in sorted(segments):
+        frames.append(pd.read_json(path, lines=True))
+
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    df['timestamp'] = pd.to_datetime(df['ts'], unit='s')  # UTC, comme les partitions day=
+    if start_day:
+        df = df[df['timestamp'] >= pd.Timestamp(start_day)]
+    if end_day:
+        df = df[df['timestamp'] < pd.Timestamp(end_day) + pd.Timedelta(days=1)]
+    return df.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # python prediction_log.py : compaction manuelle des segments en attente
+    log = PredictionLog()
+    print(f"🗜️  {log.compact()} prédictions compactées en Parquet dans {log.log_dir}")
@@ -1,45 +1,69 @@
 # prediction_service.py
+import os
 import joblib
 import pandas as pd
+from packed_forest import PackedForest, is_forest
+from paths import MODELS_DIR
+from risk_scoring import FEATURES, REMISES, features_matrix, risk_codes
 
 class WastePredictionService:
-    def __init__(self, model_path='../models/optimized_model.joblib'):
+    def __init__(self, model_path=os.path.join(MODELS_DIR, 'optimized_model.joblib'), pricing=None):
+        # pricing : MarkdownOptimizer optionnel (remise optimisée au lieu des paliers fixes)
+        self.pricing = pricing
+        self._packed = None
         try:
             self.model = joblib.load(model_path)
             print(" Service de prédiction initialisé avec modèle optimisé")
         except:
             # Fallback sur le modèle de base
-            self.model = joblib.load('../models/model.joblib')
+            self.model = joblib.load(os.path.join(MODELS_DIR, 'model.joblib'))
             print(" Service de prédiction initialisé avec modèle de base")
     
-    def predict_single(self, stock_quantity, expiration_days, price, quantity_sold):
-        """Prédire le risque pour un seul produit"""
-        features = [[stock_quantity, expiration_days, price, quantity_sold]]
-        risk_score = self.model.predict(features)[0]
-        
-        # Logique métier basée sur tes données
-        if risk_score > 15:
-            level = " CRITIQUE"
-            action = "PROMOTION URGENTE 50% - Risque très élevé"
-            discount = "50%"
-        elif risk_score > 8:
-            level = " ÉLEVÉ" 
-            action = "Promotion 30% recommandée"
-            discount = "30%"
-        elif risk_score > 3:
-            level = " MODÉRÉ"
-            action = "Surveillance renforcée - Promotion 15% envisageable"
-            discount = "15%"
-        else:
-            level = " FAIBLE"
-            action = "Niveau normal - Aucune action nécessaire"
-            discount = "0%"
-        
+    # Libellés du service (sans emoji pour les consoles Windows)
+    NIVEAUX = (" FAIBLE", " MODÉRÉ", " ÉLEVÉ", " CRITIQUE")
+    ACTIONS = (
+        "Niveau normal - Aucune action nécessaire",
+        "Surveillance renforcée - Promotion 15% envisageable",
+        "Promotion 30% recommandée",
+        "PROMOTION URGENTE 50% - Risque très élevé",
+    )
+
+    def predict_scores(self, stock_quantity, expiration_days, price, quantity_sold):
+        """Scores de risque vectorisés (un seul appel au modèle pour tout le lot)"""
+        features = features_matrix(stock_quantity, expiration_days, price, quantity_sold)
+        if hasattr(self.model, 'feature_names_in_'):
+            features = pd.DataFrame(features, columns=FEATURES)
+        return self.model.predict(features)
+
+    def predict_intervals(self, stock_quantity, expiration_days, price, quantity_sold):
+        """P10/P50/P90 du risque (distribution des arbres) ; None si le modèle n'est pas une forêt"""
+        if not is_forest(self.model):
+            return None
+        if self._packed is None:
+            self._packed = PackedForest(self.model)
+        return self._packed.predict_quantiles(
+            features_matrix(stock_quantity, expiration_days, price, quantity_sold))
+
+    def _intervals(self, bands):
+        """Dicts {p10, p50, p90} par produit à partir des tableaux de quantiles"""
+        return [{'p10': round(float(p10), 2), 'p50': round(float(p50), 2), 'p90': round(float(p90), 2)}
+                for p10, p50, p90 in zip(bands['p10'], bands['p50'], bands['p90'])]
+
+    def suggested_discounts(self, codes, catalog):
+        """Remises proposées : paliers fixes, ou optimisées par le moteur de prix"""
+        if self.pricing is None:
+            return [REMISES[code] for code in codes]
+        discounts = self.pricing.recommend(catalog)['recommended_discount'].to_numpy()
+        return [f"{discount:.0%}" for discount in discounts]
+
+    def _result(self, risk_score, code, stock_quantity, expiration_days, price, quantity_sold,
+                discount=None):
         return {
-            'risk_score': round(risk_score, 2),
-            'risk_level': level,
-            'recommendation': action,
-            'suggested_discount': discount,
+            'risk_score': round(float(risk_score), 2),
+            'risk_level': self.NIVEAUX[code],
+            'risk_code': int(code),
+            'recommendation': self.ACTIONS[code],
+            'suggested_discount': discount or REMISES[code],
             'features_used': {
                 'stock_quantity': stock_quantity,
                 'expiration_days': expiration_days,
@@ -47,23 +71,85 @@ class WastePredictionService:
                 'quantity_sold': quantity_sold
             }
         }
-    
-    def predict_batch(self, products_list):
-        """Prédire pour plusieurs produits"""
-        return [self.predict_single(**product) for product in products_list]
-    
+
+    def predict_single(self, stock_quantity, expiration_days, price, quantity_sold, interval=False):
+        """Prédire le risque pour un seul produit (interval : ajoute P10/P50/P90)"""
+        risk_score = self.predict_scores(stock_quantity, expiration_days, price, quantity_sold)[0]
+        code = risk_codes(risk_score)
+        catalog = pd.DataFrame([[stock_quantity, expiration_days, price, quantity_sold]], columns=FEATURES)
+        result = self._result(risk_score, code, stock_quantity, expiration_days, price, quantity_sold,
+                              self.suggested_discounts([code], catalog)[0])
+        bands = self.predict_intervals(stock_quantity, expiration_days, price, quantity_sold) if interval else None
+        if bands is not None:
+            result['risk_interval'] = self._intervals(bands)[0]
+        return result
+
+    def predict_batch(self, products_list, interval=False):
+        """Prédire pour plusieurs produits (interval : ajoute P10/P50/P90)"""
+        if not products_list:
+            return []
+        columns = {name: [product[name] for product in products_list] for name in FEATURES}
+        scores = self.predict_scores(*(columns[name] for name in FEATURES))
+        codes = risk_codes(scores)
+        catalog = pd.DataFrame(columns)
+        if all('category' in product for product in products_list):
+            catalog['category'] = [product['category'] for product in products_list]
+        discounts = self.suggested_discounts(codes, catalog)
+        results = [
+            self._result(score, code, *(product[name] for name in FEATURES), discount)
+            for score, code, product, discount in zip(scores, codes, products_list, discounts)
+        ]
+        bands = self.predict_intervals(*(columns[name] for name in FEATURES)) if interval else None
+        if bands is not None:
+            for result, band in zip(results, self._intervals(bands)):
+                result['risk_interval'] = band
+        return results
+
+    def predict_inventory(self, inventory, forecast, price, today, categories=None, n_scenarios=200):
+        """Risque par produit à partir de ses lots (LotInventory).
+
+        Le gaspillage attendu en FIFO (demande de Poisson autour de forecast)
+        est ramené à la péremption équivalente d'un lot unique, donnée au
+        modèle avec le stock total : un produit dont le vieux lot part avant
+        péremption n'est plus noté sur la date du lot le plus proche.
+        forecast, price, categories : Series indexées par product_id ou tableaux alignés.
+        """
+        waste = inventory.expected_waste(forecast, today, n_scenarios)
+        expiration = inventory.effective_expiration(forecast, today, waste)
+        stock = inventory.stock().to_numpy()
+        price, forecast = inventory.aligned(price), inventory.aligned(forecast)
+        scores = self.predict_scores(stock, expiration, price, forecast)
+        codes = risk_codes(scores)
+        catalog = pd.DataFrame(dict(zip(FEATURES, (stock, expiration, price, forecast))))
+        if categories is not None:
+            catalog['category'] = (categories.reindex(inventory.product_ids).to_numpy()
+                                   if isinstance(categories, pd.Series) else categories)
+        discounts = self.suggested_discounts(codes, catalog)
+
+        results = []
+        for i, product_id in enumerate(inventory.product_ids):
+            result = self._result(scores[i], codes[i], float(stock[i]), round(float(expiration[i]), 2),
+                                  float(price[i]), float(forecast[i]), discounts[i])
+            result['product'] = product_id
+            result['lots'] = int(inventory.count[i])
+            result['expected_waste'] = round(float(waste[i]), 2)
+            result['expected_waste_value'] = round(float(waste[i] * price[i]), 2)
+            results.append(result)
+        return results
+
     def analyze_dataset(self, df):
         """Analyser un dataset complet"""
+        scores = self.predict_scores(*(df[name].to_numpy() for name in FEATURES))
+        codes = risk_codes(scores)
+        products = df['product_id'].tolist() if 'product_id' in df.columns else ['Unknown'] * len(df)
+        categories = df['category'].tolist() if 'category' in df.columns else ['Unknown'] * len(df)
+        discounts = self.suggested_discounts(codes, df)
+
         predictions = []
-        for _, row in df.iterrows():
-            pred = self.predict_single(
-                row['stock_quantity'],
-                row['expiration_days'], 
-                row['price'],
-                row['quantity_sold']
-            )
-            pred['product'] = row['product_id'] if 'product_id' in df.columns else 'Unknown'
-            pred['category'] = row['category'] if 'category' in df.columns else 'Unknown'
+        for i, row in enumerate(df[FEATURES].itertuples(index=False)):
+            pred = self._result(scores[i], codes[i], *row, discounts[i])
+            pred['product'] = products[i]
+            pred['category'] = categories[i]
             predictions.append(pred)
         return predictions
 
@@ -92,4 +178,18 @@ if __name__ == "__main__":
         print(f"   Produit {i+1}: {result['risk_level']} (Score: {result['risk_score']})")
         print(f"      → {result['recommendation']}")
     
+    # Test par lots : chaque ligne du catalogue devient un lot de son produit
+    print("\n Test lot-based prediction:")
+    from lot_inventory import LotInventory
+    from schema import load_dataset
+    catalog = load_dataset('synthetic_data')
+    today = catalog['date'].max()
+    by_product = catalog.groupby('product_id', observed=True)
+    inventory = LotInventory.from_frame(catalog, today)
+    lot_results = service.predict_inventory(inventory, by_product['quantity_sold'].mean(),
+                                            by_product['price'].mean(), today)
+    for result in sorted(lot_results, key=lambda r: -r['expected_waste'])[:3]:
+        print(f"   Produit {result['product']} ({result['lots']} lots): {result['risk_level']} "
+              f"(Score: {result['risk_score']}, gaspillage attendu {result['expected_waste']})")
+    
     print(" ÉTAPE 3 TERMINÉE - SERVICE FONCTIONNEL!")
\ No newline at end of file
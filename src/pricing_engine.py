@@ -0,0 +1,146 @@
+# pricing_engine.py - Remise optimale avant péremption (élasticité apprise)
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from paths import DATA_DIR, MODELS_DIR
+from replenishment import _expected_shortage
+from schema import load_dataset
+
+ELASTICITY_PATH = os.path.join(MODELS_DIR, 'pricing_elasticity.json')
+DISCOUNT_GRID = (0.0, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7)
+
+
+class MarkdownOptimizer:
+    """Choisit la remise qui maximise le revenu récupéré avant péremption.
+
+    Réponse à la remise à élasticité constante : ventes x (1 - remise)^(-e),
+    avec e appris par catégorie sur la colonne promotion (profondeur de
+    promotion supposée = reference_discount, par défaut le premier palier
+    des anciennes règles). Le revenu attendu est évalué sur toute la grille
+    de remises pour tout le catalogue en une opération ; un produit dont la
+    demande couvre déjà le stock reçoit naturellement une remise nulle.
+    """
+
+    def __init__(self, elasticities=None, default_elasticity=1.0, reference_discount=0.15,
+                 discount_grid=DISCOUNT_GRID, salvage_ratio=0.0):
+        self.elasticities = dict(elasticities or {})
+        self.default_elasticity = default_elasticity
+        self.reference_discount = reference_discount
+        self.discount_grid = np.asarray(sorted(discount_grid), dtype=np.float64)
+        self.salvage_ratio = salvage_ratio  # Valeur résiduelle des invendus (dons, etc.)
+
+    @classmethod
+    def fit(cls, sales, reference_discount=0.15, **kwargs):
+        """Apprend l'élasticité par catégorie à partir de quantity_sold ~ promotion.
+
+        Effet fixe par produit : on compare le log des ventes en promotion au
+        niveau hors promotion du même produit, puis on moyenne par catégorie.
+        """
+        key = 'product' if 'product' in sales.columns else 'category'
+        log_sales = np.log1p(sales['quantity_sold'].astype(np.float64))
+        promo = sales['promotion'].to_numpy() == 1
+        baseline = log_sales[~promo].groupby(sales.loc[~promo, key]).mean()
+        # astype : map sur une colonne category renvoie une category
+        uplift = log_sales[promo] - sales.loc[promo, key].map(baseline).astype(np.float64)
+
+        scale = -np.log(1 - reference_discount)
+        by_category = (uplift.groupby(sales.loc[promo, 'category']).mean() / scale).clip(lower=0)
+        default = max(float(uplift.mean() / scale), 0.0)
+        return cls(by_category.to_dict(), default, reference_discount, **kwargs)
+
+    def save(self, path=ELASTICITY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'elasticities': self.elasticities,
+                'default_elasticity': self.default_elasticity,
+                'reference_discount': self.reference_discount,
+                'discount_grid': self.discount_grid.tolist(),
+                'salvage_ratio': self.salvage_ratio,
+            }, f, indent=2, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, path=ELASTICITY_PATH):
+        with open(path, encoding='utf-8') as f:
+            params = json.load(f)
+        return cls(**params)
+
+    def elasticity_of(self, categories):
+        return (pd.Series(categories).map(self.elasticities).astype(np.float64)
+                .fillna(self.default_elasticity).to_numpy())
+
+    def recommend(self, catalog, chunk_size=250_000):
+        """Remise optimale par produit : stock_quantity, quantity_sold (ventes/jour),
+        expiration_days, price et category (optionnelle)."""
+        n = len(catalog)
+        stock = catalog['stock_quantity'].to_numpy(dtype=np.float64)
+        daily_sales = catalog['quantity_sold'].to_numpy(dtype=np.float64)
+        days = np.maximum(catalog['expiration_days'].to_numpy(dtype=np.float64), 1)
+        price = catalog['price'].to_numpy(dtype=np.float64)
+        elasticity = (self.elasticity_of(catalog['category']) if 'category' in catalog.columns
+                      else np.full(n, self.default_elasticity))
+
+        grid = self.discount_grid
+        best = np.empty(n, dtype=np.int64)
+        best_revenue = np.empty(n)
+        best_sold = np.empty(n)
+        base_revenue = np.empty(n)
+
+        # Par blocs pour borner la mémoire (n x taille de grille)
+        for start in range(0, n, chunk_size):
+            sl = slice(start, min(start + chunk_size, n))
+            lift = (1 - grid)[None, :] ** (-elasticity[sl, None])
+            demand = daily_sales[sl, None] * days[sl, None] * lift
+            # Ventes attendues E[min(stock, D)] avec D ~ Poisson (approx. normale)
+            level = np.broadcast_to(stock[sl, None], demand.shape)
+            sold = demand - _expected_shortage(level, demand, np.sqrt(np.maximum(demand, 1)))
+            sold = np.clip(sold, 0, level)
+            revenue = (price[sl, None] * (1 - grid)[None, :] * sold
+                       + self.salvage_ratio * price[sl, None] * (level - sold))
+
+            choice = revenue.argmax(axis=1)  # À égalité : la plus petite remise
+            rows = np.arange(len(choice))
+            best[sl] = choice
+            best_revenue[sl] = revenue[rows, choice]
+            best_sold[sl] = sold[rows, choice]
+            base_revenue[sl] = revenue[:, 0] if grid[0] == 0 else np.nan
+
+        return pd.DataFrame({
+            'recommended_discount': grid[best],
+            'expected_sold': best_sold,
+            'expected_leftover': stock - best_sold,
+            'expected_revenue': best_revenue,
+            'revenue_without_discount': base_revenue,
+            'revenue_gain': best_revenue - base_revenue,
+        }, index=catalog.index)
+
+
+def load_or_fit(path=ELASTICITY_PATH):
+    """Élasticités sauvegardées, sinon apprises sur data/supermarket_sales.csv"""
+    if os.path.exists(path):
+        return MarkdownOptimizer.load(path)
+    return MarkdownOptimizer.fit(load_dataset('supermarket_sales'))
+
+
+if __name__ == '__main__':
+    print("🏷️  APPRENTISSAGE DE L'ÉLASTICITÉ PRIX")
+    sales_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DATA_DIR, 'supermarket_sales.csv')
+    optimizer = MarkdownOptimizer.fit(load_dataset(sales_path))
+    for category, elasticity in optimizer.elasticities.items():
+        print(f"   {category}: élasticité {elasticity:.2f}")
+    print(f"   (défaut: {optimizer.default_elasticity:.2f})")
+    print(f"💾 Sauvegardé: {optimizer.save()}")
+
+    catalog = load_dataset('synthetic_data')
+    start = time.perf_counter()
+    recommendations = optimizer.recommend(catalog)
+    elapsed = time.perf_counter() - start
+    print(f"\n⏱️  {len(catalog)} produits évalués en {elapsed * 1000:.1f} ms")
+    print(recommendations['recommended_discount'].value_counts().sort_index().to_string())
+    print(f"💰 Gain de revenu attendu: {recommendations['revenue_gain'].sum():.2f}€")
@@ -0,0 +1,125 @@
+# priority_index.py - Index des produits prioritaires (perte attendue = risque x prix)
+import heapq
+import threading
+from collections import defaultdict
+
+ALL = None  # Clé du tas global (toutes catégories)
+
+
+def expected_loss(risk_score, price):
+    """Perte attendue utilisée pour prioriser : score de risque x prix"""
+    return max(float(risk_score), 0.0) * float(price)
+
+
+class PriorityIndex:
+    """Tas global + un tas par catégorie, maintenus à chaque re-scoring.
+
+    Une mise à jour pousse une entrée versionnée (O(log n)) ; les anciennes
+    entrées du produit deviennent périmées et sont ignorées à la lecture
+    (invalidation paresseuse), puis purgées quand elles dominent le tas :
+    chaque tas est comparé au nombre de produits vivants de sa catégorie.
+    top_k parcourt l'arbre du tas sans le modifier : O(k log k) hors
+    entrées périmées, au lieu d'un tri complet du catalogue.
+    """
+
+    def __init__(self):
+        self._heaps = defaultdict(list)  # catégorie -> [(-perte, version, clé)]
+        self._entries = {}  # clé -> (version, catégorie, perte, données)
+        self._counts = defaultdict(int)  # catégorie -> produits vivants
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_items(cls, items):
+        """Construction en bloc (heapify O(n)) depuis (clé, catégorie, perte, données)"""
+        index = cls()
+        for key, category, loss, payload in items:
+            index._version += 1
+            index._entries[key] = (index._version, category, loss, payload)
+        for key, (version, category, loss, _) in index._entries.items():
+            index._counts[category] += 1
+            entry = (-loss, version, key)
+            index._heaps[ALL].append(entry)
+            index._heaps[category].append(entry)
+        for heap in index._heaps.values():
+            heapq.heapify(heap)
+        return index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, key, category, loss, payload=None):
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is None or previous[1] != category:
+                self._counts[category] += 1
+                if previous is not None:
+                    self._release(previous[1])
+            self._version += 1
+            self._entries[key] = (self._version, category, loss, payload)
+            entry = (-loss, self._version, key)
+            for name in (ALL, category):
+                heapq.heappush(self._heaps[name], entry)
+                self._maybe_compact(name)
+
+    def update_many(self, items):
+        for key, category, loss, payload in items:
+            self.update(key, category, loss, payload)
+
+    def remove(self, key):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._release(previous[1])
+                self._maybe_compact(ALL)
+
+    def _release(self, category):
+        """Un produit quitte la catégorie : son entrée y devient périmée"""
+        self._counts[category] -= 1
+        if self._counts[category] == 0:
+            del self._counts[category]
+        self._maybe_compact(category)
+
+    def _live_count(self, category):
+        return len(self._entries) if category is ALL else self._counts.get(category, 0)
+
+    def _maybe_compact(self, category):
+        heap = self._heaps.get(category)
+        if heap is not None and len(heap) > 2 * self._live_count(category) + 64:
+            self._compact(category)
+
+    def _is_live(self, entry, category):
+        _, version, key = entry
+        current = self._entries.get(key)
+        return (current is not None and current[0] == version
+                and (category is ALL or current[1] == category))
+
+    def _compact(self, category):
+        heap = [entry for entry in self._heaps[category] if self._is_live(entry, category)]
+        if not heap and category is not ALL:
+            del self._heaps[category]
+            return
+        heapq.heapify(heap)
+        self._heaps[category] = heap
+
+    def top_k(self, k=10, category=ALL):
+        """[(clé, perte, données)] des k pertes attendues les plus fortes"""
+        with self._lock:
+            heap = self._heaps.get(category, [])
+            result = []
+            # Parcours best-first de l'arbre implicite du tas : les enfants
+            # d'un nœud (même périmé) ne dépassent jamais sa valeur
+            frontier = [(heap[0], 0)] if heap else []
+            while frontier and len(result) < k:
+                entry, position = heapq.heappop(frontier)
+                if self._is_live(entry, category):
+                    key = entry[2]
+                    result.append((key, -entry[0], self._entries[key][3]))
+                for child in (2 * position + 1, 2 * position + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], child))
+            return result
+
+    def categories(self):
+        with self._lock:
+            return sorted(self._counts, key=str)
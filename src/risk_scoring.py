@@ -0,0 +1,81 @@
+# risk_scoring.py - Noyau de calcul du risque partagé (API, dashboard, service batch)
+import numpy as np
+
+# Colonnes attendues par les modèles de risque (dans cet ordre)
+FEATURES = ['stock_quantity', 'expiration_days', 'price', 'quantity_sold']
+
+# Seuils de risque : > 3 MODÉRÉ, > 8 ÉLEVÉ, > 15 CRITIQUE
+SEUIL_MODERE = 3
+SEUIL_ELEVE = 8
+SEUIL_CRITIQUE = 15
+SEUILS = np.array([SEUIL_MODERE, SEUIL_ELEVE, SEUIL_CRITIQUE], dtype=np.float64)
+
+# Codes de niveau (index dans les tuples de libellés ci-dessous)
+FAIBLE, MODERE, ELEVE, CRITIQUE = 0, 1, 2, 3
+
+NIVEAUX = ("✅ FAIBLE", "🔶 MODÉRÉ", "⚠️ ÉLEVÉ", "🚨 CRITIQUE")
+REMISES = ("0%", "15%", "30%", "50%")
+
+
+def _sortie(valeur):
+    """Renvoie un float Python pour une entrée scalaire, le tableau sinon"""
+    valeur = np.asarray(valeur)
+    return valeur.item() if valeur.ndim == 0 else valeur
+
+
+def base_risk(stock, sold, expiration):
+    """Risque de base : stock invendu par jour restant avant péremption"""
+    stock = np.asarray(stock, dtype=np.float64)
+    sold = np.asarray(sold, dtype=np.float64)
+    expiration = np.maximum(np.asarray(expiration, dtype=np.float64), 1)
+    return _sortie((stock - sold) / expiration)
+
+
+def heuristic_components(stock, expiration, price, sold):
+    """Décompose le score "simulation_intelligent" (scalaires ou tableaux)"""
+    stock = np.asarray(stock, dtype=np.float64)
+    price = np.asarray(price, dtype=np.float64)
+    sold = np.asarray(sold, dtype=np.float64)
+
+    base = np.asarray(base_risk(stock, sold, expiration))
+    price_factor = np.clip(price / 10.0, 0.5, 2.0)  # Prix influence le risque
+    demand_factor = sold / np.maximum(1, stock)  # Ratio demande/stock
+    risk_score = base * price_factor * (1 + (1 - demand_factor))
+
+    return {
+        'risk_score': _sortie(risk_score),
+        'base_risk': _sortie(base),
+        'price_factor': _sortie(price_factor),
+        'demand_factor': _sortie(demand_factor),
+    }
+
+
+def heuristic_risk(stock, expiration, price, sold):
+    """Score de risque "simulation_intelligent" : base × prix × demande"""
+    return heuristic_components(stock, expiration, price, sold)['risk_score']
+
+
+def risk_codes(risk_score):
+    """Convertit des scores en codes de niveau (FAIBLE=0 ... CRITIQUE=3)"""
+    codes = np.searchsorted(SEUILS, np.asarray(risk_score, dtype=np.float64), side='left')
+    codes = np.asarray(codes, dtype=np.int8)
+    return int(codes) if codes.ndim == 0 else codes
+
+
+def risk_labels(risk_score, labels=NIVEAUX):
+    """Libellés de niveau pour un score ou un tableau de scores"""
+    codes = risk_codes(risk_score)
+    if isinstance(codes, int):
+        return labels[codes]
+    return np.asarray(labels, dtype=object)[codes]
+
+
+def features_matrix(stock, expiration, price, sold, dtype=np.float64):
+    """Matrice (n, 4) dans l'ordre FEATURES pour les modèles de risque
+    (dtype=np.float32 : format natif des arbres sklearn, sans conversion)"""
+    return np.column_stack([
+        np.atleast_1d(np.asarray(stock, dtype=dtype)),
+        np.atleast_1d(np.asarray(expiration, dtype=dtype)),
+        np.atleast_1d(np.asarray(price, dtype=dtype)),
+        np.atleast_1d(np.asarray(sold, dtype=dtype)),
+    ])
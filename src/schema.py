@@ -0,0 +1,178 @@
+# schema.py - Types compacts des jeux de données (int8/int16/float32, catégories, dates)
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from paths import DATA_DIR
+
+DATETIME, CATEGORY = 'datetime', 'category'
+DATE_FORMAT = 'ISO8601'
+
+# Jeu de données -> type cible par colonne (plages observées + marge)
+SCHEMAS = {
+    'synthetic_data': {
+        'date': DATETIME,
+        'product_id': 'int32',
+        'category': CATEGORY,
+        'quantity_sold': 'int16',
+        'stock_quantity': 'int16',
+        'expiration_days': 'int8',
+        'price': 'float32',
+        'promotion': 'int8',
+        'day_of_week': 'int8',
+        'waste_risk': 'float32',
+    },
+    'supermarket_sales': {
+        'date': DATETIME,
+        'product': CATEGORY,
+        'category': CATEGORY,
+        'quantity_sold': 'int16',
+        'initial_stock': 'int16',
+        'wasted_quantity': 'int16',
+        'price': 'float32',
+        'promotion': 'int8',
+        'day_of_week': 'int8',
+        'month': 'int8',
+        'is_weekend': 'int8',
+        'is_summer': 'int8',
+        'weather_effect': 'float32',
+    },
+    'waste_data': {
+        'date': DATETIME,
+        'category': CATEGORY,
+        'quantity_kg': 'float32',
+        'price_euros': 'float32',
+        'reason': CATEGORY,
+    },
+}
+MAX_CATEGORY_RATIO = 0.5  # Colonne texte hors schéma : catégorie si < 50 % de valeurs distinctes
+
+
+def _integer(series, dtype):
+    """Entier du schéma si les valeurs y tiennent, sinon le plus petit entier suffisant.
+    Les colonnes avec valeurs manquantes restent flottantes (float32)."""
+    values = pd.to_numeric(series)
+    if values.isna().any():
+        return values.astype(np.float32)
+    info = np.iinfo(dtype)
+    if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+        return values.astype(dtype)
+    return pd.to_numeric(values, downcast='integer')
+
+
+def _downcast(series):
+    """Colonne hors schéma : réduction générique selon le type détecté"""
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series):
+        return series.astype(np.float32)
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        if len(series) and series.nunique() / len(series) < MAX_CATEGORY_RATIO:
+            return series.astype(CATEGORY)
+    return series
+
+
+def compact_dtypes(df, schema=None):
+    """Copie de df aux types compacts du schéma (colonnes inconnues : réduction générique)"""
+    schema = schema or {}
+    columns = {}
+    for name in df.columns:
+        series, target = df[name], schema.get(name)
+        if target == DATETIME:
+            columns[name] = pd.to_datetime(series, format=DATE_FORMAT)
+        elif target == CATEGORY:
+            columns[name] = series.astype(CATEGORY)
+        elif target is not None and np.issubdtype(np.dtype(target), np.integer):
+            columns[name] = _integer(series, target)
+        elif target is not None:
+            columns[name] = series.astype(target)
+        else:
+            columns[name] = _downcast(series)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def dataset_path(name):
+    """Nom de jeu de données (synthetic_data) ou chemin de CSV -> chemin"""
+    return os.path.join(DATA_DIR, f'{name}.csv') if name in SCHEMAS else name
+
+
+def load_dataset(name, compact=True, **read_kwargs):
+    """Charge un CSV du projet aux types compacts.
+
+    Les catégories sont typées dès la lecture (pas de chaînes Python
+    intermédiaires), puis les numériques sont réduits et les dates parsées.
+    Un chemin dont le nom correspond à un jeu connu utilise son schéma.
+    """
+    path = dataset_path(name)
+    if not compact:
+        return pd.read_csv(path, **read_kwargs)
+    schema = SCHEMAS.get(os.path.splitext(os.path.basename(path))[0], {})
+    dtype = {column: CATEGORY for column, target in schema.items() if target == CATEGORY}
+    df = pd.read_csv(path, dtype={**dtype, **read_kwargs.pop('dtype', {})}, **read_kwargs)
+    return compact_dtypes(df, schema)
+
+
+def footprint(df):
+    """Octets occupés (chaînes comprises)"""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def memory_report(before, after):
+    """Empreinte par colonne avant / après : type, Mo et gain"""
+    rows = []
+    for name in before.columns:
+        old, new = before[name].memory_usage(deep=True, index=False), after[name].memory_usage(deep=True, index=False)
+        rows.append({'column': name, 'dtype_before': str(before[name].dtype), 'dtype_after': str(after[name].dtype),
+                     'mb_before': old / 1e6, 'mb_after': new / 1e6, 'ratio': old / max(new, 1)})
+    report = pd.DataFrame(rows)
+    total = {'column': 'TOTAL', 'dtype_before': '', 'dtype_after': '',
+             'mb_before': footprint(before) / 1e6, 'mb_after': footprint(after) / 1e6}
+    total['ratio'] = total['mb_before'] / max(total['mb_after'], 1e-9)
+    return pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+
+
+def synthetic_frame(n_rows, seed=42):
+    """Jeu synthetic_data de n_rows lignes tel que lu par read_csv (int64/float64/chaînes)"""
+    rng = np.random.default_rng(seed)
+    categories = np.array(['laitage', 'viande', 'legumes', 'fruits', 'boulangerie', 'poisson'], dtype=object)
+    dates = pd.date_range('2024-01-01', periods=365).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    return pd.DataFrame({
+        'date': dates[rng.integers(0, len(dates), n_rows)],
+        'product_id': rng.integers(1, 50, n_rows),
+        'category': categories[rng.integers(0, len(categories), n_rows)],
+        'quantity_sold': rng.integers(0, 30, n_rows),
+        'stock_quantity': rng.integers(5, 150, n_rows),
+        'expiration_days': rng.integers(1, 10, n_rows),
+        'price': np.round(rng.uniform(0.5, 15.0, n_rows), 2),
+        'promotion': rng.integers(0, 2, n_rows),
+        'day_of_week': rng.integers(0, 7, n_rows),
+        'waste_risk': np.round(rng.uniform(-12, 145, n_rows), 1),
+    })
+
+
+if __name__ == '__main__':
+    import time
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    print(f"🧮 EMPREINTE MÉMOIRE - {n_rows:,} lignes synthetic_data")
+    before = synthetic_frame(n_rows)
+    start = time.perf_counter()
+    after = compact_dtypes(before, SCHEMAS['synthetic_data'])
+    elapsed = time.perf_counter() - start
+    report = memory_report(before, after)
+    print(report.to_string(index=False, float_format=lambda x: f'{x:,.1f}'))
+    print(f"⏱️  Conversion en {elapsed:.1f} s")
+
+    # Mêmes prédictions en float32 (les arbres sklearn comparent déjà en float32)
+    from sklearn.ensemble import RandomForestRegressor
+    from risk_scoring import FEATURES
+    sample = after.sample(min(n_rows, 50_000), random_state=42)
+    X64 = sample[FEATURES].to_numpy(np.float64)
+    X32 = sample[FEATURES].to_numpy(np.float32)
+    print(f"📐 Matrice de features: {X64.nbytes / 1e6:.1f} Mo en float64 -> {X32.nbytes / 1e6:.1f} Mo en float32")
+    model = RandomForestRegressor(n_estimators=20, random_state=42, n_jobs=1).fit(X32, sample['waste_risk'])
+    print(f"✅ Prédictions identiques float32 / float64: {np.array_equal(model.predict(X32), model.predict(X64))}")
@@ -0,0 +1,231 @@
+# serialization.py - Encodage des réponses API : négociation de format et compression
+import gzip
+import json
+import os
+import time
+
+import numpy as np
+from flask import Response, request
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+JSON, MSGPACK, ARROW = 'json', 'msgpack', 'arrow'
+MIMETYPES = {
+    JSON: 'application/json',
+    MSGPACK: 'application/msgpack',
+    ARROW: 'application/vnd.apache.arrow.stream',
+}
+# Types MIME acceptés dans l'en-tête Accept -> format
+ACCEPTED = {
+    'application/json': JSON,
+    'application/msgpack': MSGPACK,
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    'application/vnd.apache.arrow.stream': ARROW,
+}
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))  # En dessous : pas rentable
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+def available_formats():
+    return [fmt for fmt, ok in ((JSON, True), (MSGPACK, MSGPACK_AVAILABLE), (ARROW, ARROW_AVAILABLE)) if ok]
+
+
+def _quality(params):
+    """Paramètre q d'un élément Accept (1.0 par défaut), None s'il est invalide"""
+    for param in params:
+        if param.startswith('q='):
+            try:
+                q = float(param[2:])
+            except ValueError:
+                return None
+            return q if 0.0 <= q <= 1.0 else None
+    return 1.0
+
+
+def negotiate(accept=None, requested=None):
+    """Format de réponse : ?format= en priorité, sinon meilleur q de l'en-tête Accept.
+    JSON si aucun type listé n'est disponible (comme sans en-tête) ; None seulement
+    si le ?format= demandé n'est pas disponible."""
+    formats = available_formats()
+    if requested:
+        return requested if requested in formats else None
+    best, best_q = JSON, 0.0
+    for item in (accept or '').split(','):
+        mimetype, *params = [part.strip() for part in item.split(';')]
+        q = _quality(params)
+        if not q:
+            continue  # q mal formé ou q=0 (refusé) : élément ignoré
+        fmt = JSON if mimetype in ('*/*', 'application/*') else ACCEPTED.get(mimetype)
+        if fmt in formats and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def _default(obj):
+    """Types numpy pour json (stdlib) et msgpack"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type non sérialisable: {type(obj).__name__}")
+
+
+def tabulate(columns, codes=None, compact=False):
+    """Résultat tabulaire -> (table, libellés).
+
+    columns : nom -> tableau (numpy ou liste) de même longueur.
+    codes : {colonne de codes: {colonne libellé: libellés}}.
+    compact=False : liste de dicts historique, chaque code remplacé par ses
+    libellés. compact=True : colonnes telles quelles + dictionnaire des
+    libellés (un code int8 par ligne au lieu de chaînes avec emojis).
+    """
+    codes = codes or {}
+    if compact:
+        labels = {name: list(values) for mapping in codes.values() for name, values in mapping.items()}
+        return columns, labels
+
+    fields = []
+    for name, values in columns.items():
+        values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+        if name in codes:
+            fields += [(label, [table[code] for code in values]) for label, table in codes[name].items()]
+        else:
+            fields.append((name, values))
+    names = [name for name, _ in fields]
+    return [dict(zip(names, row)) for row in zip(*(values for _, values in fields))], None
+
+
+def encode_json(payload):
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, ensure_ascii=False).encode('utf-8')
+
+
+def encode_msgpack(payload):
+    return msgpack.packb(payload, default=_default, use_bin_type=True)
+
+
+def encode_arrow(payload, table):
+    """Flux Arrow IPC : la table en colonnes, le reste du payload en métadonnées JSON"""
+    data = payload[table]
+    if isinstance(data, dict):
+        arrow_table = pa.table({name: pa.array(values.tolist() if isinstance(values, np.ndarray)
+                                               and values.dtype == object else values)
+                                for name, values in data.items()})
+    else:
+        arrow_table = pa.Table.from_pylist(list(data))
+    metadata = {key: value for key, value in payload.items() if key != table}
+    arrow_table = arrow_table.replace_schema_metadata({'payload': encode_json(metadata)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload, fmt=JSON, table=None):
+    if fmt == MSGPACK:
+        return encode_msgpack(payload)
+    if fmt == ARROW:
+        return encode_arrow(payload, table)
+    return encode_json(payload)
+
+
+def accepted_encodings(accept_encoding):
+    """Codages acceptés (q > 0) de l'en-tête Accept-Encoding -> q ; '*' couvre les autres"""
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        q = _quality(params)
+        if coding and q is not None:
+            accepted[coding] = q
+    return accepted
+
+
+def compress(body, accept_encoding='', min_bytes=COMPRESS_MIN_BYTES):
+    """(corps, Content-Encoding) : codage de meilleur q parmi zstd et gzip (zstd à égalité),
+    q=0 respecté"""
+    if len(body) < min_bytes or not accept_encoding:
+        return body, None
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    candidates = [coding for coding in (('zstd', 'gzip') if ZSTD_AVAILABLE else ('gzip',))
+                  if accepted.get(coding, wildcard) > 0]
+    if not candidates:
+        return body, None
+    coding = max(candidates, key=lambda c: accepted.get(c, wildcard))  # max : premier à égalité
+    if coding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), 'zstd'
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+
+
+def compact_requested(fmt):
+    """Colonnes + libellés par défaut pour les formats binaires, ?compact=1 pour JSON"""
+    value = request.args.get('compact')
+    if value is None:
+        return fmt != JSON
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def response_format():
+    return negotiate(request.headers.get('Accept'), request.args.get('format'))
+
+
+def respond(payload, table=None, status=200, fmt=None):
+    """Réponse Flask encodée dans le format négocié (406 si le ?format= demandé n'existe pas).
+    table : clé du payload contenant les lignes (requis pour Arrow)."""
+    fmt = fmt or response_format()
+    if fmt is None or (fmt == ARROW and table is None):
+        formats = [f for f in available_formats() if table or f != ARROW]
+        return Response(encode_json({"error": "Format non disponible", "formats": formats}),
+                        status=406, mimetype=MIMETYPES[JSON])
+
+    start = time.perf_counter()
+    body = encode(payload, fmt, table)
+    encode_ms = (time.perf_counter() - start) * 1000
+    body, encoding = compress(body, request.headers.get('Accept-Encoding', ''))
+    response = Response(body, status=status, mimetype=MIMETYPES[fmt])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    response.headers['Server-Timing'] = f'encode;dur={encode_ms:.2f}'
+    return response
+
+
+def decode(body, fmt=JSON, content_encoding=None):
+    """Inverse côté client (dashboard, tests manuels) : décompresse puis décode"""
+    if content_encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif content_encoding == 'zstd':
+        body = zstandard.ZstdDecompressor().decompress(body)
+    if fmt == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    if fmt == ARROW:
+        reader = pa.ipc.open_stream(body)
+        arrow_table = reader.read_all()
+        payload = json.loads(arrow_table.schema.metadata[b'payload'])
+        return payload, arrow_table.replace_schema_metadata(None)
+    return json.loads(body)
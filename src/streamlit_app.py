@@ -6,6 +6,9 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
 import os
+from inventory_store import get_store
+from live_feed import LiveFeedClient
+from risk_scoring import NIVEAUX, SEUIL_ELEVE, heuristic_risk, risk_codes
 
 # Configuration de la page
 st.set_page_config(
@@ -72,23 +75,28 @@ def generate_demo_data():
 # -----------------------------
 # CHARGEMENT DES DONNÉES
 # -----------------------------
+@st.cache_resource
+def get_inventory_store():
+    """Base SQLite partagée, alimentée depuis les CSV (ou la démo) si vide"""
+    store = get_store()
+    if store.count('products') == 0:
+        possible_paths = [
+            'data/synthetic_data.csv',
+            '../data/synthetic_data.csv',
+            './synthetic_data.csv'
+        ]
+        csv_path = next((path for path in possible_paths if os.path.exists(path)), None)
+        if csv_path is None:
+            st.warning("📁 Aucune donnée trouvée → génération de données de démo")
+            generate_demo_data()
+            csv_path = 'data/synthetic_data.csv'
+        store.load_csv('products', csv_path)
+    return store
+
 @st.cache_data
-def load_data():
-    """Charge les données avec fallback sur données de démo"""
-    possible_paths = [
-        'data/synthetic_data.csv',
-        '../data/synthetic_data.csv',
-        './synthetic_data.csv'
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            df = pd.read_csv(path)
-            st.success(f"✅ Données chargées depuis: {path}")
-            return df
-    
-    st.warning("📁 Aucune donnée trouvée → génération de données de démo")
-    return generate_demo_data()
+def load_data(category=None):
+    """Charge les produits (filtrés par catégorie via l'index SQLite)"""
+    return get_inventory_store().products(category=category)
 
 # -----------------------------
 # VÉRIFICATION API
@@ -101,6 +109,58 @@ def check_api_status():
     except:
         return False
 
+# -----------------------------
+# FLUX TEMPS RÉEL (SSE)
+# -----------------------------
+@st.cache_resource
+def get_live_feed(url):
+    """Un seul abonné SSE par serveur Streamlit, partagé par toutes les sessions"""
+    return LiveFeedClient(f"{url}/stream")
+
+# Fragment : seul ce bloc est ré-exécuté, à partir de l'état local du flux
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def render_live_feed():
+    """Compteurs par catégorie et derniers changements de niveau"""
+    state = get_live_feed(api_url).state()
+    st.caption("🟢 Flux connecté" if state['connected'] else "🔴 Flux déconnecté (reconnexion...)")
+    if state['categories']:
+        counts = pd.DataFrame.from_dict(state['categories'], orient='index', columns=list(NIVEAUX))
+        st.dataframe(counts, use_container_width=True)
+    if state['recent']:
+        recent = pd.DataFrame(state['recent'])
+        recent['risk_level'] = recent['risk_code'].map(lambda code: NIVEAUX[code])
+        st.dataframe(recent[['product_id', 'category', 'risk_score', 'risk_level']],
+                     use_container_width=True, height=300)
+    else:
+        st.info("En attente de changements de niveau...")
+
+if fragment is not None:
+    render_live_feed = fragment(run_every=2)(render_live_feed)
+
+# -----------------------------
+# TÂCHES EN ARRIÈRE-PLAN
+# -----------------------------
+JOB_BUTTONS = (("train", "🏋️ Réentraîner"), ("optimize", "🎯 Optimiser"), ("analytics", "📊 Analytics"))
+
+def render_jobs():
+    """Entraînement / analytics lancés par l'API, sans bloquer le tableau de bord"""
+    st.sidebar.subheader("🧵 Tâches")
+    for kind, label in JOB_BUTTONS:
+        if st.sidebar.button(label, key=f"job_{kind}", use_container_width=True):
+            try:
+                job = requests.post(f"{api_url}/jobs/{kind}", timeout=3).json()
+                st.sidebar.info(f"{job['kind']} : {job['status']} ({job['id']})")
+            except requests.RequestException:
+                st.sidebar.error("🌐 Impossible de contacter l'API")
+    try:
+        jobs = requests.get(f"{api_url}/jobs", params={"limit": 5}, timeout=3).json()['jobs']
+    except requests.RequestException:
+        return
+    for job in jobs:
+        duration = f", {job['duration_s']:.0f} s" if job['duration_s'] is not None else ""
+        st.sidebar.caption(f"{job['kind']} : {job['status']} ({job['progress']:.0%}{duration})")
+
 # -----------------------------
 # AFFICHAGE PRÉDICTIONS
 # -----------------------------
@@ -158,33 +218,35 @@ def display_prediction_results(result, stock, expiration, price, sold):
 # -----------------------------
 # MODE DÉMO
 # -----------------------------
-def use_demo_mode(stock, expiration, sold):
+DEMO_ACTIONS = (
+    "Niveau normal",
+    "Surveillance renforcée",
+    "Promotion 30% recommandée",
+    "Promotion 50% urgente",
+)
+
+def use_demo_mode(stock, expiration, price, sold):
     """Mode fallback si API indisponible"""
     st.warning("🔄 Mode démo activé")
-    risk_demo = (stock - sold) / expiration
-    
-    if risk_demo > 15:
-        level, action = "🚨 CRITIQUE", "Promotion 50% urgente"
-    elif risk_demo > 8:
-        level, action = "⚠️ ÉLEVÉ", "Promotion 30% recommandée"
-    elif risk_demo > 3:
-        level, action = "🔶 MODÉRÉ", "Surveillance renforcée"
-    else:
-        level, action = "✅ FAIBLE", "Niveau normal"
+    risk_demo = heuristic_risk(stock, expiration, price, sold)
+    code = risk_codes(risk_demo)
+    level, action = NIVEAUX[code], DEMO_ACTIONS[code]
     
     demo_result = {
         "risk_score": round(risk_demo, 2),
         "risk_level": level,
         "recommendation": action
     }
-    display_prediction_results(demo_result, stock, expiration, 1000, sold)
+    display_prediction_results(demo_result, stock, expiration, price, sold)
 
 # -----------------------------
 # MAIN
 # -----------------------------
 def main():
     api_online = check_api_status()
-    tab1, tab2, tab3 = st.tabs(["🏠 Accueil", "🎯 Prédictions", "📊 Analytics"])
+    if api_online:
+        render_jobs()
+    tab1, tab2, tab3, tab4 = st.tabs(["🏠 Accueil", "🎯 Prédictions", "📊 Analytics", "📡 Temps réel"])
     
     # Accueil
     with tab1:
@@ -231,24 +293,29 @@ def main():
                         display_prediction_results(result, stock, expiration, price, sold)
                     else:
                         st.error(f"❌ Erreur API: {response.status_code}")
-                        use_demo_mode(stock, expiration, sold)
+                        use_demo_mode(stock, expiration, price, sold)
                 except:
                     st.error("🌐 Impossible de contacter l’API")
-                    use_demo_mode(stock, expiration, sold)
+                    use_demo_mode(stock, expiration, price, sold)
             else:
-                use_demo_mode(stock, expiration, sold)
+                use_demo_mode(stock, expiration, price, sold)
     
     # Analytics
     with tab3:
         st.header("📊 Analytics et Données")
-        df = load_data()
-        if df is not None:
+        store = get_inventory_store()
+        choice = st.selectbox("Catégorie", ["Toutes"] + store.product_categories())
+        category = None if choice == "Toutes" else choice
+        df = load_data(category)
+        if len(df):
+            # Agrégats calculés par SQLite sur la catégorie choisie
+            summary = store.risk_summary(category, threshold=SEUIL_ELEVE)
             col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Produits analysés", len(df))
-            high_risk = len(df[df['waste_risk'] > 8])
+            col1.metric("Produits analysés", summary['products'])
+            high_risk = summary['high_risk']
             col2.metric("Produits à risque", high_risk)
-            col3.metric("Taux de risque", f"{(high_risk/len(df))*100:.1f}%")
-            col4.metric("Risque financier", f"{(df['waste_risk']*df['price']).sum():.0f} CFA")
+            col3.metric("Taux de risque", f"{(high_risk/summary['products'])*100:.1f}%")
+            col4.metric("Risque financier", f"{summary['financial_risk']:.0f} CFA")
             
             col5, col6 = st.columns(2)
             with col5:
@@ -257,6 +324,16 @@ def main():
                 st.plotly_chart(px.box(df, x="category", y="waste_risk", title="Risque par catégorie"), use_container_width=True)
             
             st.dataframe(df, use_container_width=True, height=400)
+    
+    # Flux temps réel
+    with tab4:
+        st.header("📡 Risques en temps réel")
+        if not api_online:
+            st.error("🌐 API indisponible → flux temps réel inactif")
+        else:
+            render_live_feed()
+            if fragment is None:
+                st.button("🔄 Actualiser")
 
 if __name__ == "__main__":
     main()
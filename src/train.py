@@ -1,7 +1,8 @@
 # train.py - VERSION CORRIGÉE
-import pandas as pd
 import joblib
 import os
+from paths import MODELS_DIR
+from schema import load_dataset
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
@@ -10,13 +11,13 @@ print(" ÉTAPE 1: ENTRAÎNEMENT DU MODÈLE CORRIGÉ")
 
 # 1. CHARGER LES DONNÉES
 print(" Chargement des données...")
-df = pd.read_csv('../data/synthetic_data.csv')
+df = load_dataset('synthetic_data')
 print("Colonnes disponibles:", list(df.columns))
 
 # 2. UTILISER LES BONNES COLONNES (adaptées à tes données)
 # Si tes colonnes sont différentes, utilise celles-ci :
 X = df[['stock_quantity', 'expiration_days', 'price', 'quantity_sold']]  # À ADAPTER
-y = df['waste_risk']
+y = df['waste_risk']  # Types compacts : sklearn passe directement en float32
 
 print(f" {len(df)} produits chargés")
 print(f"Features utilisées: {list(X.columns)}")
@@ -36,8 +37,8 @@ print(f" R² Score: {r2:.3f}")
 
 # 5. SAUVEGARDER LE MODÈLE
 print(" Sauvegarde...")
-os.makedirs('../models', exist_ok=True)
-joblib.dump(model, '../models/model.joblib')
+os.makedirs(MODELS_DIR, exist_ok=True)
+joblib.dump(model, os.path.join(MODELS_DIR, 'model.joblib'))
 
 # 6. TEST DE PRÉDICTION
 test_pred = model.predict([[50, 3, 5.0, 40]])[0]  # stock, expiration, price, sold
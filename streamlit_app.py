@@ -5,6 +5,12 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
 import os
+import sys
+
+# Le noyau de scoring partagé vit dans src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from inventory_store import get_store
+from risk_scoring import NIVEAUX, SEUIL_ELEVE, heuristic_risk, risk_codes
 
 # Configuration de la page
 st.set_page_config(
@@ -67,52 +73,48 @@ def generate_demo_data():
 # -----------------------------
 # CHARGEMENT DES DONNÉES
 # -----------------------------
+@st.cache_resource
+def get_inventory_store():
+    """Base SQLite partagée, alimentée depuis les CSV (ou la démo) si vide"""
+    store = get_store()
+    if store.count('products') == 0:
+        possible_paths = [
+            'data/synthetic_data.csv',
+            '../data/synthetic_data.csv',
+            './synthetic_data.csv'
+        ]
+        csv_path = next((path for path in possible_paths if os.path.exists(path)), None)
+        if csv_path is None:
+            st.warning("📁 Aucune donnée trouvée → génération de données de démo")
+            generate_demo_data()
+            csv_path = 'data/synthetic_data.csv'
+        store.load_csv('products', csv_path)
+    return store
+
 @st.cache_data
-def load_data():
-    """Charge les données avec fallback sur données de démo"""
-    possible_paths = [
-        'data/synthetic_data.csv',
-        '../data/synthetic_data.csv',
-        './synthetic_data.csv'
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            df = pd.read_csv(path)
-            st.success(f"✅ Données chargées depuis: {path}")
-            return df
-    
-    st.warning("📁 Aucune donnée trouvée → génération de données de démo")
-    return generate_demo_data()
+def load_data(category=None):
+    """Charge les produits (filtrés par catégorie via l'index SQLite)"""
+    return get_inventory_store().products(category=category)
 
 # -----------------------------
 # PRÉDICTION LOCALE
 # -----------------------------
+LOCAL_ACTIONS = (
+    "Niveau normal - Stratégie actuelle",
+    "Promotion 15% ciblée + Surveillance",
+    "Promotion 30% recommandée + Ajustement stocks",
+    "Promotion 50% urgente + Dons aux associations",
+)
+
 def predict_risk_local(stock, expiration, price, sold):
     """Version locale de la prédiction - plus besoin d'API"""
-    # Logique de prédiction intelligente
-    base_risk = (stock - sold) / expiration
-    
-    # Facteurs de risque avancés
-    price_factor = max(0.5, min(2.0, price / 10.0))  # Prix influence le risque
-    demand_factor = sold / max(1, stock)  # Ratio demande/stock
-    
-    # Calcul du score de risque final
-    risk_score = base_risk * price_factor * (1 + (1 - demand_factor))
+    # Logique de prédiction intelligente (noyau partagé)
+    risk_score = heuristic_risk(stock, expiration, price, sold)
     
     # Logique métier améliorée
-    if risk_score > 15:
-        level = "🚨 CRITIQUE"
-        action = "Promotion 50% urgente + Dons aux associations"
-    elif risk_score > 8:
-        level = "⚠️ ÉLEVÉ" 
-        action = "Promotion 30% recommandée + Ajustement stocks"
-    elif risk_score > 3:
-        level = "🔶 MODÉRÉ"
-        action = "Promotion 15% ciblée + Surveillance"
-    else:
-        level = "✅ FAIBLE"
-        action = "Niveau normal - Stratégie actuelle"
+    code = risk_codes(risk_score)
+    level = NIVEAUX[code]
+    action = LOCAL_ACTIONS[code]
     
     return {
         "risk_score": round(risk_score, 2),
@@ -233,19 +235,23 @@ def main():
     # Analytics
     with tab3:
         st.header("📊 Analytics et Données")
-        df = load_data()
-        if df is not None:
-            # Métriques principales
+        store = get_inventory_store()
+        choice = st.selectbox("🛍️ Catégorie", ["Toutes"] + store.product_categories())
+        category = None if choice == "Toutes" else choice
+        df = load_data(category)
+        if len(df):
+            # Métriques principales (agrégats calculés par SQLite)
+            summary = store.risk_summary(category, threshold=SEUIL_ELEVE)
             col1, col2, col3, col4 = st.columns(4)
-            col1.metric("📦 Produits analysés", len(df))
+            col1.metric("📦 Produits analysés", summary['products'])
             
-            high_risk = len(df[df['waste_risk'] > 8])
+            high_risk = summary['high_risk']
             col2.metric("⚠️ Produits à risque", high_risk)
             
-            risk_percentage = (high_risk/len(df))*100
+            risk_percentage = (high_risk/summary['products'])*100
             col3.metric("📊 Taux de risque", f"{risk_percentage:.1f}%")
             
-            financial_risk = (df['waste_risk']*df['price']).sum()
+            financial_risk = summary['financial_risk']
             col4.metric("💰 Risque financier", f"{financial_risk:.0f} CFA")
             
             # Visualisations